@@ -5,7 +5,6 @@ import os
 from dotenv import load_dotenv
 from neomodel import config, db
 from lightfm import LightFM
-from lightfm.data import Dataset
 import asyncio
 import logging
 import scipy.sparse as sp
@@ -43,6 +42,10 @@ from app.db_models.ytmusic.ytmusic_track import YtmusicTrack
 from app.db_models.combined.combined_artist import CombinedArtist
 from app.db_models.combined.combined_track import CombinedTrack
 from app.db_models.parent_user import ParentUser
+from ai.ann_index import RandomProjectionIndex
+from ai.batch_recommend import recommend_batch
+from ai.graph_export import export_graph
+from ai.id_map import IdMap, extend_id_map, load_id_map
 
 # Load the trained models
 try:
@@ -53,14 +56,25 @@ except Exception as e:
     sys.exit(1)
 
 # Initialize global dictionaries
-item_dict_artist = joblib.load('item_dict_artist.pkl')
-item_dict_artist_reversed = joblib.load('item_dict_artist_reversed.pkl')
-item_dict_track = joblib.load('item_dict_track.pkl')
-item_dict_track_reversed = joblib.load('item_dict_track_reversed.pkl')
-user_dict = joblib.load('user_dict.pkl')
-user_dict_reversed = joblib.load('user_dict_reversed.pkl')
-
-async def regenerate_dictionary(item_dict_path, item_dict_reversed_path, item_type):
+# Id maps are memory-mapped `.idmap` directories when converted (see `ai/id_map.py`)
+item_dict_artist = load_id_map('item_dict_artist')
+item_dict_artist_reversed = item_dict_artist.reversed if isinstance(item_dict_artist, IdMap) else joblib.load('item_dict_artist_reversed.pkl')
+item_dict_track = load_id_map('item_dict_track')
+item_dict_track_reversed = item_dict_track.reversed if isinstance(item_dict_track, IdMap) else joblib.load('item_dict_track_reversed.pkl')
+user_dict = load_id_map('user_dict')
+user_dict_reversed = user_dict.reversed if isinstance(user_dict, IdMap) else joblib.load('user_dict_reversed.pkl')
+
+# ANN index over the user embeddings, built on first use and again after the user dictionary changes
+ann_index = None
+
+
+def user_ann_index():
+    global ann_index
+    if ann_index is None:
+        ann_index = RandomProjectionIndex.from_models([model_artist, model_track], user_dict)
+    return ann_index
+
+async def regenerate_dictionary(item_dict_path, item_type):
     async def fetch_items():
         if item_type == 'artist':
             return [artist.name for artist in await SpotifyArtist.nodes.all()]
@@ -71,11 +85,9 @@ async def regenerate_dictionary(item_dict_path, item_dict_reversed_path, item_ty
 
     try:
         items = await fetch_items()
-        item_dict = {name: idx for idx, name in enumerate(set(items))}
-        item_dict_reversed = {idx: name for name, idx in item_dict.items()}
-
-        joblib.dump(item_dict, item_dict_path)
-        joblib.dump(item_dict_reversed, item_dict_reversed_path)
+        # Append-only: existing names keep their index so the trained models stay aligned
+        item_dict = extend_id_map(item_dict_path, sorted(set(items)))
+        item_dict_reversed = item_dict.reversed
 
         logger.info(f"{item_type.capitalize()} dictionaries regenerated and saved.")
         return item_dict, item_dict_reversed
@@ -87,18 +99,16 @@ async def regenerate_dictionary(item_dict_path, item_dict_reversed_path, item_ty
 async def setup_dictionaries():
     global item_dict_artist, item_dict_artist_reversed
     global item_dict_track, item_dict_track_reversed
-    global user_dict, user_dict_reversed
+    global user_dict, user_dict_reversed, ann_index
     
-    item_dict_artist, item_dict_artist_reversed = await regenerate_dictionary('item_dict_artist.pkl', 'item_dict_artist_reversed.pkl', 'artist')
-    item_dict_track, item_dict_track_reversed = await regenerate_dictionary('item_dict_track.pkl', 'item_dict_track_reversed.pkl', 'track')
+    item_dict_artist, item_dict_artist_reversed = await regenerate_dictionary('item_dict_artist', 'artist')
+    item_dict_track, item_dict_track_reversed = await regenerate_dictionary('item_dict_track', 'track')
     
     users = await SpotifyUser.nodes.all()
     user_ids = [user.uid for user in users]
-    user_dict = {uid: idx for idx, uid in enumerate(user_ids)}
-    user_dict_reversed = {idx: uid for uid, idx in user_dict.items()}
-    
-    joblib.dump(user_dict, 'user_dict.pkl')
-    joblib.dump(user_dict_reversed, 'user_dict_reversed.pkl')
+    user_dict = extend_id_map('user_dict', user_ids)
+    user_dict_reversed = user_dict.reversed
+    ann_index = None
 
 async def get_liked_artists(user_id):
     try:
@@ -142,57 +152,35 @@ def map_track_names_to_indices(tracks):
             logger.warning(f"Track name '{track.name}' not found in index mapping.")
     return track_indices
 
-async def build_interaction_matrix():
+async def build_interaction_matrix(snapshot_path='graph_snapshot'):
     """
     Builds a custom interaction matrix from Neo4j data.
-    """
-    users = await SpotifyUser.nodes.all()
-    tracks = await SpotifyTrack.nodes.all()
-    artists = await SpotifyArtist.nodes.all()
 
-    # Create dataset
-    dataset = Dataset()
-
-    # Extract user IDs and item names
-    user_ids = [user.uid for user in users]
-    track_names = [track.name for track in tracks]
-    artist_names = [artist.name for artist in artists]
-    item_names = track_names + artist_names
-
-    # Fit the dataset with users and items
-    dataset.fit(users=user_ids, items=item_names)
-
-    # Create interactions list
-    interactions = []
-    for user in users:
-        user_tracks = await user.likes_tracks.all()
-        user_artists = await user.likes_artists.all()
-
-        for track in user_tracks:
-            interactions.append((user.uid, track.name))
-
-        for artist in user_artists:
-            interactions.append((user.uid, artist.name))
-
-    logger.debug(f"Interactions: {interactions}")
+    The LIKES_TRACK and LIKES_ARTIST edges of every SpotifyUser are streamed
+    by one paginated query into a CSR snapshot (see `ai/graph_export.py`),
+    which is also saved to `snapshot_path` for `GraphSnapshot.load`.
+    """
+    try:
+        snapshot = export_graph(['LIKES_TRACK', 'LIKES_ARTIST'], user_label='SpotifyUser')
+        interactions_matrix = snapshot.combined().tocoo()
+    except Exception as e:
+        logger.error(f"Error building interactions matrix: {e}")
+        return None, None, None, None
 
-    if not interactions:
+    if not interactions_matrix.nnz:
         logger.error("No interactions found.")
         return None, None, None, None
 
-    try:
-        interactions_matrix, _ = dataset.build_interactions(interactions)
-        logger.info("Interactions matrix built successfully.")
+    snapshot.save(snapshot_path)
+    n_users, n_items = snapshot.shape
+    logger.info(f"Interactions matrix built successfully: {n_users} users, {n_items} items, {interactions_matrix.nnz} interactions.")
 
-        # Prepare item features matrix
-        item_features_matrix = sp.identity(len(item_names), format='csr')
-        # Prepare user features matrix
-        user_features_matrix = sp.identity(len(user_ids), format='csr')
+    # Prepare item features matrix
+    item_features_matrix = sp.identity(n_items, format='csr')
+    # Prepare user features matrix
+    user_features_matrix = sp.identity(n_users, format='csr')
 
-        return interactions_matrix, dataset, item_features_matrix, user_features_matrix
-    except Exception as e:
-        logger.error(f"Error building interactions matrix: {e}")
-        return None, None, None, None
+    return interactions_matrix, snapshot, item_features_matrix, user_features_matrix
 
 async def get_custom_user_data(user_id):
     try:
@@ -240,47 +228,22 @@ async def get_recommendations(user_id, item_features_matrix_sparse, user_feature
 
         # Predict scores for all items for the given user
         user_index = user_dict[user_id]  # Map the user_id to the user index in the LightFM model
-        item_ids = np.arange(num_features)  # Generate an array of item IDs (indices)
 
-        # Use LightFM model to predict scores for all items
-        item_scores = model_artist.predict(user_index, item_ids)
-
-        top_items = np.argsort(item_scores)[::-1]
+        # Score all items with the LightFM embeddings and keep the best 10 with argpartition
+        top_items, _ = recommend_batch(model_artist, [user_index], k=10)
+        top_items = top_items[0]
 
         logger.debug(f"Top Items: {top_items}")
 
         recommended_artists = [item_dict_artist_reversed[idx] for idx in top_items[:10] if idx in item_dict_artist_reversed]
         recommended_tracks = [item_dict_track_reversed[idx - len(item_dict_artist)] for idx in top_items[:10] if (idx - len(item_dict_artist)) in item_dict_track_reversed]
 
-        # Recommend users based on percent match
-        recommended_users = []
-        for other_user_id, other_user_index in user_dict.items():
-            if other_user_id == user_id:
-                continue
-
-            # Ensure the other user's feature vector is constructed with the same number of features
-            other_user_feature_vector = np.zeros(num_features)
-            other_user_feature_vector[user_features_matrix_sparse[other_user_index].nonzero()[1]] = 1
-
-            logger.debug(f"Other User Feature Vector Shape: {other_user_feature_vector.shape}")
-
-            # Ensure both vectors have the same shape
-            if user_feature_vector.shape != other_user_feature_vector.shape:
-                logger.error(f"Shape mismatch: user_feature_vector.shape {user_feature_vector.shape} != other_user_feature_vector.shape {other_user_feature_vector.shape}")
-                continue
-
-            match_score = np.dot(user_feature_vector, other_user_feature_vector)
-            match_percentage = match_score / np.sum(user_feature_vector) * 100
-
-            if match_percentage > 0:
-                recommended_users.append((other_user_id, match_percentage))
-
-        # Sort users by match percentage in descending order
-        recommended_users.sort(key=lambda x: x[1], reverse=True)
+        # Recommend users whose embeddings are closest to this user's
+        recommended_users = user_ann_index().query_id(user_id, k=10)
 
         logger.debug(f"Recommended Users: {recommended_users}")
 
-        return recommended_artists, recommended_tracks, recommended_users[:10]
+        return recommended_artists, recommended_tracks, recommended_users
     except Exception as e:
         logger.error(f"Error generating recommendations for user ID {user_id}: {e}")
         return [], [], []
@@ -291,7 +254,7 @@ if __name__ == "__main__":
 
     loop.run_until_complete(setup_dictionaries())
 
-    interactions_matrix, dataset, item_features_matrix_sparse, user_features_matrix_sparse = loop.run_until_complete(build_interaction_matrix())
+    interactions_matrix, snapshot, item_features_matrix_sparse, user_features_matrix_sparse = loop.run_until_complete(build_interaction_matrix())
 
     user_id = '71599a394df141c387ec6368ac79c9c3'  # replace with actual user ID
 
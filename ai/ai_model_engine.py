@@ -1,102 +1,40 @@
-import numpy as np
-import pandas as pd
+import os
+import sys
 from lightfm import LightFM, cross_validation
 from lightfm.evaluation import precision_at_k, auc_score
-from scipy.sparse import coo_matrix
 import joblib
 import warnings
 
-warnings.simplefilter(action='ignore', category=FutureWarning)
+# Add the project directory to the sys.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from ai.id_map import save_id_map
+from ai.training_data import load_interactions
 
-# Function to create sparse interaction matrix
-def create_interaction_matrix_sparse(spotify, user_col, item_col, rating_col, norm=False, threshold=None):
-    interactions = spotify.groupby([user_col, item_col])[rating_col].sum().reset_index()
-    
-    if norm:
-        interactions[rating_col] = interactions[rating_col].apply(lambda x: 1 if x > threshold else 0)
-    
-    # Create user and item dictionaries
-    user_dict = create_user_dict(interactions[user_col])
-    item_dict = {item: idx for idx, item in enumerate(interactions[item_col].unique())}
-    
-    users = interactions[user_col].map(user_dict)
-    items = interactions[item_col].map(item_dict)
-    
-    matrix = coo_matrix((interactions[rating_col], (users, items)))
-    
-    return matrix.tocsr(), user_dict, item_dict
-
-# Function to create user dictionary
-def create_user_dict(user_ids):
-    unique_user_ids = np.unique(user_ids)
-    user_dict = {user_id: idx for idx, user_id in enumerate(unique_user_ids)}
-    return user_dict
-
-# Function to create item dictionary
-def create_item_dict(df, id_col, name_col):
-    return {df[id_col][i]: df[name_col][i] for i in range(df.shape[0])}
-
-# Function to process data in chunks
-def process_data_in_chunks(file_path, chunk_size):
-    chunks = pd.read_csv(file_path, chunksize=chunk_size, on_bad_lines='skip')
-    full_data = pd.DataFrame()
-    
-    for chunk in chunks:
-        chunk.columns = chunk.columns.str.strip().str.replace('"', '')
-        chunk.fillna('Not Specified', inplace=True)
-        full_data = pd.concat([full_data, chunk], ignore_index=True)
-    
-    return full_data
-
-# Function to sample data
-def sample_data(data, fraction):
-    return data.sample(frac=fraction, random_state=123)
+warnings.simplefilter(action='ignore', category=FutureWarning)
 
 # Load and process data
 file_path = 'spotify_dataset.csv'
+cache_path = 'spotify_dataset.parquet'  # Cleaned 10% sample, reused by later runs when pyarrow is installed
 chunk_size = 100000  # Adjust based on available memory
 fraction = 0.1  # Sample 10% of the data
 
-# Process data in chunks
-data = process_data_in_chunks(file_path, chunk_size)
-
-# Sample data
-sampled_data = sample_data(data, fraction)
-
-# Clean column names
-sampled_data.columns = sampled_data.columns.str.strip().str.replace('"', '')
-
-# Data Preparation
-print("Data columns:", sampled_data.columns)
-print("Initial data shape:", sampled_data.shape)
-
-# Filtering based on groups of artists who have a track record of more than 50 songs
-filtered_data = sampled_data.groupby('artistname').filter(lambda x: len(x) >= 50)
-print(f'After filtering based on the number of songs, there are {filtered_data.shape[0]:,} records with {filtered_data.shape[1]} variables.')
-
-# Filtering based on users who have played songs by more than 10 artists
-filtered_data = filtered_data[filtered_data.groupby('user_id').artistname.transform('nunique') >= 10]
-print(f'After filtering based on the number of artists a user has played, there are {filtered_data.shape[0]:,} records with {filtered_data.shape[1]} variables.')
-
-# Create frequency dataframe for artists and tracks
-spotify_freq_artist = filtered_data.groupby(['user_id', 'artistname']).size().reset_index(name='freq')
-spotify_freq_track = filtered_data.groupby(['user_id', 'trackname']).size().reset_index(name='freq')
-
-# Create sparse interaction matrices for artist and track
-interactions_artist, user_dict_artist, item_dict_artist = create_interaction_matrix_sparse(
-    spotify=spotify_freq_artist, user_col="user_id", item_col='artistname', rating_col='freq'
-)
-interactions_track, user_dict_track, item_dict_track = create_interaction_matrix_sparse(
-    spotify=spotify_freq_track, user_col="user_id", item_col='trackname', rating_col='freq'
+# Stream the CSV chunk by chunk: each chunk is sampled, cleaned and reduced to
+# (user, artist, track) play counts, then artists with fewer than 50 records
+# and users who played fewer than 10 of the remaining artists are filtered out
+interactions_artist, interactions_track, user_dict, item_dict_artist, item_dict_track = load_interactions(
+    file_path, chunk_size, fraction, min_artist_records=50, min_user_artists=10, cache_path=cache_path
 )
+user_dict_artist = user_dict_track = user_dict
+print(f'After filtering, there are {interactions_artist.shape[0]:,} users, {interactions_artist.shape[1]:,} artists and {interactions_track.shape[1]:,} tracks.')
 
 # Create user ID to index and index to user ID mappings
 user_id_to_index = {user_id: idx for idx, user_id in enumerate(user_dict_artist.keys())}
-index_to_user_id = {idx: user_id for user_id, idx in user_id_to_index.items()}
 
 # Save mappings
-joblib.dump(user_id_to_index, 'user_id_to_index.pkl')
-joblib.dump(index_to_user_id, 'index_to_user_id.pkl')
+# Id maps are saved as memory-mappable `.idmap` directories, see `id_map.py`;
+# index -> user id lookups go through `load_id_map('user_id_to_index').reversed`
+save_id_map('user_id_to_index', user_id_to_index)
 
 def runMF(interactions, n_components=30, loss='warp', epoch=30, n_jobs=4):
     model = LightFM(no_components=n_components, loss=loss)
@@ -140,7 +78,7 @@ joblib.dump(interactions_artist, 'interactions_artist.pkl')
 joblib.dump(interactions_track, 'interactions_track.pkl')
 
 # Save the dictionaries
-joblib.dump(user_dict_artist, 'user_dict_artist.pkl')
-joblib.dump(item_dict_artist, 'item_dict_artist.pkl')
-joblib.dump(user_dict_track, 'user_dict_track.pkl')
-joblib.dump(item_dict_track, 'item_dict_track.pkl')
+save_id_map('user_dict_artist', user_dict_artist)
+save_id_map('item_dict_artist', item_dict_artist)
+save_id_map('user_dict_track', user_dict_track)
+save_id_map('item_dict_track', item_dict_track)
@@ -0,0 +1,103 @@
+import numpy as np
+import joblib
+
+
+def normalize_rows(vectors):
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1
+    return vectors / norms
+
+
+class RandomProjectionIndex:
+    """
+    Cosine nearest-neighbour index using random-projection LSH.
+
+    Every table hashes a vector to the sign pattern of `n_bits` random
+    hyperplanes. Buckets are stored as one sorted code array per table, so a
+    lookup is a binary search. Candidates gathered from all tables (and from
+    codes one bit away when they are too few) are re-ranked exactly.
+    """
+
+    def __init__(self, vectors, ids, n_tables=8, n_bits=12, seed=123):
+        self.vectors = normalize_rows(vectors)
+        self.ids = np.asarray(ids, dtype=object)
+        self.id_to_index = {item_id: idx for idx, item_id in enumerate(self.ids)}
+        self.n_bits = n_bits
+
+        rng = np.random.default_rng(seed)
+        self.planes = rng.standard_normal((n_tables, self.vectors.shape[1], n_bits)).astype(np.float32)
+        self.bit_values = (1 << np.arange(n_bits)).astype(np.int64)
+
+        self.sorted_codes = []
+        self.sorted_rows = []
+        for codes in self.hash(self.vectors):
+            order = np.argsort(codes, kind='stable')
+            self.sorted_codes.append(codes[order])
+            self.sorted_rows.append(order.astype(np.int32))
+
+    @classmethod
+    def from_models(cls, models, user_dict, **kwargs):
+        """
+        Index the user embeddings of one or more LightFM models sharing `user_dict`.
+
+        Embeddings are normalized per model and concatenated, so the cosine
+        of two users is the mean of their per-model cosines.
+        """
+        ids = sorted(user_dict, key=user_dict.get)
+        parts = [normalize_rows(model.user_embeddings[:len(ids)]) for model in models]
+        vectors = np.hstack(parts) / np.sqrt(len(parts))
+        return cls(vectors, ids, **kwargs)
+
+    def hash(self, vectors):
+        """Return an `(n_tables, n_vectors)` array of bucket codes."""
+        signs = np.einsum('nd,tdb->tnb', vectors, self.planes) > 0
+        return signs.astype(np.int64) @ self.bit_values
+
+    def bucket(self, table, code):
+        codes = self.sorted_codes[table]
+        start, end = np.searchsorted(codes, [code, code + 1])
+        return self.sorted_rows[table][start:end]
+
+    def candidates(self, vector, k):
+        codes = self.hash(vector[np.newaxis, :])[:, 0]
+        rows = [self.bucket(table, code) for table, code in enumerate(codes)]
+        found = np.unique(np.concatenate(rows))
+        if len(found) <= k:
+            # Multi-probe: look at the buckets one bit flip away
+            rows.extend(
+                self.bucket(table, code ^ bit)
+                for table, code in enumerate(codes)
+                for bit in self.bit_values
+            )
+            found = np.unique(np.concatenate(rows))
+        return found
+
+    def query(self, vector, k=10, exclude=None):
+        """Return up to `k` `(id, cosine)` pairs closest to `vector`, best first."""
+        vector = normalize_rows(vector[np.newaxis, :])[0]
+        rows = self.candidates(vector, k + 1)
+        if exclude is not None and exclude in self.id_to_index:
+            rows = rows[rows != self.id_to_index[exclude]]
+        if not len(rows):
+            return []
+
+        scores = self.vectors[rows] @ vector
+        if len(rows) > k:
+            best = np.argpartition(scores, -k)[-k:]
+            rows, scores = rows[best], scores[best]
+        order = np.argsort(-scores, kind='stable')
+        return [(self.ids[row], scores[i].item()) for i, row in zip(order, rows[order])]
+
+    def query_id(self, item_id, k=10):
+        """Nearest neighbours of an indexed id, excluding the id itself."""
+        if item_id not in self.id_to_index:
+            return []
+        return self.query(self.vectors[self.id_to_index[item_id]], k, exclude=item_id)
+
+    def save(self, path):
+        joblib.dump(self, path)
+
+    @staticmethod
+    def load(path):
+        return joblib.load(path)
@@ -0,0 +1,60 @@
+import numpy as np
+import scipy.sparse as sp
+
+
+def score_block(model, user_rows):
+    """LightFM scores of `user_rows` against every item: embeddings product plus both biases."""
+    scores = model.user_embeddings[user_rows] @ model.item_embeddings.T
+    scores += model.user_biases[user_rows, np.newaxis]
+    scores += model.item_biases[np.newaxis, :]
+    return scores
+
+
+def mask_seen(scores, user_rows, interactions):
+    """Set the score of every item already in a user's interactions row to -inf."""
+    user_rows = np.asarray(user_rows)
+    seen = sp.csr_matrix(interactions)
+    # Users added after `interactions` was saved have nothing to mask
+    in_range = np.flatnonzero(user_rows < seen.shape[0])
+    seen = seen[user_rows[in_range]][:, :scores.shape[1]]
+    rows = np.repeat(in_range, np.diff(seen.indptr))
+    scores[rows, seen.indices] = -np.inf
+
+
+def top_k(scores, k):
+    """Row-wise top-K `(indices, scores)` ordered best first, using argpartition."""
+    k = min(k, scores.shape[1])
+    if k < scores.shape[1]:
+        candidates = np.argpartition(scores, -k, axis=1)[:, -k:]
+    else:
+        candidates = np.broadcast_to(np.arange(k), scores.shape).copy()
+    candidate_scores = np.take_along_axis(scores, candidates, axis=1)
+    order = np.argsort(-candidate_scores, axis=1, kind='stable')
+    return np.take_along_axis(candidates, order, axis=1), np.take_along_axis(candidate_scores, order, axis=1)
+
+
+def recommend_batch(model, user_rows, k=10, interactions=None, block_size=1024):
+    """
+    Top-K items for many users, scored `block_size` users at a time.
+
+    Returns `(items, scores)` arrays of shape `(len(user_rows), k)`. Items the
+    user already has in `interactions` are excluded and come back with a
+    score of -inf only when fewer than `k` unseen items exist.
+    """
+    user_rows = np.asarray(user_rows, dtype=np.int32)
+    k = min(k, model.item_embeddings.shape[0])
+    items = np.empty((len(user_rows), k), dtype=np.int32)
+    scores = np.empty((len(user_rows), k), dtype=np.float32)
+
+    for start in range(0, len(user_rows), block_size):
+        block = user_rows[start:start + block_size]
+        block_scores = score_block(model, block)
+        if interactions is not None:
+            mask_seen(block_scores, block, interactions)
+        items[start:start + len(block)], scores[start:start + len(block)] = top_k(block_scores, k)
+    return items, scores
+
+
+def recommend_all(model, k=10, interactions=None, block_size=1024):
+    """Top-K items for every user of the model, see `recommend_batch`."""
+    return recommend_batch(model, np.arange(model.user_embeddings.shape[0]), k, interactions, block_size)
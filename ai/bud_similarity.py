@@ -0,0 +1,121 @@
+import numpy as np
+import scipy.sparse as sp
+
+from ai.interactions import create_binary_matrix_sparse, create_user_dict
+
+METRICS = ('overlap', 'jaccard', 'cosine')
+
+
+class BudSimilarityEngine:
+    """
+    In-memory user x item like graph, one binary CSR matrix per relation type.
+
+    Scoring a user is a sparse row x matrix product per relation, which yields
+    the shared item counts against every other user at once. Those counts are
+    turned into overlap, Jaccard or cosine scores and combined across relations
+    with per-relation weights.
+    """
+
+    def __init__(self, user_ids, matrices, active=None):
+        self.user_dict = create_user_dict(user_ids)
+        self.user_ids = np.array(sorted(self.user_dict, key=self.user_dict.get), dtype=object)
+        self.matrices = {}
+        self.transposed = {}
+        self.degrees = {}
+        for relation, matrix in matrices.items():
+            self.add_relation(relation, matrix)
+        if active is None:
+            active = np.ones(len(self.user_ids), dtype=bool)
+        self.active = np.asarray(active, dtype=bool)
+
+    @classmethod
+    def from_edges(cls, edges, user_uids=(), active_uids=None):
+        """
+        Build the engine from `{relation: (user_uids, item_ids)}` like edges.
+
+        Users are `user_uids` plus anybody appearing in the edges; users
+        without a like on a relation get an empty row in its matrix.
+        """
+        user_ids = set(user_uids)
+        for users, _ in edges.values():
+            user_ids.update(users)
+        if active_uids is not None:
+            user_ids.update(active_uids)
+        user_dict = create_user_dict(np.array(list(user_ids), dtype=object))
+
+        matrices = {}
+        for relation, (users, items) in edges.items():
+            matrices[relation], _ = create_binary_matrix_sparse(users, items, user_dict)
+
+        active = None
+        if active_uids is not None:
+            active = np.zeros(len(user_dict), dtype=bool)
+            active[[user_dict[uid] for uid in active_uids]] = True
+        return cls(list(user_dict), matrices, active)
+
+    @classmethod
+    def from_snapshot(cls, snapshot):
+        """Build the engine from a `GraphSnapshot` (see `ai/graph_export.py`)."""
+        user_ids = list(snapshot.user_ids)
+        order = np.argsort(np.array(user_ids, dtype=object))
+        # Rows are reordered to match the sorted user dictionary of the engine
+        matrices = {relation: matrix[order] for relation, matrix in snapshot.matrices.items()}
+        return cls([user_ids[i] for i in order], matrices, np.asarray(snapshot.active)[order])
+
+    def add_relation(self, relation, matrix):
+        matrix = sp.csr_matrix(matrix, dtype=np.float32)
+        if matrix.shape[0] != len(self.user_ids):
+            raise ValueError(f"Matrix for {relation} has {matrix.shape[0]} rows, expected {len(self.user_ids)}")
+        self.matrices[relation] = matrix
+        # Products are taken against the transpose, kept in CSR so the
+        # row x matrix product only touches the columns of the user's items
+        self.transposed[relation] = matrix.T.tocsr()
+        self.degrees[relation] = np.asarray(matrix.getnnz(axis=1), dtype=np.float32)
+
+    def __contains__(self, user_uid):
+        return user_uid in self.user_dict
+
+    def shared_counts(self, user_index, relation):
+        """Number of items of `relation` shared between the user and everybody."""
+        row = self.matrices[relation][user_index]
+        return np.asarray((row @ self.transposed[relation]).todense(), dtype=np.float32).ravel()
+
+    def relation_scores(self, user_index, relation, metric='overlap'):
+        if metric not in METRICS:
+            raise ValueError(f"Unknown metric '{metric}', expected one of {', '.join(METRICS)}")
+        shared = self.shared_counts(user_index, relation)
+        if metric == 'overlap':
+            return shared
+        degrees = self.degrees[relation]
+        own = degrees[user_index]
+        if metric == 'jaccard':
+            denominator = own + degrees - shared
+        else:
+            denominator = np.sqrt(own * degrees)
+        scores = np.zeros_like(shared)
+        np.divide(shared, denominator, out=scores, where=denominator > 0)
+        return scores
+
+    def scores(self, user_uid, weights, metric='overlap'):
+        """Weighted sum of the per-relation scores of `user_uid` against every user."""
+        user_index = self.user_dict[user_uid]
+        total = np.zeros(len(self.user_ids), dtype=np.float32)
+        for relation, weight in weights.items():
+            if weight and relation in self.matrices:
+                total += weight * self.relation_scores(user_index, relation, metric)
+        total[user_index] = 0
+        return total
+
+    def top_k(self, user_uid, weights, k=50, metric='overlap', active_only=False):
+        """Return the `k` best `(bud_uid, score)` pairs, best first, with score > 0."""
+        if user_uid not in self.user_dict:
+            return []
+        scores = self.scores(user_uid, weights, metric)
+        if active_only:
+            scores[~self.active] = 0
+
+        candidates = np.flatnonzero(scores > 0)
+        if len(candidates) > k:
+            candidates = candidates[np.argpartition(scores[candidates], -k)[-k:]]
+        ranked = candidates[np.argsort(-scores[candidates], kind='stable')]
+        return [(self.user_ids[i], scores[i].item()) for i in ranked]
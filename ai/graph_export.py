@@ -0,0 +1,152 @@
+import json
+import logging
+import os
+import numpy as np
+from neomodel import db
+from scipy.sparse import coo_matrix, csr_matrix
+
+from ai.id_map import IdMap
+from ai.training_data import GrowableArray, Vocabulary
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_META = 'snapshot.json'
+
+
+def build_export_query(relations, user_label='SpotifyUser', accounts=None):
+    """
+    One page of users (keyset-paginated on uid) with all their liked items,
+    optionally restricted to the uids in `$uids`. Users without likes return
+    a single row with a null item so they are still part of the snapshot.
+    Items are keyed by elementId, not every liked item label has a uid.
+    """
+    account_hop = f'-[:{accounts}]->()' if accounts else ''
+    return f"""
+    MATCH (u:{user_label})
+    WHERE u.uid > $after AND ($uids IS NULL OR u.uid IN $uids)
+    WITH u ORDER BY u.uid LIMIT $limit
+    OPTIONAL MATCH (u){account_hop}-[r:{'|'.join(relations)}]->(item)
+    RETURN u.uid, u.is_active = true, elementId(item), item.name, type(r)
+    """
+
+
+class GraphSnapshot:
+    """
+    CSR export of the like graph: one users x items matrix per relationship
+    type over a shared item space, plus the uid maps of rows and columns.
+
+    Saved as a directory of `.npy` arrays so `load` can memory-map them;
+    the uids and item names are `IdMap` string tables, iterated like the
+    lists they are built from.
+    """
+
+    def __init__(self, user_ids, item_ids, item_names, active, matrices):
+        self.user_ids = user_ids
+        self.item_ids = item_ids
+        self.item_names = item_names
+        self.active = active
+        self.matrices = matrices
+
+    @property
+    def shape(self):
+        return len(self.user_ids), len(self.item_ids)
+
+    def combined(self, relations=None):
+        """Binary matrix of the union of `relations` (all of them by default)."""
+        relations = relations or list(self.matrices)
+        matrix = sum(self.matrices[relation] for relation in relations)
+        matrix.data[:] = 1
+        return matrix
+
+    def save(self, path):
+        os.makedirs(path, exist_ok=True)
+        for relation, matrix in self.matrices.items():
+            np.save(os.path.join(path, f'{relation}.indptr.npy'), matrix.indptr)
+            np.save(os.path.join(path, f'{relation}.indices.npy'), matrix.indices)
+            np.save(os.path.join(path, f'{relation}.data.npy'), matrix.data)
+        np.save(os.path.join(path, 'active.npy'), self.active)
+        IdMap.from_names(list(self.user_ids)).save(os.path.join(path, 'user_ids.idmap'))
+        IdMap.from_names(list(self.item_ids)).save(os.path.join(path, 'item_ids.idmap'))
+        # Only read by index, names repeat and unnamed items are stored as ''
+        IdMap.from_names(['' if name is None else name for name in self.item_names]).save(
+            os.path.join(path, 'item_names.idmap'))
+        with open(os.path.join(path, SNAPSHOT_META), 'w') as meta:
+            json.dump({'shape': self.shape, 'relations': list(self.matrices)}, meta)
+
+    @classmethod
+    def load(cls, path, mmap_mode='r'):
+        with open(os.path.join(path, SNAPSHOT_META)) as meta:
+            meta = json.load(meta)
+        shape = tuple(meta['shape'])
+        matrices = {}
+        for relation in meta['relations']:
+            arrays = [
+                np.load(os.path.join(path, f'{relation}.{name}.npy'), mmap_mode=mmap_mode)
+                for name in ('data', 'indices', 'indptr')
+            ]
+            matrices[relation] = csr_matrix(tuple(arrays), shape=shape, copy=False)
+        return cls(
+            user_ids=IdMap.load(os.path.join(path, 'user_ids.idmap'), mmap_mode),
+            item_ids=IdMap.load(os.path.join(path, 'item_ids.idmap'), mmap_mode),
+            item_names=IdMap.load(os.path.join(path, 'item_names.idmap'), mmap_mode),
+            active=np.load(os.path.join(path, 'active.npy')),
+            matrices=matrices,
+        )
+
+
+def export_graph(relations, user_label='SpotifyUser', accounts=None, batch_size=1000, uids=None):
+    """
+    Stream `(user_uid, item_element_id, rel_type)` rows page by page into integer
+    index arrays and build a `GraphSnapshot`. Nothing but the index arrays
+    and the id vocabularies is kept in memory. With `uids` only those
+    users are exported.
+    """
+    query = build_export_query(relations, user_label, accounts)
+    users, items = Vocabulary(), Vocabulary()
+    relation_ids = {relation: idx for idx, relation in enumerate(relations)}
+    item_names = []
+    active = []
+    user_idx, item_idx, relation_idx = GrowableArray(), GrowableArray(), GrowableArray(np.int8)
+
+    after = ''
+    while True:
+        results, _ = db.cypher_query(query, {'after': after, 'limit': batch_size, 'uids': uids})
+        if not results:
+            break
+        rows, cols, rels = [], [], []
+        for user_uid, is_active, item_uid, item_name, relation in results:
+            if user_uid not in users.ids:
+                users.add(user_uid)
+                active.append(bool(is_active))
+            if item_uid is None:
+                continue
+            if item_uid not in items.ids:
+                items.add(item_uid)
+                item_names.append(item_name)
+            rows.append(users.ids[user_uid])
+            cols.append(items.ids[item_uid])
+            rels.append(relation_ids[relation])
+        user_idx.extend(rows)
+        item_idx.extend(cols)
+        relation_idx.extend(rels)
+
+        page_users = {row[0] for row in results}
+        after = max(page_users)
+        if len(page_users) < batch_size:
+            break
+
+    shape = (len(users), len(items))
+    rows, cols, rels = user_idx.array(), item_idx.array(), relation_idx.array()
+    matrices = {}
+    for relation, idx in relation_ids.items():
+        selected = rels == idx
+        matrix = coo_matrix(
+            (np.ones(selected.sum(), dtype=np.float32), (rows[selected], cols[selected])), shape=shape
+        ).tocsr()
+        # The same like reached through two accounts is counted once
+        matrix.data[:] = 1
+        matrices[relation] = matrix
+        logger.info(f"Exported {matrix.nnz:,} {relation} edges")
+
+    return GraphSnapshot(users.values(), items.values(), np.array(item_names, dtype=object),
+                         np.array(active, dtype=bool), matrices)
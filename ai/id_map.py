@@ -0,0 +1,211 @@
+import os
+import sys
+import zlib
+import numpy as np
+import joblib
+
+EMPTY = -1
+
+
+class IdMap:
+    """
+    Compact, memory-mappable bidirectional map between strings and dense indices.
+
+    Names are stored as one UTF-8 blob with an offsets array (index -> name),
+    and an open-addressing hash table of int32 slots keyed by CRC32 gives
+    name -> index lookups. All three are plain `.npy` arrays, so worker
+    processes loading the same map with `mmap_mode='r'` share the pages.
+
+    The forward direction behaves like the `{name: index}` dicts it replaces;
+    `reversed` gives the `{index: name}` view.
+    """
+
+    def __init__(self, blob, offsets, table):
+        self.blob = blob
+        self.offsets = offsets
+        self.table = table
+        self.mask = len(table) - 1
+
+    @classmethod
+    def from_names(cls, names):
+        """Build a map where `names[i]` has index `i`."""
+        encoded = [str(name).encode('utf-8') for name in names]
+        offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+        np.cumsum([len(name) for name in encoded], out=offsets[1:])
+        blob = np.frombuffer(b''.join(encoded), dtype=np.uint8)
+
+        size = 1
+        while size < 2 * len(encoded):
+            size *= 2
+        table = np.full(size, EMPTY, dtype=np.int32)
+        mask = size - 1
+        for index, name in enumerate(encoded):
+            slot = zlib.crc32(name) & mask
+            while table[slot] != EMPTY:
+                slot = (slot + 1) & mask
+            table[slot] = index
+        return cls(blob, offsets, table)
+
+    @classmethod
+    def from_dict(cls, mapping):
+        """Build a map from a `{name: index}` dict with indices 0..n-1."""
+        names = [None] * len(mapping)
+        for name, index in mapping.items():
+            names[index] = name
+        return cls.from_names(names)
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def extend(self, names):
+        """
+        Return a new map with the unknown `names` appended after the existing
+        ones. Existing indices never change, so models stay aligned.
+        """
+        new_names = [name for name in dict.fromkeys(str(name) for name in names) if name not in self]
+        if not new_names:
+            return self
+        return IdMap.from_names(list(self) + new_names)
+
+    def name(self, index):
+        return self.blob[self.offsets[index]:self.offsets[index + 1]].tobytes().decode('utf-8')
+
+    def index(self, name):
+        key = str(name).encode('utf-8')
+        slot = zlib.crc32(key) & self.mask
+        while True:
+            index = self.table[slot]
+            if index == EMPTY:
+                return None
+            if self.blob[self.offsets[index]:self.offsets[index + 1]].tobytes() == key:
+                return int(index)
+            slot = (slot + 1) & self.mask
+
+    def get(self, name, default=None):
+        index = self.index(name)
+        return default if index is None else index
+
+    def __getitem__(self, name):
+        index = self.index(name)
+        if index is None:
+            raise KeyError(name)
+        return index
+
+    def __contains__(self, name):
+        return self.index(name) is not None
+
+    def __iter__(self):
+        return (self.name(index) for index in range(len(self)))
+
+    def keys(self):
+        return iter(self)
+
+    def values(self):
+        return iter(range(len(self)))
+
+    def items(self):
+        return ((self.name(index), index) for index in range(len(self)))
+
+    @property
+    def reversed(self):
+        return ReversedIdMap(self)
+
+    def save(self, path):
+        os.makedirs(path, exist_ok=True)
+        for name in ('blob', 'offsets', 'table'):
+            # Written next to the target and renamed over it, so processes
+            # that have the previous version mapped keep reading intact pages
+            target = os.path.join(path, f'{name}.npy')
+            with open(f'{target}.tmp', 'wb') as f:
+                np.save(f, getattr(self, name))
+            os.replace(f'{target}.tmp', target)
+
+    @classmethod
+    def load(cls, path, mmap_mode='r'):
+        return cls(*(np.load(os.path.join(path, f'{name}.npy'), mmap_mode=mmap_mode)
+                     for name in ('blob', 'offsets', 'table')))
+
+
+class ReversedIdMap:
+    """`{index: name}` view of an `IdMap`."""
+
+    def __init__(self, id_map):
+        self.id_map = id_map
+
+    def __len__(self):
+        return len(self.id_map)
+
+    def __contains__(self, index):
+        return 0 <= index < len(self.id_map)
+
+    def __getitem__(self, index):
+        if index not in self:
+            raise KeyError(index)
+        return self.id_map.name(index)
+
+    def get(self, index, default=None):
+        return self.id_map.name(index) if index in self else default
+
+    def __iter__(self):
+        return iter(range(len(self.id_map)))
+
+    def items(self):
+        return ((index, name) for name, index in self.id_map.items())
+
+
+def load_id_map(path, mmap_mode='r'):
+    """
+    Load the map saved at `path` (without extension): the `.idmap` directory
+    when it exists, otherwise the legacy joblib pickle.
+    """
+    if os.path.isdir(f'{path}.idmap'):
+        return IdMap.load(f'{path}.idmap', mmap_mode)
+    return joblib.load(f'{path}.pkl')
+
+
+def save_id_map(path, mapping):
+    """Save a `{name: index}` dict (or `IdMap`) as the `.idmap` directory at `path`."""
+    id_map = mapping if isinstance(mapping, IdMap) else IdMap.from_dict(mapping)
+    id_map.save(f'{path}.idmap')
+    return id_map
+
+
+def extend_id_map(path, names):
+    """
+    Append the unknown `names` to the map saved at `path` (created when
+    missing) and save it. Indices already handed out never change.
+    """
+    if os.path.isdir(f'{path}.idmap') or os.path.exists(f'{path}.pkl'):
+        id_map = load_id_map(path)
+        id_map = id_map if isinstance(id_map, IdMap) else IdMap.from_dict(id_map)
+    else:
+        id_map = IdMap.from_names([])
+    return save_id_map(path, id_map.extend(names))
+
+
+def convert_pickles(directory):
+    """
+    Convert the pickled `{name: index}` dicts in `directory` to `.idmap`
+    directories. Reversed `{index: name}` pickles are not converted since
+    every `IdMap` already answers index -> name.
+    """
+    converted = []
+    for filename in sorted(os.listdir(directory)):
+        if not filename.endswith('.pkl'):
+            continue
+        mapping = joblib.load(os.path.join(directory, filename))
+        if not isinstance(mapping, dict) or not mapping:
+            continue
+        if all(isinstance(key, (int, np.integer)) for key in mapping):
+            continue
+        if not all(isinstance(value, (int, np.integer)) for value in mapping.values()):
+            continue
+        save_id_map(os.path.join(directory, filename[:-len('.pkl')]), mapping)
+        converted.append(filename)
+    return converted
+
+
+if __name__ == '__main__':
+    directory = sys.argv[1] if len(sys.argv) > 1 else os.path.dirname(os.path.abspath(__file__))
+    for filename in convert_pickles(directory):
+        print(f'Converted {filename}')
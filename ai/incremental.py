@@ -0,0 +1,111 @@
+import logging
+import os
+import numpy as np
+import joblib
+from scipy.sparse import coo_matrix
+
+from ai.graph_export import export_graph
+from ai.id_map import extend_id_map
+
+logger = logging.getLogger(__name__)
+
+# item type -> liked relationship the model of that type is trained on
+MODEL_RELATIONS = {
+    'artist': 'LIKES_ARTIST',
+    'track': 'LIKES_TRACK',
+}
+
+
+def dump_atomic(value, path):
+    """Pickle `value` next to `path` and rename it over it, readers never load a partial file."""
+    joblib.dump(value, f'{path}.tmp')
+    os.replace(f'{path}.tmp', path)
+
+
+def grow_rows(array, rows, fill):
+    """Append `rows` rows to `array` (1-D or 2-D), filled with `fill` (a scalar or an array)."""
+    if rows <= 0:
+        return array
+    extra = fill if isinstance(fill, np.ndarray) else np.full((rows,) + array.shape[1:], fill, dtype=array.dtype)
+    return np.concatenate([array, extra.astype(array.dtype)])
+
+
+def grow_model(model, n_users, n_items):
+    """
+    Resize the parameters of a fitted LightFM model (trained without side
+    features, so one embedding per user and item) to `n_users` x `n_items`.
+
+    New rows are initialized the way `LightFM._initialize` does, so
+    `fit_partial` can train them without touching the existing ones.
+    """
+    gradient_fill = 1.0 if model.learning_schedule == 'adagrad' else 0.0
+    for prefix, total in (('user', n_users), ('item', n_items)):
+        embeddings = getattr(model, f'{prefix}_embeddings')
+        rows = total - embeddings.shape[0]
+        if rows <= 0:
+            continue
+        components = embeddings.shape[1]
+        new_embeddings = (model.random_state.rand(rows, components) - 0.5) / components
+        setattr(model, f'{prefix}_embeddings', grow_rows(embeddings, rows, new_embeddings))
+        for name, fill in (('embedding_gradients', gradient_fill), ('embedding_momentum', 0.0),
+                           ('biases', 0.0), ('bias_gradients', gradient_fill), ('bias_momentum', 0.0)):
+            attribute = f'{prefix}_{name}'
+            setattr(model, attribute, grow_rows(getattr(model, attribute), rows, fill))
+    return model
+
+
+def delta_interactions(snapshot, relation, user_map, item_map):
+    """
+    Interactions of the exported users as a `len(user_map)` x `len(item_map)`
+    matrix. Rows of users that were not exported stay empty, so `fit_partial`
+    only samples the changed users.
+    """
+    matrix = snapshot.matrices[relation].tocoo()
+    rows = np.fromiter((user_map[uid] for uid in snapshot.user_ids), dtype=np.int32, count=len(snapshot.user_ids))
+    # Items of other relationships and unnamed items are not in `item_map`
+    cols = np.fromiter((item_map.get(str(name), -1) if name is not None else -1 for name in snapshot.item_names),
+                       dtype=np.int32, count=len(snapshot.item_names))
+    known = cols[matrix.col] >= 0
+    interactions = coo_matrix(
+        (np.ones(known.sum(), dtype=np.float32), (rows[matrix.row[known]], cols[matrix.col[known]])),
+        shape=(len(user_map), len(item_map)),
+    ).tocsr()
+    # Items liked by several exported users under the same name are counted once
+    interactions.data[:] = 1
+    return interactions.tocoo()
+
+
+def update_models(user_uids, model_dir, epochs=5, num_threads=4):
+    """
+    Fold the current likes of `user_uids` (SpotifyUser uids) into the trained
+    artist and track models with `fit_partial`.
+
+    Unknown users and items are appended to the id maps and the models are
+    grown to match; nothing is re-indexed. Returns the number of interactions
+    trained on.
+    """
+    path = lambda name: os.path.join(model_dir, name)
+    snapshot = export_graph(list(MODEL_RELATIONS.values()), user_label='SpotifyUser', uids=list(user_uids))
+    if not len(snapshot.user_ids):
+        return 0
+
+    user_map = extend_id_map(path('user_dict'), snapshot.user_ids)
+
+    total = 0
+    for item_type, relation in MODEL_RELATIONS.items():
+        item_names = [
+            name for name, row_count in zip(snapshot.item_names, snapshot.matrices[relation].getnnz(axis=0))
+            if row_count and name is not None
+        ]
+        item_map = extend_id_map(path(f'item_dict_{item_type}'), item_names)
+
+        interactions = delta_interactions(snapshot, relation, user_map, item_map)
+        if not interactions.nnz:
+            continue
+        model = joblib.load(path(f'model_{item_type}.pkl'))
+        grow_model(model, len(user_map), len(item_map))
+        model.fit_partial(interactions, epochs=epochs, num_threads=num_threads)
+        dump_atomic(model, path(f'model_{item_type}.pkl'))
+        total += interactions.nnz
+        logger.info(f"Updated {item_type} model with {interactions.nnz} interactions of {len(snapshot.user_ids)} users")
+    return total
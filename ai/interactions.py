@@ -0,0 +1,44 @@
+import numpy as np
+from scipy.sparse import coo_matrix
+
+
+# Function to create sparse interaction matrix
+def create_interaction_matrix_sparse(spotify, user_col, item_col, rating_col, norm=False, threshold=None):
+    interactions = spotify.groupby([user_col, item_col])[rating_col].sum().reset_index()
+    
+    if norm:
+        interactions[rating_col] = interactions[rating_col].apply(lambda x: 1 if x > threshold else 0)
+    
+    # Create user and item dictionaries
+    user_dict = create_user_dict(interactions[user_col])
+    item_dict = {item: idx for idx, item in enumerate(interactions[item_col].unique())}
+    
+    users = interactions[user_col].map(user_dict)
+    items = interactions[item_col].map(item_dict)
+    
+    matrix = coo_matrix((interactions[rating_col], (users, items)))
+    
+    return matrix.tocsr(), user_dict, item_dict
+
+# Function to create user dictionary
+def create_user_dict(user_ids):
+    unique_user_ids = np.unique(user_ids)
+    user_dict = {user_id: idx for idx, user_id in enumerate(unique_user_ids)}
+    return user_dict
+
+# Function to create item dictionary
+def create_item_dict(df, id_col, name_col):
+    return {df[id_col][i]: df[name_col][i] for i in range(df.shape[0])}
+
+# Function to create a binary user x item matrix from (user_id, item_id) like edges
+def create_binary_matrix_sparse(user_ids, item_ids, user_dict, item_dict=None):
+    if item_dict is None:
+        item_dict = {item: idx for idx, item in enumerate(dict.fromkeys(item_ids))}
+    rows = np.fromiter((user_dict[user_id] for user_id in user_ids), dtype=np.int32, count=len(user_ids))
+    cols = np.fromiter((item_dict[item_id] for item_id in item_ids), dtype=np.int32, count=len(item_ids))
+    data = np.ones(len(rows), dtype=np.float32)
+
+    matrix = coo_matrix((data, (rows, cols)), shape=(len(user_dict), len(item_dict))).tocsr()
+    # Duplicate edges (the same item liked from two accounts) are summed by tocsr
+    matrix.data[:] = 1
+    return matrix, item_dict
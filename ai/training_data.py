@@ -0,0 +1,203 @@
+import logging
+import os
+import numpy as np
+import pandas as pd
+from scipy.sparse import coo_matrix
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # The Parquet cache is optional
+    pa = pq = None
+
+logger = logging.getLogger(__name__)
+
+COLUMNS = ['user_id', 'artistname', 'trackname']
+
+
+class GrowableArray:
+    """Append-only integer array that doubles its capacity instead of copying on every append."""
+
+    def __init__(self, dtype=np.int32, capacity=1 << 16):
+        self.data = np.empty(capacity, dtype=dtype)
+        self.size = 0
+
+    def extend(self, values):
+        values = np.asarray(values, dtype=self.data.dtype)
+        needed = self.size + len(values)
+        if needed > len(self.data):
+            capacity = len(self.data)
+            while capacity < needed:
+                capacity *= 2
+            grown = np.empty(capacity, dtype=self.data.dtype)
+            grown[:self.size] = self.data[:self.size]
+            self.data = grown
+        self.data[self.size:needed] = values
+        self.size = needed
+
+    def array(self):
+        return self.data[:self.size]
+
+
+class Vocabulary:
+    """Maps strings to dense integer ids in order of first appearance."""
+
+    def __init__(self):
+        self.ids = {}
+
+    def __len__(self):
+        return len(self.ids)
+
+    def add(self, value):
+        return self.ids.setdefault(value, len(self.ids))
+
+    def encode(self, series):
+        """Encode a categorical series; only its categories go through the Python dict."""
+        category_ids = np.fromiter(
+            (self.ids.setdefault(value, len(self.ids)) for value in series.cat.categories),
+            dtype=np.int32, count=len(series.cat.categories),
+        )
+        return category_ids[series.cat.codes.to_numpy()]
+
+    def values(self):
+        return np.array(list(self.ids), dtype=object)
+
+
+def clean_chunk(chunk):
+    chunk.columns = chunk.columns.str.strip().str.replace('"', '')
+    chunk = chunk[COLUMNS].fillna('Not Specified')
+    return chunk.astype('category')
+
+
+def iter_csv_chunks(file_path, chunk_size, fraction, random_state=123):
+    """Read, sample and clean the CSV one chunk at a time."""
+    rng = np.random.RandomState(random_state)
+    for chunk in pd.read_csv(file_path, chunksize=chunk_size, on_bad_lines='skip', dtype=str):
+        yield clean_chunk(chunk.sample(frac=fraction, random_state=rng))
+
+
+def iter_parquet_chunks(cache_path, chunk_size):
+    for batch in pq.ParquetFile(cache_path).iter_batches(batch_size=chunk_size, columns=COLUMNS):
+        yield batch.to_pandas().astype('category')
+
+
+def iter_clean_chunks(file_path, chunk_size, fraction, cache_path=None):
+    """
+    Yield cleaned, sampled chunks with categorical columns.
+
+    With `cache_path` set (and pyarrow installed) the first run writes the
+    cleaned chunks to Parquet and later runs read them back instead of
+    parsing the CSV again. The cache is tied to `fraction`, delete it when
+    the sampling changes.
+    """
+    if cache_path and pq is None:
+        logger.warning("pyarrow is not installed, training data will not be cached")
+        cache_path = None
+
+    if cache_path and os.path.exists(cache_path):
+        logger.info(f"Reading cleaned training data from {cache_path}")
+        yield from iter_parquet_chunks(cache_path, chunk_size)
+        return
+
+    writer = None
+    try:
+        for chunk in iter_csv_chunks(file_path, chunk_size, fraction):
+            if cache_path:
+                table = pa.Table.from_pandas(chunk.astype(str), preserve_index=False)
+                if writer is None:
+                    writer = pq.ParquetWriter(cache_path + '.tmp', table.schema)
+                writer.write_table(table)
+            yield chunk
+    finally:
+        if writer is not None:
+            writer.close()
+    if writer is not None:
+        os.replace(cache_path + '.tmp', cache_path)
+
+
+class InteractionAccumulator:
+    """
+    Streams chunks into `(user_idx, artist_idx, track_idx, count)` arrays.
+
+    Every chunk is reduced to its per-(user, artist, track) counts before it
+    is appended, so memory grows with the number of distinct interactions
+    and not with the number of CSV rows.
+    """
+
+    def __init__(self):
+        self.users = Vocabulary()
+        self.artists = Vocabulary()
+        self.tracks = Vocabulary()
+        self.user_idx = GrowableArray()
+        self.artist_idx = GrowableArray()
+        self.track_idx = GrowableArray()
+        self.counts = GrowableArray()
+        self.rows = 0
+
+    def add_chunk(self, chunk):
+        if chunk.empty:
+            return
+        codes = pd.DataFrame({
+            'user': self.users.encode(chunk['user_id']),
+            'artist': self.artists.encode(chunk['artistname']),
+            'track': self.tracks.encode(chunk['trackname']),
+        })
+        counts = codes.groupby(['user', 'artist', 'track'], sort=False).size()
+        self.user_idx.extend(counts.index.get_level_values('user'))
+        self.artist_idx.extend(counts.index.get_level_values('artist'))
+        self.track_idx.extend(counts.index.get_level_values('track'))
+        self.counts.extend(counts.to_numpy())
+        self.rows += len(chunk)
+
+    def filter(self, min_artist_records=50, min_user_artists=10):
+        """
+        Apply the training filters: artists with at least `min_artist_records`
+        records, then users who played at least `min_user_artists` of them.
+        Returns a boolean mask over the accumulated interactions.
+        """
+        users, artists, counts = self.user_idx.array(), self.artist_idx.array(), self.counts.array()
+        artist_records = np.bincount(artists, weights=counts, minlength=len(self.artists))
+        keep = artist_records[artists] >= min_artist_records
+
+        user_artists = coo_matrix(
+            (np.ones(keep.sum(), dtype=np.int8), (users[keep], artists[keep])),
+            shape=(len(self.users), len(self.artists)),
+        ).tocsr()
+        user_artists.sum_duplicates()
+        keep &= user_artists.getnnz(axis=1)[users] >= min_user_artists
+        return keep
+
+    def build_matrices(self, keep=None):
+        """
+        Build the user x artist and user x track play-count CSR matrices.
+
+        Both matrices share one `user_dict`; item dictionaries only contain
+        items left after filtering.
+        """
+        if keep is None:
+            keep = np.ones(self.counts.size, dtype=bool)
+        counts = self.counts.array()[keep]
+        user_codes, users = np.unique(self.user_idx.array()[keep], return_inverse=True)
+        user_dict = dict(zip(self.users.values()[user_codes], range(len(user_codes))))
+
+        matrices = []
+        for vocabulary, item_idx in ((self.artists, self.artist_idx), (self.tracks, self.track_idx)):
+            item_codes, items = np.unique(item_idx.array()[keep], return_inverse=True)
+            item_dict = dict(zip(vocabulary.values()[item_codes], range(len(item_codes))))
+            # Duplicate (user, item) pairs from different chunks are summed by tocsr
+            matrix = coo_matrix((counts, (users, items)), shape=(len(user_codes), len(item_codes))).tocsr()
+            matrices.append((matrix, item_dict))
+
+        (interactions_artist, item_dict_artist), (interactions_track, item_dict_track) = matrices
+        return interactions_artist, interactions_track, user_dict, item_dict_artist, item_dict_track
+
+
+def load_interactions(file_path, chunk_size, fraction, min_artist_records=50, min_user_artists=10, cache_path=None):
+    """Stream the dataset into filtered artist and track interaction matrices."""
+    accumulator = InteractionAccumulator()
+    for chunk in iter_clean_chunks(file_path, chunk_size, fraction, cache_path):
+        accumulator.add_chunk(chunk)
+    logger.info(f"Accumulated {accumulator.counts.size:,} interactions from {accumulator.rows:,} sampled records")
+
+    keep = accumulator.filter(min_artist_records, min_user_artists)
+    return accumulator.build_matrices(keep)
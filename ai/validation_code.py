@@ -3,6 +3,7 @@ import joblib
 import warnings
 from scipy.sparse import coo_matrix
 from lightfm import LightFM
+from id_map import load_id_map
 
 warnings.simplefilter(action='ignore', category=FutureWarning)
 
@@ -14,10 +15,10 @@ user_features = [
 ]
 
 # Load the saved user to index mapping
-user_id_to_index = joblib.load('user_id_to_index.pkl')
+user_id_to_index = load_id_map('user_id_to_index')
 
 # Verify contents
-print("User ID to Index Mapping:", user_id_to_index)
+print("User ID to Index Mapping:", dict(user_id_to_index.items()))
 
 # Debugging - Print all user features
 print("User Features Provided:", user_features)
@@ -7,7 +7,9 @@ from neomodel import (AsyncStructuredNode, StringProperty, IntegerProperty,
 
 
 class Album(LikedItem):
-    name = StringProperty(required=True)
+    name = StringProperty(index=True, required=True)
+    # First artist as the provider names it, part of the merge key
+    artist_name = StringProperty()
 
     users = AsyncRelationshipFrom('.user.User', 'LIKES_ALBUM')
     tracks = AsyncRelationshipFrom('.track.Track', 'INCLUDED_IN')
@@ -3,7 +3,7 @@ from neomodel import (StringProperty, IntegerProperty, AsyncRelationshipTo, Asyn
 
 
 class Artist(LikedItem):
-    name = StringProperty(max_length=255)
+    name = StringProperty(index=True, max_length=255)
     
     top_items = AsyncRelationshipFrom('.user', 'TOP_ARTIST')
     library_items = AsyncRelationshipFrom('.user', 'LIBRARY_ITEM')
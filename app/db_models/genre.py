@@ -9,7 +9,7 @@ from neomodel import (AsyncStructuredNode, StringProperty, IntegerProperty,
     UniqueIdProperty, AsyncRelationshipTo, AsyncRelationshipFrom)
 
 class Genre(LikedItem):
-    name = StringProperty()
+    name = StringProperty(index=True)
     artists = AsyncRelationshipTo(Artist, 'HAS_ARTIST')
     users = AsyncRelationshipFrom('.user.User', 'LIKES')
     tracks = AsyncRelationshipTo(Track, 'HAS_TRACK')
@@ -3,7 +3,7 @@ from ..album import Album
 
 class LastfmAlbum(Album):
     lastfm_id = StringProperty(unique_index=True) 
-    name = StringProperty()
+    name = StringProperty(index=True)
   
 
     async def serialize(self):
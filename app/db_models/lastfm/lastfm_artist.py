@@ -4,7 +4,7 @@ from ..artist import Artist
 
 class LastfmArtist(Artist):
     lastfm_id = StringProperty(unique_index=True)
-    name = StringProperty()
+    name = StringProperty(index=True)
 
     
     async def serialize(self):
@@ -1,9 +1,11 @@
-from neomodel import StructuredNode, StringProperty
+from neomodel import StructuredNode, StringProperty, IntegerProperty
 from ..genre import Genre
 
 class LastfmGenre(StructuredNode):
     __label__ = 'LastfmGenre'
     name = StringProperty(unique_index=True)
+    merge_key = StringProperty(index=True)
+    merge_key_version = IntegerProperty()
     
     async def serialize(self):
         return {
@@ -4,7 +4,7 @@ from app.db_models.track import Track
 
 class LastfmTrack(Track):
     lastfm_id = StringProperty(unique_index=True)
-    name = StringProperty()
+    name = StringProperty(index=True)
     
     async def serialize(self):
         return {
@@ -1,8 +1,16 @@
 from neomodel import (AsyncStructuredNode, UniqueIdProperty,
-    AsyncRelationshipTo)
+    AsyncRelationshipTo, StringProperty, IntegerProperty, ArrayProperty)
 
 class LikedItem(AsyncStructuredNode):
     uid = UniqueIdProperty()
+    # Blocking key of duplicates across providers, see EntityMergeEngine
+    merge_key = StringProperty(index=True)
+    merge_key_version = IntegerProperty()
+    # Near-duplicate matching of tracks, see entity_matching.MinHasher
+    match_artist = StringProperty()
+    minhash = ArrayProperty(IntegerProperty())
+    lsh_bands = ArrayProperty(StringProperty())
+    buckets = AsyncRelationshipTo('.lsh_bucket.LshBucket', 'IN_BUCKET')
 
     async def serialize(self):
         return {
@@ -0,0 +1,14 @@
+from neomodel import AsyncStructuredNode, StringProperty, AsyncRelationshipFrom
+
+
+class LshBucket(AsyncStructuredNode):
+    """
+    One LSH band value of MinHash signatures, `ItemType:band:digest`, with the
+    item nodes in it. `shared_key` repeats the key once a second item joins,
+    so candidate buckets are paged through its index without the singletons.
+    See EntityMergeEngine.match.
+    """
+    key = StringProperty(unique_index=True)
+    shared_key = StringProperty(index=True)
+
+    items = AsyncRelationshipFrom('.liked_item.LikedItem', 'IN_BUCKET')
@@ -0,0 +1,11 @@
+from neomodel import AsyncStructuredNode, StringProperty, AsyncRelationshipTo
+
+
+class MergedKey(AsyncStructuredNode):
+    """
+    Provider key of an item node merged into another, `Label.property:value`,
+    pointing at the node that kept its relationships. See EntityMergeEngine.
+    """
+    key = StringProperty(unique_index=True)
+
+    node = AsyncRelationshipTo('.liked_item.LikedItem', 'ALIAS_OF')
@@ -22,39 +22,17 @@ def resolve_node_class(labels):
     return None
 
 def custom_install_labels():
-    from neomodel import db, RelationshipTo, RelationshipFrom
-    from app.db_models.spotify.spotify_user import SpotifyUser
-    from app.db_models.spotify.spotify_artist import SpotifyArtist
-    from app.db_models.spotify.spotify_track import SpotifyTrack
-    from app.db_models.spotify.spotify_album import SpotifyAlbum
-    from app.db_models.spotify.spotify_genre import SpotifyGenre
-    from app.db_models.spotify.spotify_image import SpotifyImage
-    from app.db_models.liked_item import LikedItem
-    from app.db_models.artist import Artist
-    from app.db_models.track import Track
-    from app.db_models.album import Album
-
-    def install_labels(cls, quiet=False, stdout=None):
-        if not hasattr(cls, '__label__'):
-            return
-
-        label = cls.__label__
-        properties = cls.defined_properties(aliases=False, properties=False)
-        for name, property in properties.items():
-            if not isinstance(property, (RelationshipTo, RelationshipFrom)):
-                if hasattr(property, 'unique_index') and property.unique_index:
-                    query = f"CREATE CONSTRAINT ON (n:{label}) ASSERT n.{name} IS UNIQUE"
-                    try:
-                        db.cypher_query(query)
-                        if not quiet:
-                            print(f" + Creating node unique constraint for {name} on label {label} for class {cls.__module__}.{cls.__name__}", file=stdout)
-                    except Exception as e:
-                        print(f" ! Error creating constraint for {name} on label {label}: {str(e)}", file=stdout)
-
-    for cls in [SpotifyUser, SpotifyArtist, SpotifyTrack, SpotifyAlbum, SpotifyGenre, SpotifyImage, LikedItem, Artist, Track, Album]:
-        install_labels(cls)
-
-    logger.info("All labels installed successfully.")
+    """Creates the missing constraints and indexes of all node classes, see `schema.install_schema`."""
+    from app.db_models.schema import install_schema
+
+    try:
+        result = install_schema(wait=False)
+    except Exception as e:
+        logger.error(f"Error installing the graph schema: {e}")
+        return
+    for (kind, label, name), error in result['failed']:
+        logger.error(f"Could not create {kind} on {label}.{name}: {error}")
+    logger.info(f"Graph schema installed, {len(result['created'])} constraints and indexes created.")
 
 # Set the Neo4j connection
 db.set_connection(settings.NEOMODEL_NEO4J_BOLT_URL)
@@ -2,9 +2,9 @@ from neomodel import AsyncStructuredNode, StringProperty, UniqueIdProperty, Asyn
 
 class ParentUser(AsyncStructuredNode):
     uid = UniqueIdProperty()
-    username = StringProperty(unique=True, required=True)
-    email = StringProperty(unique=True, required=True)
-    access_token = StringProperty()
+    username = StringProperty(unique_index=True, required=True)
+    email = StringProperty(unique_index=True, required=True)
+    access_token = StringProperty(index=True)
     token_created_at = DateTimeProperty()
 
     spotify_account = AsyncRelationshipTo('app.db_models.spotify.spotify_user.SpotifyUser', 'CONNECTED_TO_SPOTIFY')
@@ -0,0 +1,145 @@
+import importlib
+import logging
+from neomodel import db, StructuredNode, AsyncStructuredNode
+
+logger = logging.getLogger(__name__)
+
+# Every module defining node classes, imported so all of them are registered
+NODE_MODULES = [
+    'app.db_models.parent_user',
+    'app.db_models.user',
+    'app.db_models.user_properties',
+    'app.db_models.liked_item',
+    'app.db_models.artist',
+    'app.db_models.track',
+    'app.db_models.album',
+    'app.db_models.genre',
+    'app.db_models.image',
+    'app.db_models.spotify.spotify_user',
+    'app.db_models.spotify.spotify_artist',
+    'app.db_models.spotify.spotify_track',
+    'app.db_models.spotify.spotify_album',
+    'app.db_models.spotify.spotify_genre',
+    'app.db_models.spotify.spotify_image',
+    'app.db_models.lastfm.lastfm_user',
+    'app.db_models.lastfm.lastfm_artist',
+    'app.db_models.lastfm.lastfm_track',
+    'app.db_models.lastfm.lastfm_album',
+    'app.db_models.lastfm.lastfm_genre',
+    'app.db_models.ytmusic.ytmusic_user',
+    'app.db_models.ytmusic.ytmusic_artist',
+    'app.db_models.ytmusic.ytmusic_track',
+    'app.db_models.ytmusic.ytmusic_album',
+    'app.db_models.mal.mal_user',
+    'app.db_models.mal.mal_anime',
+    'app.db_models.mal.mal_manga',
+    'app.db_models.mal.main_picture',
+    'app.db_models.mal.list_status',
+    'app.db_models.imdb.imdb_user',
+    'app.db_models.imdb.imdb_movie',
+    'app.db_models.combined.combined_track',
+    'app.db_models.combined.combined_artist',
+    'app.db_models.combined.combined_album',
+    'app.db_models.combined.combined_genre',
+    'app.db_models.merged_key',
+    'app.db_models.lsh_bucket',
+]
+
+UNIQUE = 'unique'
+INDEX = 'index'
+
+
+def node_classes():
+    """All node classes of the app, including inherited and combined ones."""
+    for module in NODE_MODULES:
+        importlib.import_module(module)
+    classes = []
+    pending = [StructuredNode, AsyncStructuredNode]
+    while pending:
+        for cls in pending.pop().__subclasses__():
+            if cls not in classes:
+                classes.append(cls)
+                pending.append(cls)
+    return [cls for cls in classes if cls.__module__.startswith('app.')]
+
+
+def node_label(cls):
+    # A class can set several labels in __label__, the first one is its own
+    return getattr(cls, '__label__', cls.__name__).split(':')[0]
+
+
+def declared_schema():
+    """
+    `(kind, label, property)` of every unique or indexed property of the node
+    classes. Inherited properties are declared on the label of each subclass,
+    a lookup on `SpotifyTrack` is then served by its own index.
+    """
+    schema = set()
+    for cls in node_classes():
+        for name, prop in cls.defined_properties(aliases=False, rels=False).items():
+            db_property = prop.db_property or name
+            if prop.unique_index:
+                schema.add((UNIQUE, node_label(cls), db_property))
+            elif prop.index:
+                schema.add((INDEX, node_label(cls), db_property))
+    # A uniqueness constraint comes with an index, the property needs no other one
+    unique = {(label, name) for kind, label, name in schema if kind == UNIQUE}
+    return sorted(item for item in schema if item[0] == UNIQUE or item[1:] not in unique)
+
+
+def existing_schema():
+    """`(kind, label, property)` of the single-property node constraints and indexes in the database."""
+    existing = set()
+    results, _ = db.cypher_query(
+        "SHOW CONSTRAINTS YIELD type, entityType, labelsOrTypes, properties "
+        "WHERE entityType = 'NODE' AND type IN ['UNIQUENESS', 'NODE_PROPERTY_UNIQUENESS'] "
+        "RETURN labelsOrTypes, properties"
+    )
+    for labels, properties in results:
+        if len(labels) == 1 and len(properties) == 1:
+            existing.add((UNIQUE, labels[0], properties[0]))
+            existing.add((INDEX, labels[0], properties[0]))
+    results, _ = db.cypher_query(
+        "SHOW INDEXES YIELD type, entityType, labelsOrTypes, properties "
+        "WHERE entityType = 'NODE' AND type = 'RANGE' "
+        "RETURN labelsOrTypes, properties"
+    )
+    for labels, properties in results:
+        if len(labels) == 1 and len(properties) == 1:
+            existing.add((INDEX, labels[0], properties[0]))
+    return existing
+
+
+def missing_schema():
+    existing = existing_schema()
+    return [item for item in declared_schema() if item not in existing]
+
+
+def schema_statement(kind, label, name):
+    if kind == UNIQUE:
+        return (f"CREATE CONSTRAINT {label.lower()}_{name.lower()}_unique IF NOT EXISTS "
+                f"FOR (n:{label}) REQUIRE n.{name} IS UNIQUE")
+    return f"CREATE INDEX {label.lower()}_{name.lower()}_index IF NOT EXISTS FOR (n:{label}) ON (n.{name})"
+
+
+def install_schema(dry_run=False, wait=True):
+    """
+    Creates the missing constraints and indexes of `declared_schema`.
+
+    Returns the `missing` items, the `created` ones and the `failed` ones with
+    their error, e.g. a uniqueness constraint over duplicated values. With
+    `wait`, returns once the new indexes are populated and serve lookups.
+    """
+    missing = missing_schema()
+    created, failed = [], []
+    if not dry_run:
+        for item in missing:
+            try:
+                db.cypher_query(schema_statement(*item))
+                created.append(item)
+            except Exception as e:
+                logger.error(f"Error creating {item[0]} on {item[1]}.{item[2]}: {e}")
+                failed.append((item, str(e)))
+        if created and wait:
+            db.cypher_query("CALL db.awaitIndexes(300)")
+    return {'missing': missing, 'created': created, 'failed': failed}
@@ -7,7 +7,7 @@ logger = logging.getLogger('app')
 
 class SpotifyArtist(Artist):
     spotify_id = StringProperty(unique_index=True)
-    href = StringProperty( unique_index=True, max_length=255,default="")
+    href = StringProperty(max_length=255, default="")
     popularity = IntegerProperty( min_value=1, max_value=255,default=0)
     type = StringProperty( max_length=255,default="")
     uri = StringProperty( max_length=255,default="")
@@ -3,7 +3,9 @@ from neomodel import (AsyncStructuredNode, StringProperty, IntegerProperty,
 from .liked_item import LikedItem
 from .album import Album
 class Track(LikedItem):
-    name = StringProperty( min_length=1, max_length=255)
+    name = StringProperty(index=True, min_length=1, max_length=255)
+    # First performer as the provider names it, part of the merge key
+    artist_name = StringProperty()
     
     album =  AsyncRelationshipTo(Album, 'INCLUDED_IN')
     artists = AsyncRelationshipTo('.artist.Artist', 'PERFORMED_BY')
@@ -9,7 +9,7 @@ class User(AsyncStructuredNode):
     is_active = BooleanProperty()
     service = StringProperty()
 
-    access_token = StringProperty()
+    access_token = StringProperty(index=True)
     refresh_token = StringProperty()
     expires_at = IntegerProperty()
     expires_in = IntegerProperty()
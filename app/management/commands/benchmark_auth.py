@@ -0,0 +1,65 @@
+import asyncio
+import time
+from asgiref.sync import sync_to_async
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.test import RequestFactory
+from rest_framework_simplejwt.tokens import RefreshToken
+from app.middlewares import identity
+
+
+class Command(BaseCommand):
+    help = (
+        'Compare request authentication through the sync path, run in a thread '
+        'as a sync middleware in an async stack is, with the async-native path'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--username', help='User to authenticate as, defaults to the first user')
+        parser.add_argument('--requests', type=int, default=2000, help='Requests per run')
+        parser.add_argument('--concurrency', type=int, default=50, help='Requests in flight')
+        parser.add_argument('--no-cache', action='store_true', help='Clear the identity cache before every request')
+
+    def handle(self, *args, **options):
+        User = get_user_model()
+        users = User.objects.filter(username=options['username']) if options['username'] else User.objects.order_by('id')
+        user = users.first()
+        if user is None:
+            raise CommandError('No user to authenticate as')
+
+        token = str(RefreshToken.for_user(user).access_token)
+        factory = RequestFactory()
+        make_request = lambda: factory.get('/', HTTP_AUTHORIZATION=f'Bearer {token}')
+
+        def sync_path(request):
+            if options['no_cache']:
+                identity.user_cache.clear()
+            return identity.authenticate(request)
+
+        async def async_path(request):
+            if options['no_cache']:
+                identity.user_cache.clear()
+            return await identity.aauthenticate(request)
+
+        runs = [
+            ('sync (thread hop)', sync_to_async(sync_path)),
+            ('async', async_path),
+        ]
+        for name, authenticate in runs:
+            identity.user_cache.clear()
+            elapsed = asyncio.run(self.run(authenticate, make_request, options['requests'], options['concurrency']))
+            self.stdout.write(
+                f"{name:<18} {options['requests'] / elapsed:>10.0f} req/s "
+                f"{elapsed / options['requests'] * 1e6:>8.1f} us/req"
+            )
+
+    async def run(self, authenticate, make_request, total, concurrency):
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def one():
+            async with semaphore:
+                await authenticate(make_request())
+
+        started = time.perf_counter()
+        await asyncio.gather(*(one() for _ in range(total)))
+        return time.perf_counter() - started
@@ -0,0 +1,93 @@
+import asyncio
+import time
+from types import SimpleNamespace
+from aiohttp import web
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.test import override_settings
+from neomodel import db
+from app.services.entity_cache import EntityCache
+from app.services.mal_bulk_writer import MAL_LABELS
+from app.services.mal_fetcher import MalFetcher, close_session
+from app.services.mal_service import MalService
+
+
+class Command(BaseCommand):
+    help = (
+        'Measure MAL list ingestion in items/s against a local mock of the MAL '
+        'API, with the next page prefetched while the current one is written and without'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--items', type=int, default=5000, help='Items of the mock anime list')
+        parser.add_argument('--page-size', type=int, default=100, help='Items per list page')
+        parser.add_argument('--latency', type=float, default=50, help='Milliseconds the mock waits before each page')
+        parser.add_argument('--id-offset', type=int, default=10 ** 9,
+                            help='First anime id of the mock list, its nodes are deleted after each run')
+        parser.add_argument('--no-write', action='store_true', help='Only fetch the pages, without writing the items')
+
+    def handle(self, *args, **options):
+        asyncio.run(self.benchmark(options))
+
+    async def benchmark(self, options):
+        runner = web.AppRunner(self.mock_app(options))
+        await runner.setup()
+        site = web.TCPSite(runner, '127.0.0.1', 0)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+        user = SimpleNamespace(access_token='benchmark')
+        service = MalService(settings.MAL_CLIENT_ID, settings.MAL_CLIENT_SECRET, settings.MAL_REDIRECT_URI, settings.MAL_SCOPE)
+
+        try:
+            with override_settings(MAL_API_URL=f'http://127.0.0.1:{port}', MAL_PAGE_SIZE=options['page_size']):
+                for name, prefetch in (('sequential', False), ('prefetch', True)):
+                    started = time.perf_counter()
+                    if options['no_write']:
+                        count = 0
+                        async for page in MalFetcher(user.access_token).list_pages('anime', prefetch=prefetch):
+                            count += len(page['data'])
+                    else:
+                        ids = await service.get_top_list(user, 'anime', prefetch=prefetch)
+                        count = len(ids or [])
+                    elapsed = time.perf_counter() - started
+                    self.stdout.write(f"{name:<12} {count:>8} items {count / elapsed:>10.0f} items/s {elapsed:>8.2f} s")
+                    if not options['no_write']:
+                        await self.cleanup(options)
+        finally:
+            await close_session()
+            await runner.cleanup()
+
+    @staticmethod
+    def mock_app(options):
+        async def animelist(request):
+            await asyncio.sleep(options['latency'] / 1000)
+            limit = int(request.query.get('limit', 100))
+            offset = int(request.query.get('offset', 0))
+            end = min(offset + limit, options['items'])
+            data = [
+                {'node': {
+                    'id': options['id_offset'] + i,
+                    'title': f'Benchmark anime {i}',
+                    'main_picture': {'medium': f'https://example.com/{i}/m.jpg', 'large': f'https://example.com/{i}/l.jpg'},
+                }}
+                for i in range(offset, end)
+            ]
+            paging = {}
+            if end < options['items']:
+                paging['next'] = str(request.url.with_query({'limit': limit, 'offset': end}))
+            return web.json_response({'data': data, 'paging': paging})
+
+        app = web.Application()
+        app.router.add_get('/users/@me/animelist', animelist)
+        return app
+
+    @staticmethod
+    async def cleanup(options):
+        label, key = MAL_LABELS['anime']
+        await sync_to_async(db.cypher_query)(
+            f"MATCH (n:{label}) WHERE n.{key} >= $offset "
+            f"OPTIONAL MATCH (n)-[:HAS_PICTURE]->(p:MainPicture) DETACH DELETE n, p",
+            {'offset': options['id_offset']})
+        for i in range(options['items']):
+            await EntityCache.forget(label, options['id_offset'] + i)
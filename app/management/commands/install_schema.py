@@ -0,0 +1,74 @@
+import statistics
+import time
+from django.core.management.base import BaseCommand, CommandError
+from neomodel import db
+from app.db_models.schema import declared_schema, existing_schema, install_schema, schema_statement
+
+
+class Command(BaseCommand):
+    help = (
+        'Create the uniqueness constraints and indexes of the unique or indexed '
+        'properties of all node classes, reporting the ones that were missing'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help='Only report the missing constraints and indexes')
+        parser.add_argument('--benchmark', action='store_true',
+                            help='Time lookups on the missing properties before and after creating them')
+        parser.add_argument('--runs', type=int, default=100, help='Lookups per property when benchmarking')
+
+    def handle(self, *args, **options):
+        try:
+            declared = declared_schema()
+            existing = existing_schema()
+        except Exception as e:
+            raise CommandError(f'Error reading the graph schema: {e}')
+        missing = [item for item in declared if item not in existing]
+
+        self.stdout.write(f"{len(declared)} constraints and indexes declared, {len(missing)} missing")
+        for item in missing:
+            self.stdout.write(f" - {schema_statement(*item)}")
+        if options['dry_run'] or not missing:
+            return
+
+        samples = self.lookup_samples(missing) if options['benchmark'] else {}
+        before = {item: self.time_lookup(item, value, options['runs']) for item, value in samples.items()}
+
+        result = install_schema()
+        for item in result['created']:
+            self.stdout.write(self.style.SUCCESS(f" + {item[0]} on {item[1]}.{item[2]}"))
+        for item, error in result['failed']:
+            self.stdout.write(self.style.ERROR(f" ! {item[0]} on {item[1]}.{item[2]}: {error}"))
+
+        if before:
+            self.stdout.write(f"\n{'lookup':<40} {'before ms':>10} {'after ms':>10}")
+            for item, value in samples.items():
+                after = self.time_lookup(item, value, options['runs'])
+                self.stdout.write(f"{item[1] + '.' + item[2]:<40} {before[item]:>10.3f} {after:>10.3f}")
+
+        if result['failed']:
+            raise CommandError(f"{len(result['failed'])} constraints or indexes could not be created")
+
+    @staticmethod
+    def lookup_samples(items):
+        """A value stored in each property, lookups of a value that exists hit the worst case."""
+        samples = {}
+        for item in items:
+            _, label, name = item
+            results, _ = db.cypher_query(
+                f"MATCH (n:{label}) WHERE n.{name} IS NOT NULL RETURN n.{name} LIMIT 1")
+            if results:
+                samples[item] = results[0][0]
+        return samples
+
+    @staticmethod
+    def time_lookup(item, value, runs):
+        """Median milliseconds of `MATCH (n:Label {property: $value})`."""
+        _, label, name = item
+        query = f"MATCH (n:{label} {{{name}: $value}}) RETURN count(n)"
+        timings = []
+        for _ in range(runs):
+            started = time.perf_counter()
+            db.cypher_query(query, {'value': value})
+            timings.append((time.perf_counter() - started) * 1000)
+        return statistics.median(timings)
@@ -0,0 +1,17 @@
+import asyncio
+from django.core.management.base import BaseCommand, CommandError
+from app.services.recommendation_service import precompute_recommendations
+
+class Command(BaseCommand):
+    help = 'Precompute the top-N artist and track recommendations of every trained user'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--top-n', type=int, help='Recommendations kept per user and item type')
+        parser.add_argument('--block-size', type=int, default=1024, help='Users scored per matrix product')
+
+    def handle(self, *args, **options):
+        try:
+            total = asyncio.run(precompute_recommendations(options['top_n'], block_size=options['block_size']))
+        except Exception as e:
+            raise CommandError(f'Error precomputing recommendations: {e}')
+        self.stdout.write(self.style.SUCCESS(f'Precomputed {total} recommendation list(s)'))
@@ -0,0 +1,25 @@
+import asyncio
+from django.core.management.base import BaseCommand, CommandError
+from app.services.bud_index_service import BudIndexService, all_dimensions
+
+class Command(BaseCommand):
+    help = 'Rebuild the precomputed bud similarity index'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dimension', action='append', choices=all_dimensions(),
+                            help='Only rebuild the given dimension (can be repeated)')
+        parser.add_argument('--user', type=str, help='Only rebuild the lists of the user with this uid')
+        parser.add_argument('--batch-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        dimensions = options['dimension'] or all_dimensions()
+        if options['user']:
+            asyncio.run(BudIndexService.update_user(options['user'], dimensions))
+            self.stdout.write(self.style.SUCCESS(f"Rebuilt bud index for user {options['user']}"))
+            return
+
+        try:
+            total = asyncio.run(BudIndexService.rebuild(dimensions, batch_size=options['batch_size']))
+        except Exception as e:
+            raise CommandError(f'Error rebuilding bud index: {e}')
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt bud index for {total} user(s) on {len(dimensions)} dimension(s)'))
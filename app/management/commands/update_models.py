@@ -0,0 +1,17 @@
+import asyncio
+from django.core.management.base import BaseCommand, CommandError
+from app.services.model_update_service import ModelUpdateService
+
+class Command(BaseCommand):
+    help = 'Fold the likes synced since the last run into the recommendation models'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--epochs', type=int, help='fit_partial epochs over the new interactions')
+        parser.add_argument('--limit', type=int, help='Only update the models for this many pending users')
+
+    def handle(self, *args, **options):
+        try:
+            total = asyncio.run(ModelUpdateService.run(epochs=options['epochs'], limit=options['limit']))
+        except Exception as e:
+            raise CommandError(f'Error updating models: {e}')
+        self.stdout.write(self.style.SUCCESS(f'Updated models for {total} user(s)'))
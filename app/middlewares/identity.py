@@ -0,0 +1,150 @@
+import copy
+import logging
+import jwt
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.exceptions import ImproperlyConfigured
+from rest_framework.exceptions import AuthenticationFailed
+from app.services.ttl_cache import TTLCache
+
+logger = logging.getLogger(__name__)
+
+# Short-lived process caches shared by requests, keyed by JWT user_id and
+# username. A deleted user or changed profile is seen after at most
+# IDENTITY_CACHE_TTL seconds.
+user_cache = TTLCache(getattr(settings, 'IDENTITY_CACHE_SIZE', 1024), getattr(settings, 'IDENTITY_CACHE_TTL', 30))
+parent_user_cache = TTLCache(getattr(settings, 'IDENTITY_CACHE_SIZE', 1024), getattr(settings, 'IDENTITY_CACHE_TTL', 30))
+
+
+def http_request(request):
+    # DRF's Request wraps the HttpRequest the middlewares saw, the identity lives on the latter
+    return getattr(request, '_request', request)
+
+
+def get_token(request):
+    auth_header = request.META.get('HTTP_AUTHORIZATION')
+    if auth_header and auth_header.startswith('Bearer '):
+        return auth_header.split()[1]
+    return None
+
+
+def decode_token(token):
+    try:
+        return jwt.decode(token, settings.SECRET_KEY, algorithms=['HS256'])
+    except jwt.ExpiredSignatureError:
+        raise AuthenticationFailed('Token has expired')
+    except jwt.InvalidTokenError:
+        raise AuthenticationFailed('Invalid token')
+
+
+def user_id_of(payload):
+    user_id = payload.get('user_id')
+    if not user_id:
+        raise AuthenticationFailed('Token contained no recognizable user identification')
+    return user_id
+
+
+def load_user(payload):
+    User = get_user_model()
+    user_id = user_id_of(payload)
+    user = user_cache.get(user_id)
+    if user is None:
+        try:
+            user = User.objects.get(id=user_id)
+        except User.DoesNotExist:
+            raise AuthenticationFailed('User not found')
+        user_cache.set(user_id, user)
+    return copy.copy(user)
+
+
+async def aload_user(payload):
+    User = get_user_model()
+    user_id = user_id_of(payload)
+    user = user_cache.get(user_id)
+    if user is None:
+        try:
+            user = await User.objects.aget(id=user_id)
+        except User.DoesNotExist:
+            raise AuthenticationFailed('User not found')
+        user_cache.set(user_id, user)
+    return copy.copy(user)
+
+
+def forget(user):
+    """Drop a user from the process caches after changing it."""
+    user_cache.pop(user.id)
+    parent_user_cache.pop(user.username)
+
+
+def authenticate(request):
+    """
+    `(user, token)` of the request's bearer token, or None without one.
+
+    The token is decoded and the user loaded once per request; later calls
+    from the middleware, DRF authentication or views reuse the result,
+    including an AuthenticationFailed or any other error. Sync callers
+    only, see `aauthenticate`.
+    """
+    request = http_request(request)
+    if not hasattr(request, '_identity'):
+        try:
+            token = get_token(request)
+            request._identity = ((load_user(decode_token(token)), token) if token else None, None)
+        except Exception as e:
+            # Kept as well, so a database error is not retried by a later caller
+            request._identity = (None, e)
+    return identity_result(request)
+
+
+async def aauthenticate(request):
+    """`authenticate` for the event loop, the user is loaded with the async ORM."""
+    request = http_request(request)
+    if not hasattr(request, '_identity'):
+        try:
+            token = get_token(request)
+            request._identity = ((await aload_user(decode_token(token)), token) if token else None, None)
+        except Exception as e:
+            # Kept as well, so a database error is not retried by a later caller
+            request._identity = (None, e)
+    return identity_result(request)
+
+
+def resolved_identity(request):
+    """The result of `aauthenticate`, which JWTAuthMiddleware runs for every request."""
+    request = http_request(request)
+    if not hasattr(request, '_identity'):
+        raise ImproperlyConfigured('JWTAuthMiddleware must authenticate requests before DRF views')
+    return identity_result(request)
+
+
+def identity_result(request):
+    identity, error = request._identity
+    if error is not None:
+        raise error
+    return identity
+
+
+async def get_parent_user(request):
+    """The ParentUser of the request's user, looked up once per request."""
+    request = http_request(request)
+    if hasattr(request, '_parent_user'):
+        return request._parent_user
+
+    from app.db_models.parent_user import ParentUser
+
+    parent_user = None
+    user = getattr(request, 'user', None)
+    if user and user.is_authenticated:
+        cached = parent_user_cache.get(user.username)
+        if cached is not None:
+            # Each request gets its own copy, views may change its properties
+            parent_user = copy.copy(cached)
+        else:
+            try:
+                parent_user = await ParentUser.nodes.get(username=user.username)
+                parent_user_cache.set(user.username, parent_user)
+                parent_user = copy.copy(parent_user)
+            except ParentUser.DoesNotExist:
+                parent_user = None
+    request._parent_user = parent_user
+    return parent_user
@@ -1,26 +1,26 @@
 import logging
-from django.utils.functional import SimpleLazyObject
-from asgiref.sync import sync_to_async
-import asyncio
+from asgiref.sync import markcoroutinefunction
+from app.middlewares import identity
 
 logger = logging.getLogger(__name__)
 
 class JWTAuthMiddleware:
+    # Async only, so the middleware chain runs on the event loop without thread hops
+    async_capable = True
+    sync_capable = False
+
     def __init__(self, get_response):
         self.get_response = get_response
+        markcoroutinefunction(self)
 
-    def __call__(self, request):
-        request.user = self._get_user(request)
-        return self.get_response(request)
-
-    def _get_user(self, request):
-        from .async_jwt_authentication import AsyncJWTAuthentication
+    async def __call__(self, request):
+        request.user = await self._get_user(request)
+        return await self.get_response(request)
 
-        auth = AsyncJWTAuthentication()
+    async def _get_user(self, request):
         try:
-            user, _ = auth.authenticate(request)
-            return user
+            authenticated = await identity.aauthenticate(request)
+            return authenticated[0] if authenticated else None
         except Exception as e:
             logger.error(f"JWTAuthMiddleware: Authentication error: {str(e)}")
             return None
-
@@ -1,19 +1,18 @@
 import logging
 from django.http import JsonResponse
 from spotipy.exceptions import SpotifyException
+from spotipy.oauth2 import SpotifyOauthError
 import json
 from urllib.parse import parse_qs
+from app.services.token_manager import TokenManager
+from app.middlewares import identity
 
 logger = logging.getLogger(__name__)
 
 class TokenMixin:
     async def dispatch(self, request, *args, **kwargs):
-        user = request.user
-        if user and user.is_authenticated:
-            parent_user = await self.get_parent_user(user.username)
-            request.parent_user = parent_user
-        else:
-            request.parent_user = None
+        # Resolved once per request, shared with ParentUserMiddleware
+        request.parent_user = await identity.get_parent_user(request)
 
         if hasattr(request, 'parent_user') and request.parent_user:
             try:
@@ -28,14 +27,6 @@ class TokenMixin:
 
         return await super().dispatch(request, *args, **kwargs)
 
-    async def get_parent_user(self, username):
-        from app.db_models.parent_user import ParentUser
-
-        try:
-            return await ParentUser.nodes.get(username=username)
-        except ParentUser.DoesNotExist:
-            return None
-
     async def check_and_refresh_tokens(self, request):
         from app.services.service_selector import get_service
         services = {
@@ -63,39 +54,21 @@ class TokenMixin:
         service = await get_service(service_name)
 
         try:
-            # Retrieve the service user
-            service_user = await service.get_service_user(request.parent_user)
-            if not service_user:
-                raise ValueError(f"No service user found for {service_name} service for user {request.parent_user.username}")
-
-            # Get the access token from the service user
-            token = service_user.access_token
-            if not token:
-                raise ValueError(f"No access token found for {service_name} service user {service_user.username}")
-
-            # Check token validity and refresh if necessary
-            try:
-                await service.check_token_validity(service_user)
-            except SpotifyException as se:
-                if se.http_status == 401:
-                    logger.info(f"{service_name.capitalize()} token expired for user {request.parent_user.username}. Refreshing token.")
-                    try:
-                        await service.refresh_access_token(service_user)
-                    except Exception as refresh_exception:
-                        logger.error(f"Failed to refresh {service_name} token: {str(refresh_exception)}")
-                        authorize_url = await service.create_authorize_url()
-                        return JsonResponse({'error': 'Token expired and could not be refreshed', 'authorize_url': authorize_url}, status=401)
-                else:
-                    raise
-
+            # Cached per user and provider, the account is only read when the token needs checking
+            await TokenManager.ensure_valid(request.parent_user, service_name, service)
         except ValueError as ve:
             logger.error(f"{service_name.capitalize()} authentication error: {str(ve)}")
             raise
+        except SpotifyOauthError as oe:
+            # A failed refresh, the refresh token was revoked or has expired
+            logger.error(f"{service_name.capitalize()} token could not be refreshed: {str(oe)}")
+            await TokenManager.invalidate(request.parent_user, service_name)
+            raise TokenExpiredError(f"{service_name.capitalize()} token expired and could not be refreshed")
         except SpotifyException as se:
             if se.http_status == 401:
                 logger.error(f"{service_name.capitalize()} token expired: {str(se)}")
-                authorize_url = await service.create_authorize_url()
-                return JsonResponse({'error': 'Token expired', 'authorize_url': authorize_url}, status=401)
+                await TokenManager.invalidate(request.parent_user, service_name)
+                raise TokenExpiredError(f"{service_name.capitalize()} token expired and could not be refreshed")
             else:
                 logger.error(f"Error checking {service_name} token: {str(se)}")
                 raise ValueError(f"Error checking {service_name} token: {str(se)}")
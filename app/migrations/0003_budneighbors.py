@@ -0,0 +1,31 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("app", "0002_djangoparentuser_access_token_and_more"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="BudNeighbors",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("user_uid", models.CharField(max_length=64)),
+                ("dimension", models.CharField(max_length=32)),
+                ("neighbors", models.JSONField(default=list)),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                "unique_together": {("user_uid", "dimension")},
+            },
+        ),
+    ]
@@ -0,0 +1,31 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("app", "0003_budneighbors"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="UserRecommendations",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("user_uid", models.CharField(max_length=64)),
+                ("item_type", models.CharField(max_length=16)),
+                ("items", models.JSONField(default=list)),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                "unique_together": {("user_uid", "item_type")},
+            },
+        ),
+    ]
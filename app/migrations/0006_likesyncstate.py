@@ -0,0 +1,32 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("app", "0005_pendingmodelupdate"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="LikeSyncState",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("user_uid", models.CharField(max_length=64)),
+                ("relation_type", models.CharField(max_length=32)),
+                ("content_hash", models.CharField(max_length=64)),
+                ("item_count", models.IntegerField(default=0)),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                "unique_together": {("user_uid", "relation_type")},
+            },
+        ),
+    ]
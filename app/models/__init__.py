@@ -1 +1,7 @@
 from .django_parent_user import DjangoParentUser
+from .bud_neighbors import BudNeighbors
+from .user_recommendations import UserRecommendations
+from .pending_model_update import PendingModelUpdate
+from .like_sync_state import LikeSyncState
+from .like_sync_job import LikeSyncJob
+from .entity_merge_job import EntityMergeJob
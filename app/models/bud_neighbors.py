@@ -0,0 +1,18 @@
+from django.db import models
+
+
+class BudNeighbors(models.Model):
+    """
+    Materialized top-K bud list for one user along one similarity dimension.
+    `neighbors` holds `[bud_uid, similarity_score]` pairs ordered by score.
+    """
+    user_uid = models.CharField(max_length=64)
+    dimension = models.CharField(max_length=32)
+    neighbors = models.JSONField(default=list)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ('user_uid', 'dimension')
+
+    def __str__(self):
+        return f"BudNeighbors(user_uid={self.user_uid}, dimension={self.dimension}, size={len(self.neighbors)})"
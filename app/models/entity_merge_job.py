@@ -0,0 +1,42 @@
+import uuid
+from django.db import models
+from django.db.models import Q
+
+
+class EntityMergeJob(models.Model):
+    """
+    A background merge of the duplicated catalog nodes of some item types.
+
+    `checkpoint` holds `{item_type: {'stage', 'after'}}`, the stage reached
+    and the last merge key whose block was committed, a failed job resumes
+    from there. `progress` counts the nodes keyed, blocks found and nodes
+    merged per item type.
+    """
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    SUCCEEDED = 'succeeded'
+    FAILED = 'failed'
+    STATUS_CHOICES = [(status, status) for status in (QUEUED, RUNNING, SUCCEEDED, FAILED)]
+    ACTIVE_STATUSES = (QUEUED, RUNNING)
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    item_types = models.CharField(max_length=64)
+    status = models.CharField(max_length=16, choices=STATUS_CHOICES, default=QUEUED)
+    stage = models.CharField(max_length=16, blank=True, default='')
+    checkpoint = models.JSONField(default=dict)
+    progress = models.JSONField(default=dict)
+    error = models.TextField(blank=True, default='')
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['item_types'],
+                condition=Q(status__in=['queued', 'running']),
+                name='unique_active_entity_merge_job',
+            ),
+        ]
+
+    def __str__(self):
+        return f"EntityMergeJob(item_types={self.item_types}, status={self.status})"
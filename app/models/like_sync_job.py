@@ -0,0 +1,42 @@
+import uuid
+from django.db import models
+from django.db.models import Q
+
+
+class LikeSyncJob(models.Model):
+    """
+    A background like sync of one provider account of a ParentUser.
+
+    `progress` holds `{stage: {'done', 'total'}}` for the fetch, map and link
+    stages. At most one queued or running job exists per user and provider.
+    """
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    SUCCEEDED = 'succeeded'
+    FAILED = 'failed'
+    STATUS_CHOICES = [(status, status) for status in (QUEUED, RUNNING, SUCCEEDED, FAILED)]
+    ACTIVE_STATUSES = (QUEUED, RUNNING)
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    user_uid = models.CharField(max_length=64)
+    provider = models.CharField(max_length=16)
+    priority = models.IntegerField(default=5)
+    status = models.CharField(max_length=16, choices=STATUS_CHOICES, default=QUEUED)
+    stage = models.CharField(max_length=16, blank=True, default='')
+    progress = models.JSONField(default=dict)
+    result = models.JSONField(default=dict)
+    error = models.TextField(blank=True, default='')
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user_uid', 'provider'],
+                condition=Q(status__in=['queued', 'running']),
+                name='unique_active_like_sync_job',
+            ),
+        ]
+
+    def __str__(self):
+        return f"LikeSyncJob(user_uid={self.user_uid}, provider={self.provider}, status={self.status})"
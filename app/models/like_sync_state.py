@@ -0,0 +1,19 @@
+from django.db import models
+
+
+class LikeSyncState(models.Model):
+    """
+    Content hash of the items a service account was last synced to along one
+    relationship type. A sync whose fetched items hash the same is skipped.
+    """
+    user_uid = models.CharField(max_length=64)
+    relation_type = models.CharField(max_length=32)
+    content_hash = models.CharField(max_length=64)
+    item_count = models.IntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ('user_uid', 'relation_type')
+
+    def __str__(self):
+        return f"LikeSyncState(user_uid={self.user_uid}, relation_type={self.relation_type}, items={self.item_count})"
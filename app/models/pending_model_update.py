@@ -0,0 +1,14 @@
+from django.db import models
+
+
+class PendingModelUpdate(models.Model):
+    """
+    A SpotifyUser whose likes changed since the last incremental model update.
+    `updated_at` is bumped on every sync so a sync during an update run is
+    picked up by the next one.
+    """
+    user_uid = models.CharField(max_length=64, unique=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"PendingModelUpdate(user_uid={self.user_uid}, updated_at={self.updated_at})"
@@ -0,0 +1,18 @@
+from django.db import models
+
+
+class UserRecommendations(models.Model):
+    """
+    Precomputed top-N recommendations for one user and item type.
+    `items` holds `[item_name, score]` pairs ordered by score.
+    """
+    user_uid = models.CharField(max_length=64)
+    item_type = models.CharField(max_length=16)
+    items = models.JSONField(default=list)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ('user_uid', 'item_type')
+
+    def __str__(self):
+        return f"UserRecommendations(user_uid={self.user_uid}, item_type={self.item_type}, size={len(self.items)})"
@@ -5,7 +5,7 @@ import time
 from django.http import JsonResponse
 from django.views.decorators.csrf import csrf_exempt
 
-from app.services.service_selector import get_service
+from app.services.service_selector import get_service_instance
 
 from app.db_models.parent_user import ParentUser 
 
@@ -77,7 +77,7 @@ async def create_user_seed(request):
               fake_artists_data[0],
               fake_artists_data[1],
         ]
-        await get_service(service).map_to_neo4j(user, 'Artist', data, "top")
+        await get_service_instance(service).map_to_neo4j(user, 'Artist', data, "top")
 
 # create top tracks
 
@@ -90,7 +90,7 @@ async def create_user_seed(request):
               fake_tracks_data[0],
               fake_tracks_data[1]
         ]
-        await get_service(service).map_to_neo4j(user, 'Track', data, "top")
+        await get_service_instance(service).map_to_neo4j(user, 'Track', data, "top")
 
 # create top genres 
 
@@ -103,7 +103,7 @@ async def create_user_seed(request):
               fake_genres_data[0],
               fake_genres_data[1]
         ]
-        await get_service(service).map_to_neo4j(user, 'Genre', data, "Track")
+        await get_service_instance(service).map_to_neo4j(user, 'Genre', data, "Track")
 # create saved artists 
 
 
@@ -116,7 +116,7 @@ async def create_user_seed(request):
               fake_artists_data[0],
               fake_artists_data[1]
         ]
-        await get_service(service).map_to_neo4j(user, 'Artist', data, "followed")
+        await get_service_instance(service).map_to_neo4j(user, 'Artist', data, "followed")
 # create saved albums
 
 
@@ -129,7 +129,7 @@ async def create_user_seed(request):
               fake_tracks_data[0],
               fake_tracks_data[1]
         ]
-        await get_service(service).map_to_neo4j(user, 'Track', data, "saved")
+        await get_service_instance(service).map_to_neo4j(user, 'Track', data, "saved")
 # create saved albums
 
 
@@ -142,7 +142,7 @@ async def create_user_seed(request):
               fake_albums_data[0],
               fake_albums_data[1]
         ]
-        await get_service(service).map_to_neo4j(user, 'Album', data, "saved")
+        await get_service_instance(service).map_to_neo4j(user, 'Album', data, "saved")
 
 
 
@@ -0,0 +1,48 @@
+import logging
+from asgiref.sync import sync_to_async
+from neomodel import db
+from app.db_models.parent_user import ParentUser
+
+logger = logging.getLogger('app')
+
+HYDRATE_BUDS_QUERY = """
+UNWIND range(0, size($uids) - 1) AS position
+MATCH (u:ParentUser {uid: $uids[position]})
+RETURN position, u
+ORDER BY position
+"""
+
+
+async def fetch_parent_users(uids):
+    """Fetch the ParentUser nodes for `uids` in one round trip, keyed by position."""
+    if not uids:
+        return {}
+    results, _ = await sync_to_async(db.cypher_query)(HYDRATE_BUDS_QUERY, {'uids': list(uids)})
+    return {position: ParentUser.inflate(node) for position, node in results}
+
+
+async def hydrate_buds(buds_results):
+    """
+    Turn ranked `(bud_uid, similarity_score)` pairs into serialized buds.
+
+    All profiles are resolved with a single UNWIND query and the ranking order
+    of `buds_results` is kept. Buds whose ParentUser no longer exists are skipped.
+    """
+    buds_results = list(buds_results)
+    buds_data = []
+    try:
+        parent_users = await fetch_parent_users([bud_uid for bud_uid, _ in buds_results])
+        for position, (bud_uid, similarity_score) in enumerate(buds_results):
+            parent_user = parent_users.get(position)
+            if parent_user is None:
+                logger.warning(f"User with uid {bud_uid} not found")
+                continue
+            buds_data.append({
+                # Clients key buds by uid, which serialize() leaves out
+                'bud': {'uid': parent_user.uid, **await parent_user.serialize()},
+                'similarity_score': similarity_score
+            })
+    except Exception as e:
+        logger.error(f'Error hydrating buds: {e}', exc_info=True)
+    logger.info(f"Hydrated {len(buds_data)} out of {len(buds_results)} buds")
+    return buds_data
@@ -0,0 +1,205 @@
+import logging
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from neomodel import db
+from app.models import BudNeighbors
+from app.services.bud_scoring_service import (
+    SCORED_ACCOUNTS, SCORE_DIMENSIONS, build_weighted_score_query, default_weights, relation_weights
+)
+from app.services.bud_similarity_service import load_similarity_engine
+
+logger = logging.getLogger('app')
+
+MUSIC_ACCOUNTS = 'CONNECTED_TO_SPOTIFY|CONNECTED_TO_LASTFM|CONNECTED_TO_YTMUSIC'
+MAL_ACCOUNTS = 'CONNECTED_TO_MAL'
+
+# dimension -> (account relationships, liked item relationship, only active buds)
+BUD_DIMENSIONS = {
+    'liked_artists': (MUSIC_ACCOUNTS, 'LIKES_ARTIST', False),
+    'liked_tracks': (MUSIC_ACCOUNTS, 'LIKES_TRACK', False),
+    'liked_genres': (MUSIC_ACCOUNTS, 'LIKES_GENRE', False),
+    'liked_albums': (MUSIC_ACCOUNTS, 'LIKES_ALBUM', False),
+    'played_tracks': (MUSIC_ACCOUNTS, 'PLAYED_TRACK', False),
+    'top_artists': (MUSIC_ACCOUNTS, 'TOP_ARTIST', True),
+    'top_tracks': (MUSIC_ACCOUNTS, 'TOP_TRACK', True),
+    'top_genres': (MUSIC_ACCOUNTS, 'LIKES_GENRE', True),
+    'top_anime': (MAL_ACCOUNTS, 'TOP_ANIME', True),
+    'top_manga': (MAL_ACCOUNTS, 'TOP_MANGA', True),
+}
+
+AIO_DIMENSION = 'aio'
+
+
+def all_dimensions():
+    return list(BUD_DIMENSIONS) + [AIO_DIMENSION]
+
+
+def build_dimension_query(dimension):
+    if dimension == AIO_DIMENSION:
+        return build_weighted_score_query(default_weights()), True
+
+    accounts, relation, active_only = BUD_DIMENSIONS[dimension]
+    active_filter = 'AND other.is_active = true' if active_only else ''
+    query = f"""
+    MATCH (u:ParentUser {{uid: $user_uid}})-[:{accounts}]->()-[:{relation}]->(item)
+    MATCH (other:ParentUser)-[:{accounts}]->()-[:{relation}]->(item)
+    WHERE other.uid <> u.uid {active_filter}
+    WITH u, other, count(DISTINCT item) AS common_count
+    RETURN other.uid AS bud_uid, common_count AS similarity_score, u.is_active = true AS user_active
+    ORDER BY similarity_score DESC
+    LIMIT $limit
+    """
+    return query, active_only
+
+
+def dimension_relations(dimensions):
+    """Liked item relationships needed to score `dimensions`, with their account relationships."""
+    relations = {}
+    for dimension in dimensions:
+        if dimension == AIO_DIMENSION:
+            relations.update({relation: SCORED_ACCOUNTS for relation in SCORE_DIMENSIONS.values()})
+        else:
+            accounts, relation, _ = BUD_DIMENSIONS[dimension]
+            relations[relation] = accounts
+    return relations
+
+
+def dimension_weights(dimension):
+    if dimension == AIO_DIMENSION:
+        return relation_weights(default_weights())
+    return {BUD_DIMENSIONS[dimension][1]: 1}
+
+
+class BudIndexService:
+    """
+    Maintains the per-user top-K bud lists stored in `BudNeighbors`.
+
+    Bud endpoints read a list with a single key lookup. A user's lists are
+    recomputed after their likes are synced, and the new scores are pushed
+    into the lists of the buds they share items with, since overlap is symmetric.
+    """
+
+    @staticmethod
+    def top_k():
+        return getattr(settings, 'BUD_INDEX_TOP_K', 100)
+
+    @staticmethod
+    def partner_limit():
+        return getattr(settings, 'BUD_INDEX_PARTNER_LIMIT', 1000)
+
+    @classmethod
+    async def get_buds(cls, user_uid, dimension, limit=50):
+        entry = await BudNeighbors.objects.filter(user_uid=user_uid, dimension=dimension).afirst()
+        if entry is None:
+            logger.info(f"No bud index entry for user {user_uid} on {dimension}, computing it now")
+            neighbors = await cls.rebuild_user_dimension(user_uid, dimension)
+        else:
+            neighbors = entry.neighbors
+        return [(bud_uid, score) for bud_uid, score in neighbors[:limit]]
+
+    @classmethod
+    async def score_user(cls, user_uid, dimension, limit):
+        query, _ = build_dimension_query(dimension)
+        results, _ = await sync_to_async(db.cypher_query)(query, {
+            'user_uid': user_uid,
+            'limit': limit,
+            'weights': relation_weights(default_weights()),
+        })
+        scored = [[bud_uid, score] for bud_uid, score, _ in results]
+        user_active = bool(results[0][2]) if results else False
+        return scored, user_active
+
+    @classmethod
+    async def rebuild_user_dimension(cls, user_uid, dimension):
+        scored, _ = await cls.score_user(user_uid, dimension, cls.top_k())
+        await sync_to_async(cls._store)(user_uid, dimension, scored)
+        return scored
+
+    @classmethod
+    async def update_user(cls, user_uid, dimensions=None):
+        """Recompute a user's lists and propagate the new scores to their buds."""
+        for dimension in dimensions or all_dimensions():
+            try:
+                scored, user_active = await cls.score_user(user_uid, dimension, cls.partner_limit())
+                await sync_to_async(cls._update_sync)(user_uid, dimension, scored, user_active)
+            except Exception as e:
+                logger.error(f"Error updating bud index for user {user_uid} on {dimension}: {e}", exc_info=True)
+        logger.info(f"Bud index updated for user {user_uid}")
+
+    @classmethod
+    async def update_account(cls, account):
+        """Update the index for the ParentUser that owns a service account node."""
+        query = """
+        MATCH (p:ParentUser)-->(a)
+        WHERE elementId(a) = $element_id
+        RETURN p.uid
+        LIMIT 1
+        """
+        results, _ = await sync_to_async(db.cypher_query)(query, {'element_id': account.element_id})
+        if not results:
+            logger.warning(f"No ParentUser connected to account {account}, skipping bud index update")
+            return
+        await cls.update_user(results[0][0])
+
+    @classmethod
+    def _store(cls, user_uid, dimension, neighbors):
+        BudNeighbors.objects.update_or_create(
+            user_uid=user_uid,
+            dimension=dimension,
+            defaults={'neighbors': neighbors[:cls.top_k()]},
+        )
+
+    @classmethod
+    def _update_sync(cls, user_uid, dimension, scored, user_active):
+        top_k = cls.top_k()
+        active_only = build_dimension_query(dimension)[1]
+        partner_scores = {bud_uid: score for bud_uid, score in scored}
+
+        with transaction.atomic():
+            previous = BudNeighbors.objects.filter(user_uid=user_uid, dimension=dimension).first()
+            stale = {bud_uid for bud_uid, _ in previous.neighbors} if previous else set()
+            cls._store(user_uid, dimension, scored)
+
+            affected = BudNeighbors.objects.filter(
+                dimension=dimension,
+                user_uid__in=set(partner_scores) | stale,
+            )
+            changed = []
+            for entry in affected:
+                neighbors = [n for n in entry.neighbors if n[0] != user_uid]
+                score = partner_scores.get(entry.user_uid)
+                if score and (user_active or not active_only):
+                    neighbors.append([user_uid, score])
+                    neighbors.sort(key=lambda n: n[1], reverse=True)
+                entry.neighbors = neighbors[:top_k]
+                entry.updated_at = timezone.now()
+                changed.append(entry)
+            BudNeighbors.objects.bulk_update(changed, ['neighbors', 'updated_at'])
+
+        logger.debug(f"Propagated {dimension} scores of user {user_uid} to {len(changed)} buds")
+
+    @classmethod
+    async def rebuild(cls, dimensions=None, batch_size=500):
+        """
+        Recompute every user's lists. Used by the `rebuild_bud_index` command.
+
+        The like graph is exported once into a `BudSimilarityEngine` and each
+        user is scored in memory instead of running one traversal per user
+        and dimension.
+        """
+        dimensions = dimensions or all_dimensions()
+        engine = await load_similarity_engine(dimension_relations(dimensions), batch_size=batch_size)
+        top_k = cls.top_k()
+        total = 0
+        for user_uid in engine.user_ids:
+            for dimension in dimensions:
+                active_only = build_dimension_query(dimension)[1]
+                scored = engine.top_k(user_uid, dimension_weights(dimension), k=top_k, active_only=active_only)
+                await sync_to_async(cls._store)(user_uid, dimension, [[bud_uid, score] for bud_uid, score in scored])
+            total += 1
+            if total % batch_size == 0:
+                logger.info(f"Bud index rebuilt for {total} users")
+        logger.info(f"Bud index rebuilt for {total} users")
+        return total
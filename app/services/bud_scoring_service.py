@@ -0,0 +1,84 @@
+import logging
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from neomodel import db
+
+logger = logging.getLogger('app')
+
+SCORED_ACCOUNTS = 'CONNECTED_TO_SPOTIFY|CONNECTED_TO_LASTFM|CONNECTED_TO_YTMUSIC'
+
+# weight name -> liked item relationship it counts
+SCORE_DIMENSIONS = {
+    'genres': 'LIKES_GENRE',
+    'artists': 'LIKES_ARTIST',
+    'tracks': 'PLAYED_TRACK',
+}
+
+DEFAULT_SCORE_WEIGHTS = {'genres': 3, 'artists': 2, 'tracks': 1}
+
+
+def default_weights():
+    return dict(getattr(settings, 'BUD_SCORE_WEIGHTS', DEFAULT_SCORE_WEIGHTS))
+
+
+def resolve_weights(overrides=None):
+    """Merge per-request weight overrides into the configured defaults."""
+    weights = default_weights()
+    if not overrides:
+        return weights
+    if not isinstance(overrides, dict):
+        raise ValueError('Weights must be an object mapping dimensions to numbers')
+    for name, value in overrides.items():
+        if name not in SCORE_DIMENSIONS:
+            raise ValueError(f"Unknown score dimension '{name}', expected one of {', '.join(SCORE_DIMENSIONS)}")
+        if isinstance(value, bool) or not isinstance(value, (int, float)) or value < 0:
+            raise ValueError(f"Weight for '{name}' must be a non-negative number")
+        weights[name] = value
+    return weights
+
+
+def build_weighted_score_query(weights):
+    """
+    Score every other user in one pass: each liked item of the user is matched
+    once against the accounts of everybody else, shared items are counted per
+    relationship type and the counts are summed with `$weights`.
+
+    With every weight at 0 nothing can score, and the query returns no rows.
+    """
+    relations = '|'.join(SCORE_DIMENSIONS[name] for name, weight in weights.items() if weight)
+    if not relations:
+        return """
+    UNWIND [] AS row
+    RETURN row AS bud_uid, row AS similarity_score, row AS user_active
+    """
+    query = f"""
+    MATCH (u:ParentUser {{uid: $user_uid}})-[:{SCORED_ACCOUNTS}]->()-[r:{relations}]->(item)
+    WITH DISTINCT u, type(r) AS relation, item
+    MATCH (item)<-[shared]-()<-[:{SCORED_ACCOUNTS}]-(other:ParentUser)
+    WHERE type(shared) = relation AND other.uid <> u.uid AND other.is_active = true
+    WITH u, other, relation, count(DISTINCT item) AS shared_count
+    WITH u, other, sum(shared_count * $weights[relation]) AS similarity_score
+    WHERE similarity_score > 0
+    RETURN other.uid AS bud_uid, similarity_score, u.is_active = true AS user_active
+    ORDER BY similarity_score DESC
+    LIMIT $limit
+    """
+    return query
+
+
+def relation_weights(weights):
+    return {SCORE_DIMENSIONS[name]: weight for name, weight in weights.items()}
+
+
+async def score_buds(user_uid, weights=None, limit=20):
+    """Return `(bud_uid, similarity_score)` pairs ranked by the weighted score."""
+    weights = weights or default_weights()
+    if not any(weights.values()):
+        return []
+    query = build_weighted_score_query(weights)
+    results, _ = await sync_to_async(db.cypher_query)(query, {
+        'user_uid': user_uid,
+        'weights': relation_weights(weights),
+        'limit': limit,
+    })
+    return [(bud_uid, score) for bud_uid, score, _ in results]
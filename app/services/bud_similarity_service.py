@@ -0,0 +1,28 @@
+import logging
+from asgiref.sync import sync_to_async
+from ai.bud_similarity import BudSimilarityEngine
+from ai.graph_export import export_graph
+
+logger = logging.getLogger('app')
+
+
+async def load_similarity_engine(relations, batch_size=500):
+    """
+    Export the like graph of every ParentUser into a `BudSimilarityEngine`.
+
+    `relations` maps each liked item relationship to the account relationships
+    it is reached through. The edges are streamed page by page into a graph
+    snapshot (see `ai/graph_export.py`).
+    """
+    accounts = '|'.join(sorted({
+        account for account_relations in relations.values() for account in account_relations.split('|')
+    }))
+    snapshot = await sync_to_async(export_graph)(
+        list(relations), user_label='ParentUser', accounts=accounts, batch_size=batch_size
+    )
+    engine = BudSimilarityEngine.from_snapshot(snapshot)
+    logger.info(
+        f"Loaded bud similarity engine: {len(engine.user_ids)} users, "
+        + ', '.join(f'{relation}={matrix.nnz}' for relation, matrix in engine.matrices.items())
+    )
+    return engine
@@ -0,0 +1,75 @@
+import logging
+from asgiref.sync import sync_to_async
+from neomodel import db
+
+logger = logging.getLogger('app')
+
+# provider label -> property its items are upserted and synced by
+PROVIDER_KEYS = {
+    'SpotifyTrack': 'spotify_id',
+    'SpotifyArtist': 'spotify_id',
+    'SpotifyAlbum': 'spotify_id',
+    'SpotifyGenre': 'name',
+    'YtmusicTrack': 'videoId',
+    'YtmusicArtist': 'browseId',
+    'LastfmTrack': 'name',
+    'LastfmArtist': 'name',
+    'LastfmAlbum': 'name',
+    'LastfmGenre': 'name',
+}
+
+RESOLVE_QUERY = """
+UNWIND $aliases AS alias
+MATCH (:MergedKey {key: alias.key})-[:ALIAS_OF]->(n)
+RETURN alias.value, elementId(n)
+"""
+
+
+def build_link_query(relation_type):
+    return f"""
+    MATCH (u) WHERE elementId(u) = $user_id
+    UNWIND $ids AS id
+    MATCH (n) WHERE elementId(n) = id
+    MERGE (u)-[:{relation_type}]->(n)
+    """
+
+
+def alias_prefix(node_label, key_property):
+    return f'{node_label}.{key_property}:'
+
+
+def alias_key(node_label, key_property, key):
+    """Key of the MergedKey node of a merged item, `Label.property:value`."""
+    return f'{alias_prefix(node_label, key_property)}{key}'
+
+
+def parse_alias_key(alias):
+    """`(node_label, value)` of an alias key, as the EntityCache keys its entries."""
+    label, rest = alias.split('.', 1)
+    return label, rest.split(':', 1)[1]
+
+
+def provider_keys():
+    return [{'label': label, 'property': key_property} for label, key_property in PROVIDER_KEYS.items()]
+
+
+async def resolve_aliases(node_label, key_property, keys):
+    """
+    `{key: element_id}` of the `keys` whose node was merged into another one.
+    Upserts skip them, merging on the key would create the duplicate again.
+    """
+    if not keys:
+        return {}
+    results, _ = await sync_to_async(db.cypher_query)(RESOLVE_QUERY, {
+        'aliases': [{'key': alias_key(node_label, key_property, key), 'value': key} for key in keys],
+    })
+    return dict(results)
+
+
+async def link_aliased(user, relation_type, element_ids):
+    """Links the user to the kept nodes of merged keys, which writers do not upsert."""
+    if element_ids:
+        await sync_to_async(db.cypher_query)(build_link_query(relation_type), {
+            'user_id': user.element_id,
+            'ids': list(element_ids),
+        })
@@ -0,0 +1,93 @@
+import logging
+from django.conf import settings
+from django.core.cache import cache
+from app.services.ttl_cache import TTLCache
+
+logger = logging.getLogger('app')
+
+
+class EntityCache:
+    """
+    Maps provider keys of item nodes (a Spotify id, an image URL, an anime id)
+    to the element ids of the nodes they resolved to, so ingestion skips the
+    lookup or upsert of items it already resolved within `ENTITY_CACHE_TTL`.
+
+    Entries live in a process LRU and, with `ENTITY_CACHE_BACKEND = 'redis'`,
+    in the Django cache shared by all workers.
+    """
+
+    local = TTLCache(getattr(settings, 'ENTITY_CACHE_SIZE', 100000), getattr(settings, 'ENTITY_CACHE_TTL', 600))
+    # Keys missed locally but found in the shared cache
+    shared_hits = 0
+
+    @staticmethod
+    def cache_key(label, key):
+        return f'entity:{label}:{key}'
+
+    @staticmethod
+    def shared():
+        return getattr(settings, 'ENTITY_CACHE_BACKEND', 'local') == 'redis'
+
+    @classmethod
+    async def get_many(cls, label, keys):
+        """`{key: element_id}` of the `keys` that resolved before."""
+        found = {}
+        missing = []
+        for key in keys:
+            element_id = cls.local.get(cls.cache_key(label, key))
+            if element_id is None:
+                missing.append(key)
+            else:
+                found[key] = element_id
+        if missing and cls.shared():
+            try:
+                shared = await cache.aget_many([cls.cache_key(label, key) for key in missing])
+            except Exception as e:
+                logger.debug(f"Entity cache unavailable: {e}")
+                shared = {}
+            for key in missing:
+                element_id = shared.get(cls.cache_key(label, key))
+                if element_id is not None:
+                    cls.shared_hits += 1
+                    cls.local.set(cls.cache_key(label, key), element_id)
+                    found[key] = element_id
+        return found
+
+    @classmethod
+    async def get(cls, label, key):
+        return (await cls.get_many(label, [key])).get(key)
+
+    @classmethod
+    async def set_many(cls, label, element_ids):
+        entries = {cls.cache_key(label, key): element_id for key, element_id in element_ids.items()}
+        for cache_key, element_id in entries.items():
+            cls.local.set(cache_key, element_id)
+        if entries and cls.shared():
+            try:
+                await cache.aset_many(entries, timeout=cls.local.ttl)
+            except Exception as e:
+                logger.debug(f"Entity cache unavailable: {e}")
+
+    @classmethod
+    async def set(cls, label, key, element_id):
+        await cls.set_many(label, {key: element_id})
+
+    @classmethod
+    async def forget(cls, label, key):
+        await cls.forget_many([(label, key)])
+
+    @classmethod
+    async def forget_many(cls, entries):
+        """Drops the `(label, key)` entries, of nodes that were deleted or merged."""
+        cache_keys = [cls.cache_key(label, key) for label, key in entries]
+        for cache_key in cache_keys:
+            cls.local.pop(cache_key)
+        if cache_keys and cls.shared():
+            try:
+                await cache.adelete_many(cache_keys)
+            except Exception as e:
+                logger.debug(f"Entity cache unavailable: {e}")
+
+    @classmethod
+    def stats(cls):
+        return {**cls.local.stats(), 'shared_hits': cls.shared_hits}
@@ -0,0 +1,132 @@
+import hashlib
+import random
+import re
+import unicodedata
+from django.conf import settings
+
+# Qualifiers of a release that do not make it another recording, dropped from
+# titles in brackets, "(Remastered 2011)", or after a dash, "- Radio Edit"
+VERSION_WORDS = r'remaster(?:ed)?|\d{4}|version|edit|mono|stereo|deluxe|expanded|explicit|clean|single|bonus track'
+BRACKETED_QUALIFIER = re.compile(rf'[(\[][^)\]]*\b(?:{VERSION_WORDS}|feat\.?|ft\.?|featuring)\b[^)\]]*[)\]]', re.I)
+DASH_QUALIFIER = re.compile(rf'\s+-\s+[^-]*\b(?:{VERSION_WORDS})\b[^-]*$', re.I)
+
+# Titles shorter than this are shingled by words, one changed letter of
+# "Song" and "Songs" leaves most of their character 3-grams equal
+WORD_SHINGLE_LENGTH = 16
+
+# Mersenne prime the hash permutations are taken modulo, signatures fit Neo4j integers
+PRIME = (1 << 61) - 1
+
+
+def normalize_name(name):
+    """Lowercase ASCII words of a name, without accents, punctuation or repeated spaces."""
+    if not name:
+        return ''
+    name = unicodedata.normalize('NFKD', str(name))
+    name = ''.join(char for char in name if not unicodedata.combining(char)).lower()
+    # "Don't" is one word
+    name = re.sub(r"['\u2019]", '', name)
+    return ' '.join(re.sub(r'[^\w\s]', ' ', name).split())
+
+
+def normalize_title(title):
+    """`normalize_name` of a track or album title without its version qualifiers."""
+    if not title:
+        return ''
+    title = BRACKETED_QUALIFIER.sub(' ', str(title))
+    title = DASH_QUALIFIER.sub('', title)
+    return normalize_name(title)
+
+
+def shingles(text, size=3):
+    """Character `size`-grams of a normalized text, its words when shorter than `WORD_SHINGLE_LENGTH`."""
+    if len(text) < WORD_SHINGLE_LENGTH:
+        return set(text.split())
+    return {text[i:i + size] for i in range(len(text) - size + 1)}
+
+
+class MinHasher:
+    """
+    MinHash signatures of shingle sets and their LSH bands.
+
+    Two sets with Jaccard similarity `s` share at least one band with
+    probability `1 - (1 - s ** rows) ** bands`, so near duplicates are found
+    by grouping items on equal bands instead of comparing all pairs.
+    """
+
+    def __init__(self, num_hashes=None, bands=None, seed=1):
+        self.num_hashes = num_hashes or getattr(settings, 'ENTITY_MATCH_HASHES', 32)
+        self.bands = bands or getattr(settings, 'ENTITY_MATCH_BANDS', 8)
+        if self.num_hashes % self.bands:
+            raise ValueError(f"{self.num_hashes} hashes cannot be split into {self.bands} bands")
+        self.rows = self.num_hashes // self.bands
+        rng = random.Random(seed)
+        self.permutations = [(rng.randrange(1, PRIME), rng.randrange(PRIME)) for _ in range(self.num_hashes)]
+
+    @staticmethod
+    def base_hash(shingle):
+        return int.from_bytes(hashlib.blake2b(shingle.encode(), digest_size=8).digest(), 'big')
+
+    def signature(self, text):
+        hashes = [self.base_hash(shingle) for shingle in shingles(text)]
+        if not hashes:
+            return None
+        return [min((a * h + b) % PRIME for h in hashes) for a, b in self.permutations]
+
+    def band_keys(self, signature):
+        """One key per band, `band:digest`, equal for signatures equal in that band."""
+        return [
+            f"{band}:{hashlib.blake2b(repr(signature[band * self.rows:(band + 1) * self.rows]).encode(), digest_size=8).hexdigest()}"
+            for band in range(self.bands)
+        ]
+
+    @staticmethod
+    def similarity(signature, other):
+        """Estimated Jaccard similarity of the sets of two signatures."""
+        return sum(a == b for a, b in zip(signature, other)) / len(signature)
+
+
+class MatchClusters:
+    """
+    Union-find over the nodes of matched pairs. A cluster keeps the ISRC and
+    artist of its nodes, and two clusters with different ones are never
+    joined, so "Intro" by two artists does not chain into one item through an
+    "Intro" without an artist.
+    """
+
+    def __init__(self):
+        self.parent = {}
+        self.identity = {}
+
+    def find(self, node):
+        self.parent.setdefault(node, node)
+        while self.parent[node] != node:
+            self.parent[node] = self.parent[self.parent[node]]
+            node = self.parent[node]
+        return node
+
+    def add(self, node, isrc=None, artist=None):
+        root = self.find(node)
+        identity = self.identity.setdefault(root, {'isrc': None, 'artist': None})
+        identity['isrc'] = identity['isrc'] or isrc or None
+        identity['artist'] = identity['artist'] or artist or None
+
+    def union(self, node, other):
+        root, other_root = self.find(node), self.find(other)
+        if root == other_root:
+            return False
+        identity = self.identity.get(root, {'isrc': None, 'artist': None})
+        other_identity = self.identity.get(other_root, {'isrc': None, 'artist': None})
+        for field in ('isrc', 'artist'):
+            if identity[field] and other_identity[field] and identity[field] != other_identity[field]:
+                return False
+        self.parent[other_root] = root
+        self.identity[root] = {field: identity[field] or other_identity[field] for field in ('isrc', 'artist')}
+        self.identity.pop(other_root, None)
+        return True
+
+    def clusters(self):
+        groups = {}
+        for node in self.parent:
+            groups.setdefault(self.find(node), []).append(node)
+        return [nodes for nodes in groups.values() if len(nodes) > 1]
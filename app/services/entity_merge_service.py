@@ -0,0 +1,472 @@
+import asyncio
+import heapq
+import itertools
+import logging
+import traceback
+from datetime import timedelta
+from operator import itemgetter
+from asgiref.sync import async_to_sync
+from django.conf import settings
+from django.db import IntegrityError, close_old_connections
+from django.utils import timezone
+from neomodel import db
+from app.models import EntityMergeJob
+from app.services.entity_aliases import parse_alias_key, provider_keys
+from app.services.entity_cache import EntityCache
+from app.services.entity_matching import MatchClusters, MinHasher, normalize_name, normalize_title
+
+logger = logging.getLogger('app')
+
+# item type -> labels its nodes are streamed from, label of merged nodes,
+# labels a merged node takes from its duplicates, the pattern of its artist
+# when no `artist_name` was stored, whether it needs an artist (or an ISRC)
+# to be merged and whether near duplicates are matched after exact keys
+MERGE_TYPES = {
+    'Artist': {
+        'labels': ['Artist'],
+        'combined': 'CombinedArtist',
+        'merged_labels': ['LikedItem', 'Artist', 'SpotifyArtist', 'YtmusicArtist', 'LastfmArtist'],
+        'artist': None,
+        'needs_artist': False,
+        # Artists have no artist to confirm a near match with
+        'fuzzy': False,
+    },
+    'Track': {
+        'labels': ['Track'],
+        'combined': 'CombinedTrack',
+        'merged_labels': ['LikedItem', 'Track', 'SpotifyTrack', 'LastfmTrack', 'YtmusicTrack'],
+        'artist': '(n)-[:PERFORMED_BY]->(a:Artist)',
+        'needs_artist': True,
+        'fuzzy': True,
+    },
+    'Album': {
+        'labels': ['Album'],
+        'combined': 'CombinedAlbum',
+        'merged_labels': ['LikedItem', 'Album', 'SpotifyAlbum', 'LastfmAlbum', 'YtmusicAlbum'],
+        'artist': '(n)-[:CONTRIBUTED_TO]-(a:Artist)',
+        'needs_artist': True,
+        'fuzzy': False,
+    },
+    'Genre': {
+        # LastfmGenre nodes are not Genres, both labels are streamed
+        'labels': ['Genre', 'LastfmGenre'],
+        'combined': 'CombinedGenre',
+        'merged_labels': ['LikedItem', 'Genre', 'SpotifyGenre', 'LastfmGenre'],
+        'artist': None,
+        'needs_artist': False,
+        'fuzzy': False,
+    },
+}
+
+# Bumped when keys are computed differently, nodes keyed by an older version are keyed again
+MERGE_KEY_VERSION = 4
+
+
+def merge_key(item_type, name, isrc=None, artist=None):
+    """
+    Blocking key of an item, equal for the nodes of one item across providers:
+    the ISRC of tracks that have one, the normalized name and first artist
+    otherwise, without the version qualifiers of titles. Empty for items
+    without a name, and for tracks and albums without an ISRC or an artist,
+    whose title alone would join every "Intro" and "Greatest Hits". Nodes
+    with an empty key are never merged.
+    """
+    if item_type == 'Track' and isrc:
+        return f'isrc:{isrc.strip().upper()}'
+    name = normalize_title(name) if item_type in ('Track', 'Album') else normalize_name(name)
+    artist = normalize_name(artist)
+    if not name or (MERGE_TYPES[item_type]['needs_artist'] and not artist):
+        return ''
+    return f'{name}|{artist}' if artist else name
+
+
+def build_relationship_query(relation_type, outgoing):
+    pattern = f"(dup)-[r:`{relation_type}`]->(other)" if outgoing else f"(other)-[r:`{relation_type}`]->(dup)"
+    merged = f"(keep)-[merged:`{relation_type}`]->(other)" if outgoing else f"(other)-[merged:`{relation_type}`]->(keep)"
+    return f"""
+    UNWIND $merges AS m
+    MATCH (keep) WHERE elementId(keep) = m.keep
+    UNWIND m.duplicates AS duplicate_id
+    MATCH {pattern}
+    WHERE elementId(dup) = duplicate_id AND other <> keep AND NOT elementId(other) IN m.duplicates
+    MERGE {merged}
+    SET merged += properties(r)
+    """
+
+
+def build_collapse_query(item_type):
+    config = MERGE_TYPES[item_type]
+    add_labels = '\n    '.join(
+        f"FOREACH (_ IN CASE WHEN '{label}' IN merged_labels THEN [1] ELSE [] END | SET keep:{label})"
+        for label in config['merged_labels']
+    )
+    return f"""
+    UNWIND $merges AS m
+    MATCH (keep) WHERE elementId(keep) = m.keep
+    // The provider keys of the duplicates keep resolving, to the kept node
+    FOREACH (alias IN m.aliases |
+        MERGE (a:MergedKey {{key: alias}})
+        MERGE (a)-[:ALIAS_OF]->(keep))
+    WITH keep, m
+    UNWIND m.duplicates AS duplicate_id
+    MATCH (dup) WHERE elementId(dup) = duplicate_id
+    WITH keep, properties(keep) AS own, collect(properties(dup)) AS merged_properties,
+         reduce(all_labels = [], dup_labels IN collect(labels(dup)) | all_labels + dup_labels) AS merged_labels,
+         collect(dup) AS dups
+    FOREACH (dup IN dups | DETACH DELETE dup)
+    FOREACH (props IN merged_properties | SET keep += props)
+    SET keep += own, keep:{config['combined']}
+    {add_labels}
+    RETURN count(keep)
+    """
+
+
+# Provider keys of the duplicates, own ones and those of nodes merged into them before
+ALIASES_QUERY = """
+UNWIND $ids AS id
+MATCH (dup) WHERE elementId(dup) = id
+RETURN id, [entry IN $provider_keys WHERE entry.label IN labels(dup) AND dup[entry.property] IS NOT NULL |
+            entry.label + '.' + entry.property + ':' + toString(dup[entry.property])]
+         + [(alias:MergedKey)-[:ALIAS_OF]->(dup) | alias.key]
+"""
+
+
+class EntityMergeEngine:
+    """
+    Merges the nodes of the same track, artist, album or genre across
+    providers into one node, without loading the catalog into memory.
+
+    The `keys` stage stores the blocking key of every node as `merge_key`, in
+    pages of nodes still without one. The `merge` stage streams the nodes of
+    each label in `merge_key` order through its index, groups equal keys and
+    collapses each batch of blocks in one transaction: the relationships of
+    the duplicates are moved to the kept node, which takes their missing
+    properties and provider labels. Their provider keys become MergedKey
+    nodes of the kept node, so syncs and upserts still resolve them. The
+    last committed key is checkpointed on the job so a failed run resumes
+    after it.
+
+    For tracks, the `match` stage then merges near duplicates with different
+    keys, "Song - Remastered" and "Song (Remastered)" by the same artist:
+    nodes sharing an LSH band of their MinHash signature are candidates,
+    merged when they have the same artist or ISRC and their estimated
+    similarity reaches `ENTITY_MATCH_THRESHOLD`. The `keys` stage links each
+    node to an LshBucket per band, and `match` pages through the buckets
+    that hold more than one node, so only candidates are read.
+    """
+
+    def __init__(self, job, page_size=None, batch_size=None):
+        self.job = job
+        self.page_size = page_size or getattr(settings, 'ENTITY_MERGE_PAGE_SIZE', 5000)
+        self.batch_size = batch_size or getattr(settings, 'ENTITY_MERGE_BATCH_SIZE', 500)
+
+    def run(self):
+        for item_type in self.job.item_types.split(','):
+            state = self.job.checkpoint.setdefault(item_type, {'stage': 'keys', 'after': ''})
+            self.job.progress.setdefault(item_type, {'keyed': 0, 'blocks': 0, 'merged': 0})
+            if state['stage'] == 'keys':
+                self.assign_keys(item_type)
+                state['stage'] = 'merge'
+                self.save()
+            if state['stage'] == 'merge':
+                self.merge(item_type, state)
+                state['stage'] = 'match' if MERGE_TYPES[item_type]['fuzzy'] else 'done'
+                self.save()
+            if state['stage'] == 'match':
+                self.match(item_type)
+                state['stage'] = 'done'
+                self.save()
+        return self.job.progress
+
+    def save(self, stage=''):
+        self.job.stage = stage
+        self.job.save(update_fields=['stage', 'checkpoint', 'progress', 'updated_at'])
+
+    def assign_keys(self, item_type):
+        config = MERGE_TYPES[item_type]
+        artist = f"coalesce(n.artist_name, [{config['artist']} | a.name][0])" if config['artist'] else 'null'
+        # Nodes keyed by an older version, or before near-duplicate matching existed, are keyed again
+        missing = 'n.merge_key IS NULL OR coalesce(n.merge_key_version, 1) < $version'
+        if config['fuzzy']:
+            missing += ' OR n.lsh_bands IS NULL'
+        write = """
+        UNWIND $rows AS row MATCH (n) WHERE elementId(n) = row.id
+        SET n.merge_key = row.key, n.merge_key_version = $version
+        WITH n, row WHERE row.lsh_bands IS NOT NULL
+        SET n.match_artist = row.match_artist, n.minhash = row.minhash, n.lsh_bands = row.lsh_bands
+        // The buckets of a previous signature are left
+        WITH n, row
+        OPTIONAL MATCH (n)-[old:IN_BUCKET]->(:LshBucket)
+        DELETE old
+        WITH DISTINCT n, row
+        UNWIND row.lsh_bands AS bucket_key
+        MERGE (b:LshBucket {key: bucket_key})
+        MERGE (n)-[:IN_BUCKET]->(b)
+        WITH DISTINCT b WHERE b.shared_key IS NULL AND COUNT { (b)<-[:IN_BUCKET]-() } > 1
+        SET b.shared_key = b.key
+        """
+        hasher = MinHasher() if config['fuzzy'] else None
+        for label in config['labels']:
+            query = f"""
+            MATCH (n:{label}) WHERE {missing}
+            WITH n LIMIT $limit
+            RETURN elementId(n), n.name, n.isrc, {artist}
+            """
+            while True:
+                results, _ = db.cypher_query(query, {'limit': self.page_size, 'version': MERGE_KEY_VERSION})
+                if not results:
+                    break
+                rows = []
+                for element_id, name, isrc, artist_name in results:
+                    row = {'id': element_id, 'key': merge_key(item_type, name, isrc, artist_name), 'lsh_bands': None}
+                    if hasher:
+                        title = normalize_title(name) if item_type == 'Track' else normalize_name(name)
+                        signature = hasher.signature(title)
+                        row.update({
+                            'match_artist': normalize_name(artist_name),
+                            'minhash': signature or [],
+                            # Items without a name get no bands and are never candidates
+                            'lsh_bands': [f'{item_type}:{key}' for key in hasher.band_keys(signature)] if signature else [],
+                        })
+                    rows.append(row)
+                db.cypher_query(write, {'rows': rows, 'version': MERGE_KEY_VERSION})
+                self.job.progress[item_type]['keyed'] += len(rows)
+                self.save('keys')
+
+    def label_blocks(self, label, combined, after):
+        """`(key, [(combined, element_id)])` of the nodes of `label` with a key after `after`, in key order."""
+        columns = f"n.merge_key, n:{combined}, elementId(n)"
+        page_query = f"MATCH (n:{label}) WHERE n.merge_key > $after RETURN {columns} ORDER BY n.merge_key LIMIT $limit"
+        key_query = f"MATCH (n:{label} {{merge_key: $key}}) RETURN {columns}"
+        while True:
+            results, _ = db.cypher_query(page_query, {'after': after, 'limit': self.page_size})
+            if not results:
+                return
+            # The block of the last key can continue past the page, it is read whole
+            last_key = results[-1][0]
+            rows = [row for row in results if row[0] != last_key]
+            rows += db.cypher_query(key_query, {'key': last_key})[0]
+            for key, block in itertools.groupby(rows, key=itemgetter(0)):
+                yield key, [(combined_node, element_id) for _, combined_node, element_id in block]
+            after = last_key
+
+    def blocks(self, item_type, after):
+        """Blocks of duplicates of `item_type` after `after`, the streams of its labels merged by key."""
+        config = MERGE_TYPES[item_type]
+        streams = [self.label_blocks(label, config['combined'], after) for label in config['labels']]
+        for key, label_blocks in itertools.groupby(heapq.merge(*streams, key=itemgetter(0)), key=itemgetter(0)):
+            # A merged genre is streamed from both its labels
+            nodes = sorted({node for _, block in label_blocks for node in block}, key=lambda node: (not node[0], node[1]))
+            if len(nodes) > 1:
+                # An already merged node is kept, so repeated runs grow the same node
+                yield key, nodes[0][1], [element_id for _, element_id in nodes[1:]]
+
+    def merge(self, item_type, state):
+        batch = []
+        for key, keep, duplicates in self.blocks(item_type, state['after']):
+            batch.append({'key': key, 'keep': keep, 'duplicates': duplicates})
+            if len(batch) >= self.batch_size:
+                self.merge_batch(item_type, batch)
+                batch = []
+        if batch:
+            self.merge_batch(item_type, batch)
+
+    def match(self, item_type):
+        """Merges the near duplicates of `item_type` found by LSH, see `entity_matching`."""
+        config = MERGE_TYPES[item_type]
+        threshold = getattr(settings, 'ENTITY_MATCH_THRESHOLD', 0.9)
+        max_bucket = getattr(settings, 'ENTITY_MATCH_MAX_BUCKET', 50)
+        clusters = MatchClusters()
+        combined = {}
+        progress = self.job.progress[item_type]
+        progress.setdefault('candidates', 0)
+        # Buckets of `item_type` that ever had two items, in key order through the shared_key index
+        page_query = """
+        MATCH (b:LshBucket) WHERE b.shared_key > $after AND b.shared_key < $end
+        RETURN b.shared_key, COUNT { (b)<-[:IN_BUCKET]-() }
+        ORDER BY b.shared_key LIMIT $limit
+        """
+        members_query = f"""
+        UNWIND $keys AS key
+        MATCH (:LshBucket {{key: key}})<-[:IN_BUCKET]-(n)
+        RETURN collect([elementId(n), n.minhash, n.isrc, n.match_artist, n:{config['combined']}])
+        """
+        # ';' follows ':', the keys of `item_type` sort between the two
+        after, end = f'{item_type}:', f'{item_type};'
+        while True:
+            results, _ = db.cypher_query(page_query, {'after': after, 'end': end, 'limit': self.page_size})
+            if not results:
+                break
+            # Buckets past the size limit hold a generic title, "Intro", whose pairs are not compared
+            keys = [key for key, size in results if 1 < size <= max_bucket]
+            for (nodes,) in db.cypher_query(members_query, {'keys': keys})[0] if keys else []:
+                for element_id, _, isrc, artist, combined_node in nodes:
+                    clusters.add(element_id, isrc, artist)
+                    combined[element_id] = combined_node
+                for node, other in itertools.combinations(nodes, 2):
+                    progress['candidates'] += 1
+                    # Similar titles are different works unless the artist, or the recording, is the same
+                    same_isrc = node[2] and node[2] == other[2]
+                    same_artist = node[3] and node[3] == other[3]
+                    if not (same_isrc or same_artist):
+                        continue
+                    if MinHasher.similarity(node[1], other[1]) >= threshold:
+                        clusters.union(node[0], other[0])
+            after = results[-1][0]
+            self.save('match')
+
+        batch = []
+        for nodes in clusters.clusters():
+            # An already merged node is kept, as in `blocks`
+            nodes.sort(key=lambda element_id: (not combined[element_id], element_id))
+            batch.append({'keep': nodes[0], 'duplicates': nodes[1:]})
+            if len(batch) >= self.batch_size:
+                self.merge_batch(item_type, batch)
+                batch = []
+        if batch:
+            self.merge_batch(item_type, batch)
+
+    def merge_batch(self, item_type, batch):
+        duplicate_ids = [element_id for merge in batch for element_id in merge['duplicates']]
+        results, _ = db.cypher_query(
+            "UNWIND $ids AS id MATCH (n)-[r]-() WHERE elementId(n) = id AND type(r) <> 'IN_BUCKET' "
+            "RETURN DISTINCT type(r)",
+            {'ids': duplicate_ids},
+        )
+        aliases = dict(db.cypher_query(ALIASES_QUERY, {'ids': duplicate_ids, 'provider_keys': provider_keys()})[0])
+        merges = [
+            {
+                'keep': merge['keep'],
+                'duplicates': merge['duplicates'],
+                'aliases': [alias for element_id in merge['duplicates'] for alias in aliases.get(element_id, [])],
+            }
+            for merge in batch
+        ]
+        with db.transaction:
+            for (relation_type,) in results:
+                for outgoing in (True, False):
+                    db.cypher_query(build_relationship_query(relation_type, outgoing), {'merges': merges})
+            db.cypher_query(build_collapse_query(item_type), {'merges': merges})
+        # Cached keys of the duplicates point at deleted nodes
+        async_to_sync(EntityCache.forget_many)([
+            parse_alias_key(alias) for merge in merges for alias in merge['aliases']
+        ])
+
+        state = self.job.checkpoint[item_type]
+        if state['stage'] == 'merge':
+            # Matches are found again on resume, only blocks are resumed by key
+            state['after'] = batch[-1]['key']
+        progress = self.job.progress[item_type]
+        progress['blocks'] += len(batch)
+        progress['merged'] += len(duplicate_ids)
+        self.save(state['stage'])
+        logger.info(f"Merged {len(duplicate_ids)} duplicate {item_type} nodes into {len(batch)} in stage {state['stage']}")
+
+
+class EntityMergeService:
+    """
+    Runs catalog merges as background jobs.
+
+    `enqueue` returns the active job of the same item types if there is one
+    and resumes the last failed one from its checkpoint. Jobs run on a Celery
+    worker or, with `ENTITY_MERGE_BACKEND = 'inprocess'`, in a thread of the
+    server.
+    """
+
+    @staticmethod
+    def stale_after():
+        return timedelta(seconds=getattr(settings, 'ENTITY_MERGE_JOB_TIMEOUT', 3600))
+
+    @classmethod
+    async def enqueue(cls, item_types=None):
+        item_types = list(item_types or MERGE_TYPES)
+        unsupported = [item_type for item_type in item_types if item_type not in MERGE_TYPES]
+        if unsupported:
+            raise ValueError(f"Unsupported item types: {', '.join(unsupported)}")
+        item_types = ','.join(item_type for item_type in MERGE_TYPES if item_type in item_types)
+
+        active = await cls.active_job(item_types)
+        if active:
+            return active, False
+        job = await EntityMergeJob.objects.filter(item_types=item_types).order_by('-created_at').afirst()
+        try:
+            if job and job.status == EntityMergeJob.FAILED:
+                job.status = EntityMergeJob.QUEUED
+                job.error = ''
+                await job.asave(update_fields=['status', 'error', 'updated_at'])
+            else:
+                job = await EntityMergeJob.objects.acreate(item_types=item_types)
+        except IntegrityError:
+            # Another request queued the job between the lookup and the write
+            return await cls.active_job(item_types), False
+
+        try:
+            cls.dispatch(job)
+        except Exception as e:
+            # Nothing will run the job, it must not block the next request
+            logger.error(f"Error dispatching entity merge {job.id}: {e}")
+            job.status = EntityMergeJob.FAILED
+            job.error = f"Dispatch failed: {e}"
+            await job.asave(update_fields=['status', 'error', 'updated_at'])
+            raise
+        logger.info(f"Queued entity merge {job.id} of {item_types}")
+        return job, True
+
+    @classmethod
+    async def active_job(cls, item_types):
+        job = await EntityMergeJob.objects.filter(
+            item_types=item_types, status__in=EntityMergeJob.ACTIVE_STATUSES,
+        ).afirst()
+        if job and job.updated_at < timezone.now() - cls.stale_after():
+            # The worker running it died, the job is resumed from its checkpoint
+            job.status = EntityMergeJob.FAILED
+            job.error = 'Job timed out'
+            await job.asave(update_fields=['status', 'error', 'updated_at'])
+            return None
+        return job
+
+    @classmethod
+    def dispatch(cls, job):
+        if getattr(settings, 'ENTITY_MERGE_BACKEND', 'celery') == 'inprocess':
+            asyncio.get_running_loop().run_in_executor(None, cls.run, job.id)
+        else:
+            from app.tasks.entity_merge_tasks import merge_entities_task
+            merge_entities_task.delay(str(job.id))
+
+    @staticmethod
+    def run(job_id):
+        """Runs a queued job to the end, blocking, on a worker or executor thread."""
+        try:
+            job = EntityMergeJob.objects.get(id=job_id)
+            if job.status != EntityMergeJob.QUEUED:
+                logger.warning(f"Entity merge job {job_id} is {job.status}, not running it again")
+                return job
+
+            job.status = EntityMergeJob.RUNNING
+            job.save(update_fields=['status', 'updated_at'])
+            try:
+                EntityMergeEngine(job).run()
+                job.status = EntityMergeJob.SUCCEEDED
+            except Exception as e:
+                logger.error(f"Entity merge job {job_id} failed: {e}")
+                logger.error(f"Traceback: {traceback.format_exc()}")
+                job.status = EntityMergeJob.FAILED
+                job.error = str(e)
+            job.save(update_fields=['status', 'error', 'updated_at'])
+            return job
+        finally:
+            close_old_connections()
+
+    @staticmethod
+    def serialize(job):
+        return {
+            'job_id': str(job.id),
+            'item_types': job.item_types.split(','),
+            'status': job.status,
+            'stage': job.stage,
+            'checkpoint': job.checkpoint,
+            'progress': job.progress,
+            'error': job.error,
+            'created_at': job.created_at.isoformat(),
+            'updated_at': job.updated_at.isoformat(),
+        }
@@ -3,6 +3,7 @@ import logging
 import asyncio
 from typing import List, Tuple, Dict, Any
 from concurrent.futures import ThreadPoolExecutor
+from django.conf import settings
 from urllib.parse import urlparse, parse_qs, urlencode, urlunparse
 
 import pylast
@@ -11,6 +12,13 @@ from app.db_models.lastfm.lastfm_track import LastfmTrack
 from app.db_models.lastfm.lastfm_genre import LastfmGenre
 from app.db_models.lastfm.lastfm_album import LastfmAlbum
 from .service_strategy import ServiceStrategy
+from .bud_index_service import BudIndexService
+from .like_sync_service import LikeSyncService
+from .entity_aliases import resolve_aliases
+from .entity_cache import EntityCache
+from .lastfm_tag_cache import LastfmTagCache
+from asgiref.sync import sync_to_async
+from neomodel import db
 
 logger = logging.getLogger(__name__)
 
@@ -28,7 +36,8 @@ class LastFmService(ServiceStrategy):
         self.api_secret = api_secret
         self.session_key_file = os.path.join(os.path.expanduser("~"), ".lastfm_session_key")
         self.network = pylast.LastFMNetwork(api_key=self.api_key, api_secret=self.api_secret)
-        self.executor = ThreadPoolExecutor()
+        # Shared by every request, the service is a process-wide singleton
+        self.executor = ThreadPoolExecutor(max_workers=getattr(settings, 'SERVICE_EXECUTOR_WORKERS', 8))
 
     async def get_user_profile(self, token: str) -> Dict[str, Any]:
         """
@@ -79,24 +88,32 @@ class LastFmService(ServiceStrategy):
         user = pylast.User(username, self.network)
         return await loop.run_in_executor(self.executor, user.get_top_tracks)
 
-    async def fetch_top_genres(self, username: str) -> List[Tuple[str, int]]:
+    async def fetch_top_genres(self, username: str, top_artists: List[pylast.TopItem] = None) -> List[Tuple[str, int]]:
         """
         Fetches the top genres for a given user based on their top artists' tags.
         """
         logger.debug(f"Fetching top genres for user: {username}")
-        top_artists = await self.fetch_top_artists(username)
+        if top_artists is None:
+            top_artists = await self.fetch_top_artists(username)
+        artists = {artist.item.get_name(): artist.item for artist in top_artists}
+        tags = await LastfmTagCache.get_many(list(artists), lambda name: self.fetch_artist_tags(artists[name]))
         genre_count: Dict[str, int] = {}
 
-        for artist in top_artists:
-            tags = await asyncio.get_event_loop().run_in_executor(self.executor, artist.item.get_top_tags)
-            for tag in tags:
-                genre = tag.item.get_name()
-                genre_count[genre] = genre_count.get(genre, 0) + int(tag.weight)
+        for artist_tags in tags.values():
+            for genre, weight in artist_tags:
+                genre_count[genre] = genre_count.get(genre, 0) + weight
 
         # Convert dictionary to list of tuples for sorting
         sorted_genres = sorted(genre_count.items(), key=lambda x: x[1], reverse=True)
         return sorted_genres
 
+    async def fetch_artist_tags(self, artist: pylast.Artist) -> List[Tuple[str, int]]:
+        """
+        Fetches the top tags of an artist with their weights.
+        """
+        tags = await asyncio.get_event_loop().run_in_executor(self.executor, artist.get_top_tags)
+        return [(tag.item.get_name(), int(tag.weight)) for tag in tags]
+
     async def fetch_liked_tracks(self, username: str) -> List[pylast.Track]:
         """
         Fetches the liked tracks for a given user.
@@ -141,13 +158,8 @@ class LastFmService(ServiceStrategy):
         Processes and saves an artist node to Neo4j, and creates relationships with the user.
         """
         logger.debug(f"Processing artist: {item.item.get_name()} for user: {user}")
-        loop = asyncio.get_event_loop()
-        item_name = item.item.get_name()
-        item_id = item.item.get_mbid() if item.item.get_mbid() is not None else item_name
-        node = await  LastfmArtist.nodes.get_or_none(name=item_name)
-        if not node:
-            logger.debug(f"Artist not found, creating new node: {item_name}")
-            node = await  LastfmArtist(lastfm_id=item_id, name=item_name).save()
+        node = await self._upsert_artist(item)
+        item_name = node.name
 
         if relation_type == "top":
             logger.debug(f"Creating relationship between user and artist: {item_name}")
@@ -157,18 +169,25 @@ class LastFmService(ServiceStrategy):
             logger.debug(f"Creating relationship between user and artist: {item_name}")
             await user.likes_artists.connect(node)
 
-    async def _process_track(self, user: Any, item: pylast.TopItem, relation_type: str) -> None:
+    async def _upsert_artist(self, item: pylast.TopItem) -> LastfmArtist:
         """
-        Processes and saves a track node to Neo4j, and creates relationships with the user.
+        Returns the artist node of an item, creating it if it does not exist.
         """
-        logger.debug(f"Processing track: {item.item.get_name()} for user: {user}")
-        loop = asyncio.get_event_loop()
         item_name = item.item.get_name()
         item_id = item.item.get_mbid() if item.item.get_mbid() is not None else item_name
-        node = await  LastfmTrack.nodes.get_or_none(name=item_name)
+        node = await  LastfmArtist.nodes.get_or_none(name=item_name)
         if not node:
-            logger.debug(f"Track not found, creating new node: {item_name}")
-            node = await  LastfmTrack(lastfm_id=item_id, name=item_name).save()
+            logger.debug(f"Artist not found, creating new node: {item_name}")
+            node = await  LastfmArtist(lastfm_id=item_id, name=item_name).save()
+        return node
+
+    async def _process_track(self, user: Any, item: pylast.TopItem, relation_type: str) -> None:
+        """
+        Processes and saves a track node to Neo4j, and creates relationships with the user.
+        """
+        logger.debug(f"Processing track: {item.item.get_name()} for user: {user}")
+        node = await self._upsert_track(item)
+        item_name = node.name
 
         if relation_type == "top":
             if not await self._relationship_exists(user, node, 'top_tracks'):
@@ -180,19 +199,36 @@ class LastFmService(ServiceStrategy):
                 logger.debug(f"Creating relationship between user and track: {item_name}")
                 await  user.likes_tracks.connect(node)
 
+    async def _upsert_track(self, item: Any) -> LastfmTrack:
+        """
+        Returns the track node of a top item, loved track or played track,
+        creating it if it does not exist.
+        """
+        track = item.item if hasattr(item, 'item') else item.track
+        item_name = track.get_name()
+        # Set by pylast from the listing, reading it makes no request
+        artist_name = track.artist.name if getattr(track, 'artist', None) else ''
+        node = await  LastfmTrack.nodes.get_or_none(name=item_name)
+        if not node:
+            logger.debug(f"Track not found, creating new node: {item_name}")
+            if hasattr(item, 'item'):
+                item_id = track.get_mbid() if track.get_mbid() is not None else item_name
+                node = await  LastfmTrack(lastfm_id=item_id, name=item_name, artist_name=artist_name).save()
+            else:
+                node = await  LastfmTrack(name=item_name, artist_name=artist_name).save()
+        elif artist_name and not node.artist_name:
+            node.artist_name = artist_name
+            await node.save()
+        return node
+
     async def _process_played_track(self, user: Any, item: pylast.Track) -> None:
         """
         Processes and saves a played track node to Neo4j, and creates a relationship with the user.
         """
         logger.debug(f"Processing played track: {item.track.get_name()} for user: {user}")
-        loop = asyncio.get_event_loop()
-        track_name = item.track.get_name()
-        node = await  LastfmTrack.nodes.get_or_none(name=track_name)
-        if not node:
-            logger.debug(f"Played track not found, creating new node: {track_name}")
-            node = await  LastfmTrack(name=track_name).save()
+        node = await self._upsert_track(item)
         if not await self._relationship_exists(user, node, 'played_tracks'):
-            logger.debug(f"Creating relationship between user and played track: {track_name}")
+            logger.debug(f"Creating relationship between user and played track: {node.name}")
             await  user.played_tracks.connect(node)
 
     async def _process_genre(self, user: Any, item: Tuple[str, int], relation_type: str) -> None:
@@ -201,10 +237,14 @@ class LastFmService(ServiceStrategy):
         """
         logger.debug(f"Processing genre: {item[0]} for user: {user}")
         item_name = item[0]
-        node = await  LastfmGenre.nodes.get_or_none(name=item_name)
-        if not node:
-            logger.debug(f"Genre not found, creating new node: {item_name}")
-            node = await  LastfmGenre(name=item_name).save()
+        element_id = (await self._upsert_genres([item]))[item_name]
+        results, _ = await sync_to_async(db.cypher_query)(
+            "MATCH (g) WHERE elementId(g) = $element_id RETURN g", {'element_id': element_id})
+        if not results:
+            # Merged since it was cached in another process, it resolves on the next sync
+            logger.warning(f"Genre {item_name} no longer exists, not connecting it")
+            return
+        node = LastfmGenre.inflate(results[0][0])
         if relation_type == "top":
                 logger.debug(f"Creating relationship between user and genre: {item_name}")
                 await  user.top_genres.connect(node)
@@ -213,6 +253,95 @@ class LastFmService(ServiceStrategy):
                 logger.debug(f"Creating relationship between user and genre: {item_name}")
                 await  user.likes_genres.connect(node)
 
+    async def _upsert_genres(self, items: List[Tuple[str, int]]) -> Dict[str, str]:
+        """
+        Creates the missing genre nodes of `(name, weight)` items in one statement.
+        Returns the element ids of all of them by name.
+        """
+        names = list(dict.fromkeys(item[0] for item in items))
+        element_ids = await EntityCache.get_many('LastfmGenre', names)
+        names = [name for name in names if name not in element_ids]
+        aliased = await resolve_aliases('LastfmGenre', 'name', names)
+        await EntityCache.set_many('LastfmGenre', aliased)
+        element_ids.update(aliased)
+        names = [name for name in names if name not in aliased]
+        if names:
+            results, _ = await sync_to_async(db.cypher_query)(
+                "UNWIND $names AS name MERGE (g:LastfmGenre {name: name}) RETURN name, elementId(g)",
+                {'names': names},
+            )
+            await EntityCache.set_many('LastfmGenre', dict(results))
+            element_ids.update(dict(results))
+        return element_ids
+
+    async def save_user_likes(self, user: Any, progress: Any = None) -> Dict[str, int]:
+        """
+        Syncs the user's top and loved items with Last.fm, writing only the
+        relationships that changed since the last sync.
+        """
+        logger.debug(f"Saving user likes for user: {user.username}")
+        if progress is not None:
+            await progress.set_totals(fetch=1, map=7, link=7)
+
+        async def fetch_artists_and_genres():
+            # Genres come from the tags of the top artists, fetched once for both
+            top_artists = await self.fetch_top_artists(user.username)
+            return top_artists, await self.fetch_top_genres(user.username, top_artists)
+
+        (top_artists, top_genres), top_tracks, liked_tracks, recent_tracks = await asyncio.gather(
+            fetch_artists_and_genres(),
+            self.fetch_top_tracks(user.username),
+            self.fetch_liked_tracks(user.username),
+            self.fetch_recent_tracks(user.username),
+        )
+        if progress is not None:
+            await progress.advance('fetch')
+
+        def track_name(item):
+            return (item.item if hasattr(item, 'item') else item.track).get_name()
+
+        def upsert(method, label, items):
+            name = {'LastfmArtist': lambda item: item.item.get_name(), 'LastfmTrack': track_name}[label]
+
+            async def run():
+                # Items resolved recently, by this sync or an earlier one, are not looked up again
+                unique_items = {name(item): item for item in items}
+                cached = await EntityCache.get_many(label, list(unique_items))
+                # Items merged into another node are not created again
+                aliased = await resolve_aliases(label, 'name', [key for key in unique_items if key not in cached])
+                await EntityCache.set_many(label, aliased)
+                nodes = await asyncio.gather(*(
+                    method(item) for key, item in unique_items.items() if key not in cached and key not in aliased
+                ))
+                await EntityCache.set_many(label, {node.name: node.element_id for node in nodes})
+            return run
+
+        artist_names = [item.item.get_name() for item in top_artists]
+        top_track_names = [track_name(item) for item in top_tracks]
+        genre_names = [item[0] for item in top_genres]
+        # Top items are liked too, as in `_process_*` with relation_type "top"
+        relations = [
+            ('TOP_ARTIST', 'LastfmArtist', artist_names, upsert(self._upsert_artist, 'LastfmArtist', top_artists)),
+            ('LIKES_ARTIST', 'LastfmArtist', artist_names, upsert(self._upsert_artist, 'LastfmArtist', top_artists)),
+            ('TOP_TRACK', 'LastfmTrack', top_track_names, upsert(self._upsert_track, 'LastfmTrack', top_tracks)),
+            ('LIKES_TRACK', 'LastfmTrack', top_track_names + [track_name(item) for item in liked_tracks],
+             upsert(self._upsert_track, 'LastfmTrack', top_tracks + liked_tracks)),
+            ('PLAYED_TRACK', 'LastfmTrack', [track_name(item) for item in recent_tracks],
+             upsert(self._upsert_track, 'LastfmTrack', recent_tracks)),
+            ('TOP_GENRE', 'LastfmGenre', genre_names, lambda: self._upsert_genres(top_genres)),
+            ('LIKES_GENRE', 'LastfmGenre', genre_names, lambda: self._upsert_genres(top_genres)),
+        ]
+        # Relations sharing nodes are synced one after another so a node is not created twice
+        results = [
+            await LikeSyncService.sync(user, relation_type, node_label, 'name', keys, run, progress)
+            for relation_type, node_label, keys, run in relations
+        ]
+        counts = {key: sum(result[key] for result in results) for key in ('added', 'removed', 'unchanged')}
+        logger.info(f"Saved Last.fm likes for {user.username}: {counts}, tag cache: {LastfmTagCache.stats()}")
+        if counts['unchanged'] < len(results):
+            await BudIndexService.update_account(user)
+        return counts
+
     async def clear_user_likes(self, user: Any) -> None:
         """
         Clears the user's existing likes in Neo4j.
@@ -229,4 +358,5 @@ class LastFmService(ServiceStrategy):
             user.likes_genres.disconnect_all(),
             user.played_tracks.disconnect_all()
         )
+        await LikeSyncService.reset(user.uid)
         logger.debug("User likes cleared successfully")
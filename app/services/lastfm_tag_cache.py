@@ -0,0 +1,121 @@
+import asyncio
+import logging
+import time
+import weakref
+from django.conf import settings
+from django.core.cache import cache
+from app.services.ttl_cache import TTLCache
+
+logger = logging.getLogger('app')
+
+
+class RateLimiter:
+    """Spaces calls of one process at least `1 / rate` seconds apart."""
+
+    def __init__(self, rate):
+        self.interval = 1 / rate if rate else 0
+        self.next_call = 0
+        # Locks are bound to the event loop they are first awaited on
+        self.locks = weakref.WeakKeyDictionary()
+
+    async def wait(self):
+        if not self.interval:
+            return
+        loop = asyncio.get_running_loop()
+        lock = self.locks.setdefault(loop, asyncio.Lock())
+        async with lock:
+            now = time.monotonic()
+            if self.next_call > now:
+                await asyncio.sleep(self.next_call - now)
+            self.next_call = max(now, self.next_call) + self.interval
+
+
+class LastfmTagCache:
+    """
+    Top tags of Last.fm artists by name, shared by all users.
+
+    Tags live in a process LRU and in the Django cache for
+    `LASTFM_TAG_CACHE_TTL` seconds, so the artists of every user's top list
+    are fetched from Last.fm once per TTL across workers. Missing artists are
+    fetched concurrently, at most `LASTFM_TAG_CONCURRENCY` at a time and
+    `LASTFM_RATE_LIMIT` per second, and an artist requested by two syncs at
+    once is fetched once.
+    """
+
+    local = TTLCache(getattr(settings, 'LASTFM_TAG_CACHE_SIZE', 10000), getattr(settings, 'LASTFM_TAG_CACHE_TTL', 604800))
+    limiter = RateLimiter(getattr(settings, 'LASTFM_RATE_LIMIT', 5))
+    _semaphores = weakref.WeakKeyDictionary()
+    _in_flight = weakref.WeakKeyDictionary()
+
+    @staticmethod
+    def cache_key(name):
+        return f'lastfm_tags:{name.strip().lower()}'
+
+    @classmethod
+    def semaphore(cls):
+        loop = asyncio.get_running_loop()
+        if loop not in cls._semaphores:
+            cls._semaphores[loop] = asyncio.Semaphore(getattr(settings, 'LASTFM_TAG_CONCURRENCY', 8))
+        return cls._semaphores[loop]
+
+    @classmethod
+    async def get_many(cls, names, fetch):
+        """
+        `{name: [(tag, weight)]}` of artist `names`, fetching the uncached ones
+        with the `fetch(name)` coroutine. Artists whose fetch failed are left out.
+        """
+        tags = {}
+        missing = []
+        for name in dict.fromkeys(names):
+            cached = cls.local.get(cls.cache_key(name))
+            if cached is None:
+                missing.append(name)
+            else:
+                tags[name] = cached
+        if missing:
+            try:
+                shared = await cache.aget_many([cls.cache_key(name) for name in missing])
+            except Exception as e:
+                logger.debug(f"Last.fm tag cache unavailable: {e}")
+                shared = {}
+            for name in missing:
+                cached = shared.get(cls.cache_key(name))
+                if cached is not None:
+                    cls.local.set(cls.cache_key(name), cached)
+                    tags[name] = cached
+
+        to_fetch = [name for name in missing if name not in tags]
+        fetched = await asyncio.gather(*(cls.fetch_once(name, fetch) for name in to_fetch))
+        tags.update((name, result) for name, result in zip(to_fetch, fetched) if result is not None)
+        logger.debug(f"Last.fm tags of {len(tags)} artists, {len(to_fetch)} fetched")
+        return tags
+
+    @classmethod
+    async def fetch_once(cls, name, fetch):
+        in_flight = cls._in_flight.setdefault(asyncio.get_running_loop(), {})
+        key = cls.cache_key(name)
+        if key not in in_flight:
+            in_flight[key] = asyncio.ensure_future(cls.fetch(name, fetch))
+            in_flight[key].add_done_callback(lambda _: in_flight.pop(key, None))
+        return await asyncio.shield(in_flight[key])
+
+    @classmethod
+    async def fetch(cls, name, fetch):
+        async with cls.semaphore():
+            await cls.limiter.wait()
+            try:
+                tags = [[tag, weight] for tag, weight in await fetch(name)]
+            except Exception as e:
+                # Not cached, the next sync tries again
+                logger.warning(f"Error fetching Last.fm tags of {name}: {e}")
+                return None
+        cls.local.set(cls.cache_key(name), tags)
+        try:
+            await cache.aset(cls.cache_key(name), tags, timeout=cls.local.ttl)
+        except Exception as e:
+            logger.debug(f"Last.fm tag cache unavailable: {e}")
+        return tags
+
+    @classmethod
+    def stats(cls):
+        return cls.local.stats()
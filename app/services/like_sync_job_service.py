@@ -0,0 +1,201 @@
+import asyncio
+import itertools
+import logging
+import traceback
+from datetime import timedelta
+from django.conf import settings
+from django.db import IntegrityError
+from django.utils import timezone
+from app.db_models.parent_user import ParentUser
+from app.models import LikeSyncJob
+
+logger = logging.getLogger('app')
+
+LIKE_SYNC_PROVIDERS = ('spotify', 'lastfm', 'ytmusic', 'mal')
+LIKE_SYNC_STAGES = ('fetch', 'map', 'link')
+# Priorities of the broker, see CELERY_BROKER_TRANSPORT_OPTIONS (0 runs first)
+LIKE_SYNC_PRIORITIES = range(10)
+
+
+class JobProgress:
+    """
+    Progress of a running job, passed to `save_user_likes` as `progress`.
+
+    Providers set the total of each stage before they start and advance
+    stages as relations are fetched, their nodes mapped and linked.
+    """
+
+    def __init__(self, job):
+        self.job = job
+        self.lock = asyncio.Lock()
+
+    async def set_totals(self, **totals):
+        async with self.lock:
+            for stage, total in totals.items():
+                self.job.progress[stage] = {'done': 0, 'total': total}
+            await self._save()
+
+    async def advance(self, stage, count=1):
+        async with self.lock:
+            entry = self.job.progress.setdefault(stage, {'done': 0, 'total': 0})
+            entry['done'] += count
+            self.job.stage = stage
+            await self._save()
+
+    async def _save(self):
+        await self.job.asave(update_fields=['progress', 'stage', 'updated_at'])
+
+
+class InProcessJobQueue:
+    """
+    Priority queue per provider, drained by `LIKE_SYNC_WORKERS[provider]`
+    worker tasks on the server's event loop. Used when no Celery worker runs;
+    jobs still queued when the process exits are marked failed as stale.
+    """
+
+    def __init__(self):
+        self.queues = {}
+        self.workers = {}
+        self.loop = None
+        self.counter = itertools.count()
+
+    def submit(self, job):
+        loop = asyncio.get_running_loop()
+        if self.loop is not loop:
+            # Queues are bound to the loop they were created on
+            self.queues, self.workers, self.loop = {}, {}, loop
+        if job.provider not in self.queues:
+            self.queues[job.provider] = asyncio.PriorityQueue()
+            workers = getattr(settings, 'LIKE_SYNC_WORKERS', {}).get(job.provider, 2)
+            self.workers[job.provider] = [
+                loop.create_task(self._work(self.queues[job.provider])) for _ in range(workers)
+            ]
+        # The counter keeps jobs of the same priority in submission order
+        self.queues[job.provider].put_nowait((job.priority, next(self.counter), job.id))
+
+    async def _work(self, queue):
+        while True:
+            _, _, job_id = await queue.get()
+            try:
+                await LikeSyncJobService.run(job_id)
+            except Exception as e:
+                logger.error(f"Like sync job {job_id} crashed: {e}")
+            finally:
+                queue.task_done()
+
+
+in_process_queue = InProcessJobQueue()
+
+
+class LikeSyncJobService:
+    """
+    Runs like syncs as background jobs.
+
+    `enqueue` returns the active job of a user and provider if there is one,
+    so repeated requests do not start parallel syncs. Jobs run on Celery
+    workers (one `likes.<provider>` queue per provider) or, with
+    `LIKE_SYNC_BACKEND = 'inprocess'`, on the server's own event loop.
+    """
+
+    @staticmethod
+    def stale_after():
+        return timedelta(seconds=getattr(settings, 'LIKE_SYNC_JOB_TIMEOUT', 900))
+
+    @classmethod
+    async def enqueue(cls, parent_user, provider, priority=5):
+        if provider not in LIKE_SYNC_PROVIDERS:
+            raise ValueError(f"Unsupported provider: {provider}")
+        if isinstance(priority, bool) or not isinstance(priority, int) or priority not in LIKE_SYNC_PRIORITIES:
+            raise ValueError(f"Priority must be an integer from 0 to {LIKE_SYNC_PRIORITIES[-1]}")
+
+        active = await cls.active_job(parent_user.uid, provider)
+        if active:
+            return active, False
+        try:
+            job = await LikeSyncJob.objects.acreate(user_uid=parent_user.uid, provider=provider, priority=priority)
+        except IntegrityError:
+            # Another request created the job between the lookup and the insert
+            return await cls.active_job(parent_user.uid, provider), False
+
+        try:
+            cls.dispatch(job)
+        except Exception as e:
+            # Nothing will run the job, it must not block the next request
+            logger.error(f"Error dispatching like sync {job.id}: {e}")
+            job.status = LikeSyncJob.FAILED
+            job.error = f"Dispatch failed: {e}"
+            await job.asave(update_fields=['status', 'error', 'updated_at'])
+            raise
+        logger.info(f"Queued {provider} like sync {job.id} for user {parent_user.uid}")
+        return job, True
+
+    @classmethod
+    async def active_job(cls, user_uid, provider):
+        job = await LikeSyncJob.objects.filter(
+            user_uid=user_uid, provider=provider, status__in=LikeSyncJob.ACTIVE_STATUSES,
+        ).afirst()
+        if job and job.updated_at < timezone.now() - cls.stale_after():
+            # The worker running it died, let a new job replace it
+            job.status = LikeSyncJob.FAILED
+            job.error = 'Job timed out'
+            await job.asave(update_fields=['status', 'error', 'updated_at'])
+            return None
+        return job
+
+    @staticmethod
+    def dispatch(job):
+        if getattr(settings, 'LIKE_SYNC_BACKEND', 'celery') == 'inprocess':
+            in_process_queue.submit(job)
+        else:
+            from app.tasks.like_sync_tasks import sync_likes_task
+            sync_likes_task.apply_async(args=[str(job.id)], queue=f'likes.{job.provider}', priority=job.priority)
+
+    @classmethod
+    async def run(cls, job_id):
+        job = await LikeSyncJob.objects.aget(id=job_id)
+        if job.status != LikeSyncJob.QUEUED:
+            logger.warning(f"Like sync job {job_id} is {job.status}, not running it again")
+            return job
+
+        job.status = LikeSyncJob.RUNNING
+        job.progress = {stage: {'done': 0, 'total': 0} for stage in LIKE_SYNC_STAGES}
+        await job.asave(update_fields=['status', 'progress', 'updated_at'])
+        try:
+            result = await cls.sync(job, JobProgress(job))
+            job.status = LikeSyncJob.SUCCEEDED
+            job.result = result if isinstance(result, dict) else {}
+        except Exception as e:
+            logger.error(f"Like sync job {job_id} failed: {e}")
+            logger.error(f"Traceback: {traceback.format_exc()}")
+            job.status = LikeSyncJob.FAILED
+            job.error = str(e)
+        await job.asave(update_fields=['status', 'result', 'error', 'updated_at'])
+        return job
+
+    @staticmethod
+    async def sync(job, progress):
+        from app.services.service_selector import get_service
+
+        parent_user = await ParentUser.nodes.get(uid=job.user_uid)
+        service = await get_service(job.provider)
+        if job.provider == 'spotify':
+            return await service.save_user_likes(parent_user, progress=progress)
+
+        account = await getattr(parent_user, f'{job.provider}_account').get_or_none()
+        if account is None:
+            raise ValueError(f"No {job.provider} account connected to user {parent_user.username}")
+        return await service.save_user_likes(account, progress=progress)
+
+    @staticmethod
+    def serialize(job):
+        return {
+            'job_id': str(job.id),
+            'provider': job.provider,
+            'status': job.status,
+            'stage': job.stage,
+            'progress': job.progress,
+            'result': job.result,
+            'error': job.error,
+            'created_at': job.created_at.isoformat(),
+            'updated_at': job.updated_at.isoformat(),
+        }
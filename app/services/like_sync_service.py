@@ -0,0 +1,115 @@
+import hashlib
+import logging
+from asgiref.sync import sync_to_async
+from neomodel import db
+from app.models import LikeSyncState
+from app.services.entity_aliases import alias_key, alias_prefix
+
+logger = logging.getLogger('app')
+
+
+def content_hash(keys):
+    """Order-independent hash of the item keys of one relationship."""
+    return hashlib.sha1('\n'.join(sorted(str(key) for key in keys)).encode()).hexdigest()
+
+
+def build_sync_query(relation_type, node_label, key_property):
+    """
+    Replace the `relation_type` relationships of a user with ones to the
+    `node_label` nodes whose `key_property` is in `$keys`, touching only the
+    relationships that differ. Both halves run in one statement, so readers
+    never see the user without likes. Keys of nodes merged into another one
+    resolve through their MergedKey to the kept node.
+    """
+    return f"""
+    MATCH (u) WHERE elementId(u) = $user_id
+    CALL {{
+        WITH u
+        MATCH (u)-[r:{relation_type}]->(n)
+        WHERE NOT coalesce(n.{key_property} IN $keys, false)
+          AND NOT EXISTS {{ MATCH (alias:MergedKey)-[:ALIAS_OF]->(n) WHERE alias.key IN $aliases }}
+        DELETE r
+        RETURN count(r) AS removed
+    }}
+    CALL {{
+        WITH u
+        UNWIND $keys AS key
+        CALL {{
+            WITH key
+            MATCH (n:{node_label} {{{key_property}: key}})
+            RETURN n
+            UNION
+            WITH key
+            MATCH (:MergedKey {{key: $alias_prefix + toString(key)}})-[:ALIAS_OF]->(n)
+            RETURN n
+        }}
+        WITH DISTINCT u, n
+        WHERE NOT (u)-[:{relation_type}]->(n)
+        CREATE (u)-[:{relation_type}]->(n)
+        RETURN count(n) AS added
+    }}
+    RETURN removed, added
+    """
+
+
+class LikeSyncService:
+    """
+    Diff-based like sync for service accounts.
+
+    Each relationship type of an account stores the content hash of the items
+    it was last synced to. A sync with the same items returns without writing;
+    otherwise the nodes are upserted and only the relationships that were
+    added or removed are written.
+    """
+
+    @staticmethod
+    async def sync(user, relation_type, node_label, key_property, keys, upsert=None, progress=None):
+        """
+        Sync the `relation_type` relationships of the `user` node to the items
+        identified by `keys`. `upsert` is awaited before the relationships are
+        written to create or update the item nodes, and only if they changed.
+        A job `progress` advances its map and link stages by one.
+
+        Returns `{'added', 'removed', 'unchanged'}` counts.
+        """
+        keys = list(dict.fromkeys(keys))
+        digest = content_hash(keys)
+        state = await LikeSyncState.objects.filter(user_uid=user.uid, relation_type=relation_type).afirst()
+        if state and state.content_hash == digest:
+            logger.debug(f"{relation_type} of {user.uid} unchanged, skipping sync")
+            if progress is not None:
+                await progress.advance('map')
+                await progress.advance('link')
+            return {'added': 0, 'removed': 0, 'unchanged': 1}
+
+        if upsert is not None:
+            await upsert()
+        if progress is not None:
+            await progress.advance('map')
+        results, _ = await sync_to_async(db.cypher_query)(
+            build_sync_query(relation_type, node_label, key_property),
+            {
+                'user_id': user.element_id,
+                'keys': keys,
+                'aliases': [alias_key(node_label, key_property, key) for key in keys],
+                'alias_prefix': alias_prefix(node_label, key_property),
+            },
+        )
+        if not results:
+            logger.warning(f"User node of {user.uid} not found, {relation_type} not synced")
+            return {'added': 0, 'removed': 0, 'unchanged': 0}
+        removed, added = results[0]
+        await LikeSyncState.objects.aupdate_or_create(
+            user_uid=user.uid,
+            relation_type=relation_type,
+            defaults={'content_hash': digest, 'item_count': len(keys)},
+        )
+        if progress is not None:
+            await progress.advance('link')
+        logger.debug(f"Synced {relation_type} of {user.uid}: {added} added, {removed} removed")
+        return {'added': added, 'removed': removed, 'unchanged': 0}
+
+    @staticmethod
+    async def reset(user_uid):
+        """Forget the sync state of an account, its next sync rewrites every relationship."""
+        await LikeSyncState.objects.filter(user_uid=user_uid).adelete()
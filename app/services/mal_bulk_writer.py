@@ -0,0 +1,82 @@
+import logging
+import uuid
+from asgiref.sync import sync_to_async
+from neomodel import db
+from app.services.entity_cache import EntityCache
+
+logger = logging.getLogger('app')
+
+# list kind -> (node label merged on, merge key)
+MAL_LABELS = {
+    'anime': ('Anime', 'anime_id'),
+    'manga': ('Manga', 'manga_id'),
+}
+
+
+def item_row(item_data):
+    node = item_data['node']
+    picture = node.get('main_picture') or {}
+    return {
+        'key': int(node['id']),
+        'uid': uuid.uuid4().hex,
+        'title': node['title'],
+        'picture': {'medium': picture.get('medium', ''), 'large': picture.get('large', '')} if picture else None,
+    }
+
+
+def build_upsert_query(kind):
+    node_label, key = MAL_LABELS[kind]
+    return f"""
+    UNWIND $rows AS row
+    MERGE (n:{node_label} {{{key}: row.key}})
+    ON CREATE SET n.uid = row.uid, n.title = row.title
+    FOREACH (picture IN CASE WHEN row.picture IS NULL THEN [] ELSE [row.picture] END |
+        MERGE (n)-[:HAS_PICTURE]->(p:MainPicture)
+        SET p.medium = picture.medium, p.large = picture.large
+    )
+    RETURN row.key, elementId(n)
+    """
+
+
+class MalBulkWriter:
+    """
+    Upserts the anime or manga of a MAL list page, with their main pictures,
+    in `UNWIND $rows MERGE` batches instead of a lookup, two saves and a
+    connect per item. Items the EntityCache resolved recently are skipped.
+    """
+
+    batch_size = 500
+
+    @classmethod
+    def build_rows(cls, items):
+        rows = {}
+        invalid = 0
+        for item in items:
+            try:
+                row = item_row(item)
+            except (KeyError, TypeError, ValueError) as e:
+                logger.error(f"Skipping invalid MAL item data: {e}")
+                invalid += 1
+                continue
+            # An item listed twice is merged once
+            rows[row['key']] = row
+        return list(rows.values()), invalid
+
+    @classmethod
+    async def write(cls, kind, items):
+        """Upserts a page of list `items`, returns `(keys, counts)`."""
+        node_label, _ = MAL_LABELS[kind]
+        rows, invalid = cls.build_rows(items)
+        keys = [row['key'] for row in rows]
+        counts = {'nodes': 0, 'cached': 0, 'invalid': invalid}
+
+        cached = await EntityCache.get_many(node_label, keys)
+        counts['cached'] = len(cached)
+        rows = [row for row in rows if row['key'] not in cached]
+
+        query = build_upsert_query(kind)
+        for start in range(0, len(rows), cls.batch_size):
+            results, _ = await sync_to_async(db.cypher_query)(query, {'rows': rows[start:start + cls.batch_size]})
+            await EntityCache.set_many(node_label, dict(results))
+            counts['nodes'] += len(results)
+        return keys, counts
@@ -0,0 +1,101 @@
+import asyncio
+import logging
+import aiohttp
+from django.conf import settings
+
+logger = logging.getLogger('app')
+
+# The session belongs to the event loop that created it, management commands
+# and Celery tasks each run their own loop
+_session = None
+_loop = None
+
+
+class MalAPIError(Exception):
+    def __init__(self, http_status, message):
+        super().__init__(f"MAL API error {http_status}: {message}")
+        self.http_status = http_status
+
+
+def api_url():
+    # Overridable to ingest from a mock server, see the benchmark_mal_ingestion command
+    return getattr(settings, 'MAL_API_URL', 'https://api.myanimelist.net/v2')
+
+
+async def get_session():
+    """The pooled keep-alive session shared by every MAL fetcher of the current event loop."""
+    global _session, _loop
+    loop = asyncio.get_running_loop()
+    if _session is None or _session.closed or _loop is not loop:
+        _session = aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(limit=getattr(settings, 'MAL_CONCURRENCY', 16), keepalive_timeout=60),
+            timeout=aiohttp.ClientTimeout(total=30),
+        )
+        _loop = loop
+    return _session
+
+
+async def close_session():
+    global _session
+    if _session is not None and not _session.closed:
+        await _session.close()
+    _session = None
+
+
+class MalFetcher:
+    """
+    Fetches the lists of one MyAnimeList user over the shared aiohttp session.
+
+    `pages` requests the next page of a list as soon as the current one
+    arrives, so the caller writes a page while the next one downloads.
+    """
+
+    max_retries = 5
+
+    def __init__(self, access_token):
+        self.access_token = access_token
+
+    async def get(self, url, params=None):
+        session = await get_session()
+        if not url.startswith('http'):
+            url = f"{api_url()}/{url}"
+        headers = {'Authorization': f"Bearer {self.access_token}"}
+        for attempt in range(self.max_retries):
+            async with session.get(url, params=params, headers=headers) as response:
+                if response.status == 429:
+                    wait_time = float(response.headers.get('Retry-After', 2 ** attempt))
+                elif response.status >= 500:
+                    wait_time = 2 ** attempt
+                elif response.status >= 400:
+                    raise MalAPIError(response.status, await response.text())
+                else:
+                    return await response.json()
+            logger.warning(f"MAL returned {response.status} for {url}. Retrying in {wait_time} seconds...")
+            await asyncio.sleep(wait_time)
+        raise MalAPIError(response.status, "Max retries exceeded.")
+
+    async def pages(self, url, params=None, prefetch=True):
+        """Yields the pages of a paginated list, following its `paging.next` links."""
+        next_page = asyncio.ensure_future(self.get(url, params))
+        try:
+            while next_page is not None:
+                page = await next_page
+                link = page.get('paging', {}).get('next')
+                # `next` already carries the query string
+                next_page = asyncio.ensure_future(self.get(link)) if link and prefetch else None
+                yield page
+                if link and not prefetch:
+                    next_page = asyncio.ensure_future(self.get(link))
+        finally:
+            if next_page is not None and not next_page.done():
+                next_page.cancel()
+
+    async def user_info(self):
+        return await self.get('users/@me')
+
+    def list_pages(self, kind, prefetch=True):
+        """Pages of the user's `anime` or `manga` list."""
+        return self.pages(f'users/@me/{kind}list', {
+            'limit': getattr(settings, 'MAL_PAGE_SIZE', 100),
+            'fields': 'list_status',
+        }, prefetch=prefetch)
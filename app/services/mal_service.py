@@ -5,15 +5,16 @@ import os
 import requests
 import logging
 from .service_strategy import ServiceStrategy
+from .bud_index_service import BudIndexService
+from .like_sync_service import LikeSyncService
+from .mal_fetcher import MalFetcher, MalAPIError
+from .mal_bulk_writer import MalBulkWriter
 
 import asyncio
 from asgiref.sync import sync_to_async
 
 from ..db_models.mal.list_status import ListStatus
-from ..db_models.mal.main_picture import MainPicture
 from ..db_models.mal.mal_user import MalUser
-from ..db_models.mal.mal_anime import Anime
-from ..db_models.mal.mal_manga import Manga
 
 logger = logging.getLogger('app')
 
@@ -83,128 +84,68 @@ class MalService(ServiceStrategy):
     
     async def get_user_info(self, access_token):
         logger.debug('Fetching user info')
-        headers = {'Authorization': f'Bearer {access_token}'}
-        response = requests.get('https://api.myanimelist.net/v2/users/@me', headers=headers)
-        user_info = response.json()
+        user_info = await MalFetcher(access_token).user_info()
 
         logger.info('MalUser info fetched successfully.')
         
         return user_info
-    
-    async def get_top_anime(self, user, link='https://api.myanimelist.net/v2/users/@me/animelist'):
-        logger.debug('Fetching top anime list')
-        headers = {'Authorization': f'Bearer {user.access_token}'}
-
-        while link:
-            response = requests.get(link, headers=headers)
-            
-            if response.status_code != 200:
-                logger.error(f'Failed to fetch top anime list: {response.status_code}')
-                break
-
-            top_anime = response.json()
-            logger.info('Top anime list fetched successfully.')
-
-            for anime_data in top_anime['data']:
-                node = anime_data['node']
-                logger.info(f"Anime data: {node}")
-                
-                # Check if the anime already exists
-                anime = await Anime.nodes.get_or_none(anime_id=node['id'])
-                if anime:
-                    logger.info(f"Anime with ID {node['id']} already exists, skipping creation.")
-                    continue
-
-                try:
-                    # Create and save the MainPicture node
-                    main_picture = await MainPicture(
-                        medium=node['main_picture'].get('medium', ''),
-                        large=node['main_picture'].get('large', '')
-                    ).save()
-
-                    # Create and save the Anime node
-                    anime = await Anime(
-                        anime_id=node['id'],
-                        title=node['title']
-                    ).save()
-
-                    # Establish relationships
-                    await anime.main_picture.connect(main_picture)
-                    await user.top_anime.connect(anime)
-
-                except Exception as e:
-                    logger.error(f"Error processing anime {node['id']}: {e}")
-                    continue
-
-            # Check for next page link
-            link = top_anime.get("paging", {}).get("next")
-
-        return
-            
-
-
-    async def get_top_manga(self, user, link='https://api.myanimelist.net/v2/users/@me/mangalist'):
-        logger.debug('Fetching top manga list')
-        headers = {'Authorization': f'Bearer {user.access_token}'}
-
-        while link:
-            response = requests.get(link, headers=headers)
-            
-            if response.status_code != 200:
-                logger.error(f'Failed to fetch top manga list: {response.status_code}')
-                break
-
-            top_manga = response.json()
-            logger.info('Top manga list fetched successfully.')
-            logger.info(f'Top manga list: {top_manga.get("paging", {}).get("next")}')
-
-            for manga_data in top_manga['data']:
-                node = manga_data['node']
-                logger.info(f"Manga data: {node}")
-
-                # Check if the manga already exists
-                manga = await Manga.nodes.get_or_none(manga_id=node['id'])
-                if manga:
-                    logger.info(f"Manga with ID {node['id']} already exists, skipping creation.")
-                    continue
-
-                try:
-                    # Create and save the MainPicture node
-                    main_picture = await MainPicture(
-                        medium=node['main_picture'].get('medium', ''),
-                        large=node['main_picture'].get('large', '')
-                    ).save()
-
-                    # Create and save the Manga node
-                    manga = await Manga(
-                        manga_id=node['id'],
-                        title=node['title']
-                    ).save()
-
-                    # Establish relationships
-                    await manga.main_picture.connect(main_picture)
-                    await user.top_manga.connect(manga)
-
-                except Exception as e:
-                    logger.error(f"Error processing manga {node['id']}: {e}")
-                    continue
-
-            # Check for next page link
-            link = top_manga.get("paging", {}).get("next")
-
-        return
-
-    async def save_user_likes(self,user):
+
+    async def get_top_list(self, user, kind, prefetch=True):
+        """
+        Ids of the user's `anime` or `manga` list, upserting its items page by
+        page while the next page downloads. Raises when the list could not be
+        fetched or written whole, a partial list would drop the user's other
+        items on sync.
+        """
+        logger.debug(f'Fetching top {kind} list')
+        ids = {}
+        counts = {'nodes': 0, 'cached': 0, 'invalid': 0}
         try:
-            # Clear existing likes
-            await user.top_anime.disconnect_all()
-            await user.top_manga.disconnect_all()
-            await asyncio.gather(
+            async for page in MalFetcher(user.access_token).list_pages(kind, prefetch=prefetch):
+                keys, written = await MalBulkWriter.write(kind, page.get('data', []))
+                ids.update(dict.fromkeys(keys))
+                for name in counts:
+                    counts[name] += written[name]
+        except MalAPIError as e:
+            logger.error(f'Failed to fetch top {kind} list: {e}')
+            raise
+        except Exception as e:
+            logger.error(f'Error writing top {kind} list: {e}')
+            raise
+
+        logger.info(f'Top {kind} list of {len(ids)} items fetched, {counts}')
+        return list(ids)
+
+    async def get_top_anime(self, user):
+        return await self.get_top_list(user, 'anime')
+
+    async def get_top_manga(self, user):
+        return await self.get_top_list(user, 'manga')
+
+    async def save_user_likes(self,user, progress=None):
+        try:
+            # get_top_* create the missing nodes, only the changed relationships are written
+            if progress is not None:
+                await progress.set_totals(fetch=1, map=2, link=2)
+            anime_ids, manga_ids = await asyncio.gather(
                 self.get_top_anime(user),
                 self.get_top_manga(user)
             )
+            if progress is not None:
+                await progress.advance('fetch')
+            results = await asyncio.gather(*(
+                LikeSyncService.sync(user, relation_type, label, key, ids, progress=progress)
+                for relation_type, label, key, ids in (
+                    ('TOP_ANIME', 'Anime', 'anime_id', anime_ids),
+                    ('TOP_MANGA', 'Manga', 'manga_id', manga_ids),
+                )
+            ))
+            if any(not result['unchanged'] for result in results):
+                await BudIndexService.update_account(user)
         except Exception as e:
-            logger.error(e)
+            # Raised so the like sync job records the failure
+            logger.error(f"Error saving MAL likes: {e}")
+            raise
 
     async def get_service_user(self, parent_user):
         # Implement this method to fetch the MyAnimeList user associated with the parent user
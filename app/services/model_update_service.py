@@ -0,0 +1,61 @@
+import logging
+import uuid
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+from ai.incremental import update_models
+from app.models import PendingModelUpdate
+from app.services.recommendation_service import model_dir, precompute_recommendations
+
+logger = logging.getLogger('app')
+
+
+class ModelUpdateService:
+    """
+    Keeps the LightFM models current between full retrains.
+
+    Like syncs only record the user as pending. A scheduled run folds the
+    likes of all pending users into the models with `fit_partial` and
+    refreshes their precomputed recommendations. One run at a time writes
+    the models, across the beat schedule and the `update_models` command.
+    """
+
+    lock_key = 'model_update_lock'
+
+    @staticmethod
+    async def mark_pending(spotify_uid):
+        await PendingModelUpdate.objects.aupdate_or_create(user_uid=spotify_uid)
+
+    @classmethod
+    async def run(cls, epochs=None, limit=None):
+        token = uuid.uuid4().hex
+        if not await cache.aadd(cls.lock_key, token, timeout=getattr(settings, 'MODEL_UPDATE_LOCK_TIMEOUT', 3600)):
+            logger.info("Model update already running, skipping")
+            return 0
+        try:
+            return await cls._run(epochs, limit)
+        finally:
+            # An expired lock may belong to the next run by now
+            if await cache.aget(cls.lock_key) == token:
+                await cache.adelete(cls.lock_key)
+
+    @classmethod
+    async def _run(cls, epochs=None, limit=None):
+        epochs = epochs or getattr(settings, 'MODEL_UPDATE_EPOCHS', 5)
+        started_at = timezone.now()
+        pending = PendingModelUpdate.objects.order_by('updated_at')
+        if limit:
+            pending = pending[:limit]
+        user_uids = [entry.user_uid async for entry in pending]
+        if not user_uids:
+            logger.info("No pending model updates")
+            return 0
+
+        interactions = await sync_to_async(update_models)(user_uids, model_dir(), epochs=epochs)
+        await precompute_recommendations(spotify_uids=user_uids)
+
+        # Users synced again while this run was training stay pending
+        await PendingModelUpdate.objects.filter(user_uid__in=user_uids, updated_at__lte=started_at).adelete()
+        logger.info(f"Incremental model update: {len(user_uids)} users, {interactions} interactions")
+        return len(user_uids)
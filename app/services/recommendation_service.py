@@ -1,37 +1,194 @@
+import logging
+import os
 import joblib
 import numpy as np
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import transaction
 from lightfm import LightFM
+from neomodel import db
 
-from app.db_models.parent_user import ParentUser 
-from app.db_models.artist import Artist 
-from app.db_models.track import Track 
+from ai.ann_index import RandomProjectionIndex
+from ai.batch_recommend import recommend_batch
+from ai.id_map import IdMap, load_id_map
+from app.models import UserRecommendations
+from app.db_models.parent_user import ParentUser
+from app.db_models.artist import Artist
+from app.db_models.track import Track
 
+logger = logging.getLogger('app')
 
+SPOTIFY_ACCOUNT_QUERY = """
+MATCH (:ParentUser {uid: $uid})-[:CONNECTED_TO_SPOTIFY]->(s:SpotifyUser)
+RETURN s.uid
+LIMIT 1
+"""
+
+PARENT_USERS_QUERY = """
+UNWIND $uids AS uid
+MATCH (p:ParentUser)-[:CONNECTED_TO_SPOTIFY]->(:SpotifyUser {uid: uid})
+RETURN uid, p.uid
+"""
+
+RECOMMENDATION_ITEM_TYPES = ('artist', 'track')
+
+_user_index = None
+_user_index_mtime = None
+
+
+def model_dir():
+    return getattr(settings, 'AI_MODEL_DIR', os.path.join(settings.BASE_DIR, 'ai'))
+
+
+def model_path(name):
+    return os.path.join(model_dir(), name)
+
+
+def load_user_index():
+    """
+    Return the ANN index over the LightFM user embeddings, loading it once per process.
+
+    The index is cached as `user_ann_index.pkl` next to the models and rebuilt
+    when a model file is newer, e.g. after an incremental update; processes
+    holding an older copy reload it on their next lookup. Returns None when
+    neither the models nor a cached index exist.
+    """
+    global _user_index, _user_index_mtime
+    index_path = model_path('user_ann_index.pkl')
+    model_paths = [model_path('model_artist.pkl'), model_path('model_track.pkl')]
+
+    if all(os.path.exists(path) for path in model_paths):
+        models_mtime = max(os.path.getmtime(path) for path in model_paths)
+        if not os.path.exists(index_path) or os.path.getmtime(index_path) < models_mtime:
+            index = RandomProjectionIndex.from_models(
+                [joblib.load(path) for path in model_paths], load_id_map(model_path('user_dict'))
+            )
+            index.save(index_path)
+
+    if not os.path.exists(index_path):
+        return None
+    index_mtime = os.path.getmtime(index_path)
+    if _user_index is None or _user_index_mtime != index_mtime:
+        _user_index = RandomProjectionIndex.load(index_path)
+        _user_index_mtime = index_mtime
+        logger.info(f"Loaded user ANN index with {len(_user_index.ids)} users")
+    return _user_index
+
+
+async def get_similar_users(user, limit=10):
+    """Return `(parent_uid, similarity)` pairs for the users closest to `user` in embedding space."""
+    results, _ = await sync_to_async(db.cypher_query)(SPOTIFY_ACCOUNT_QUERY, {'uid': user.uid})
+    if not results:
+        logger.warning(f"User {user.uid} has no Spotify account, no similar users")
+        return []
+
+    try:
+        index = await sync_to_async(load_user_index)()
+    except Exception as e:
+        logger.error(f"Error loading the user ANN index: {e}")
+        index = None
+    if index is None:
+        logger.warning(f"No trained models or user ANN index in {model_dir()}, no similar users")
+        return []
+    neighbors = index.query_id(results[0][0], k=limit)
+    if not neighbors:
+        logger.warning(f"User {user.uid} is not in the trained model yet")
+        return []
+
+    results, _ = await sync_to_async(db.cypher_query)(PARENT_USERS_QUERY, {'uids': [uid for uid, _ in neighbors]})
+    parent_uids = dict(results)
+    return [(parent_uids[uid], score) for uid, score in neighbors if uid in parent_uids]
+
+
+async def get_precomputed_recommendations(user_uid):
+    """Return the nightly `{item_type: [[item_name, score], ...]}` table entries of a user."""
+    entries = UserRecommendations.objects.filter(user_uid=user_uid)
+    return {entry.item_type: entry.items async for entry in entries}
 
-# Load the trained model
-# model = joblib.load('path/to/your_model.pkl')
 
 async def get_recommendations(user_id):
     user = await ParentUser.nodes.get_or_none(uid=user_id)
     if not user:
         raise ValueError(f"User with id {user_id} not found")
 
-    # Retrieve interactions for the user
-    # interactions = await get_user_interactions(user)
+    precomputed = await get_precomputed_recommendations(user.uid)
+    recommendations = {
+        'similar_users': await get_similar_users(user),
+        'track_recommendations': precomputed.get('track', []),
+        'artist_recommendations': precomputed.get('artist', []),
+    }
 
-    # Predict scores for all items
-    # scores = model.predict(user_id, np.arange(interactions.shape[1]))
+    return recommendations
 
-    # Get top N recommendations
-    # top_items = np.argsort(-scores)[:10]  # Adjust the number N as needed
 
-    # recommendations = {
-    #     'track_recommendations': await get_top_tracks(top_items),
-    #     'artist_recommendations': await get_top_artists(top_items),
-    # }
-    
-    # return recommendations
-    pass
+def load_recommendation_artifacts(item_type):
+    """Model, index -> name mapping and (optional) training interactions of one item type."""
+    model = joblib.load(model_path(f'model_{item_type}.pkl'))
+    item_names = load_id_map(model_path(f'item_dict_{item_type}'))
+    item_names = item_names.reversed if isinstance(item_names, IdMap) else joblib.load(model_path(f'item_dict_{item_type}_reversed.pkl'))
+    interactions_path = model_path(f'interactions_{item_type}.pkl')
+    interactions = joblib.load(interactions_path) if os.path.exists(interactions_path) else None
+    return model, item_names, interactions
+
+
+async def map_parent_uids(spotify_uids, batch_size=1000):
+    parent_uids = {}
+    for start in range(0, len(spotify_uids), batch_size):
+        results, _ = await sync_to_async(db.cypher_query)(
+            PARENT_USERS_QUERY, {'uids': spotify_uids[start:start + batch_size]}
+        )
+        parent_uids.update(results)
+    return parent_uids
+
+
+async def precompute_recommendations(top_n=None, block_size=1024, spotify_uids=None):
+    """
+    Score every trained user against every item in blocks and store the top-N
+    per user and item type in `UserRecommendations`, replacing the previous run.
+    Items the user already interacted with during training are left out.
+    With `spotify_uids` only the lists of those users are recomputed.
+    """
+    top_n = top_n or getattr(settings, 'RECOMMENDATIONS_TOP_N', 50)
+    user_dict = await sync_to_async(load_id_map)(model_path('user_dict'))
+    parent_uids = await map_parent_uids(list(spotify_uids) if spotify_uids is not None else list(user_dict))
+
+    total = 0
+    for item_type in RECOMMENDATION_ITEM_TYPES:
+        model, item_names, interactions = await sync_to_async(load_recommendation_artifacts)(item_type)
+        users = [
+            (parent_uid, user_dict[uid]) for uid, parent_uid in parent_uids.items()
+            if uid in user_dict and user_dict[uid] < model.user_embeddings.shape[0]
+        ]
+        rows = np.array([row for _, row in users], dtype=np.int32)
+        items, scores = await sync_to_async(recommend_batch)(model, rows, top_n, interactions, block_size)
+
+        entries = []
+        for (parent_uid, _), user_items, user_scores in zip(users, items, scores):
+            entries.append(UserRecommendations(
+                user_uid=parent_uid,
+                item_type=item_type,
+                items=[
+                    [item_names[int(item)], score.item()]
+                    for item, score in zip(user_items, user_scores)
+                    if np.isfinite(score) and int(item) in item_names
+                ],
+            ))
+        replaced = None if spotify_uids is None else [parent_uid for parent_uid, _ in users]
+        await sync_to_async(store_recommendations)(item_type, entries, replaced)
+        total += len(entries)
+        logger.info(f"Precomputed {item_type} recommendations for {len(entries)} users")
+    return total
+
+
+def store_recommendations(item_type, entries, user_uids=None):
+    """Replace the lists of `item_type`, only those of `user_uids` when given."""
+    with transaction.atomic():
+        previous = UserRecommendations.objects.filter(item_type=item_type)
+        if user_uids is not None:
+            previous = previous.filter(user_uid__in=user_uids)
+        previous.delete()
+        UserRecommendations.objects.bulk_create(entries, batch_size=1000)
+
 
 async def get_user_interactions(user):
     # Implement a method to get user interactions from Neo4j
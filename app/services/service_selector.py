@@ -1,4 +1,5 @@
 import logging
+import threading
 from django.conf import settings
 from app.services.lastfm_service import LastFmService
 from app.services.ytmusic_service import YTmusicService
@@ -7,21 +8,39 @@ from app.services.spotify_service import SpotifyService
 
 logger = logging.getLogger('app')
 
-async def get_service(service_name):
-    if service_name == 'spotify':
-        return SpotifyService(
-            settings.SPOTIFY_CLIENT_ID,
-            settings.SPOTIFY_CLIENT_SECRET,
-            settings.SPOTIFY_REDIRECT_URI
-                            )
-    elif service_name == 'lastfm':
-        return LastFmService(settings.LASTFM_API_KEY, settings.LASTFM_API_SECRET)
-    elif service_name == 'ytmusic':
-        return YTmusicService(settings.YTMUSIC_CLIENT_ID, settings.YTMUSIC_CLIENT_SECRET, settings.YTMUSIC_REDIRECT_URI)
-    elif service_name == 'mal':
-        return MalService(settings.MAL_CLIENT_ID, settings.MAL_CLIENT_SECRET, settings.MAL_REDIRECT_URI)
-    else:
+# Provider clients are stateless between calls, so one instance per process
+# serves every request and shares its OAuth config, executor and HTTP session
+SERVICE_FACTORIES = {
+    'spotify': lambda: SpotifyService(
+        settings.SPOTIFY_CLIENT_ID,
+        settings.SPOTIFY_CLIENT_SECRET,
+        settings.SPOTIFY_REDIRECT_URI
+    ),
+    'lastfm': lambda: LastFmService(settings.LASTFM_API_KEY, settings.LASTFM_API_SECRET),
+    'ytmusic': lambda: YTmusicService(settings.YTMUSIC_CLIENT_ID, settings.YTMUSIC_CLIENT_SECRET, settings.YTMUSIC_REDIRECT_URI),
+}
+
+_services = {}
+_services_lock = threading.Lock()
+
+
+def get_service_instance(service_name, request=None):
+    if service_name == 'mal':
+        # MalService holds the PKCE verifier of one authorization, it is built per call
+        return MalService(settings.MAL_CLIENT_ID, settings.MAL_CLIENT_SECRET, settings.MAL_REDIRECT_URI,
+                          settings.MAL_SCOPE, request)
+    factory = SERVICE_FACTORIES.get(service_name)
+    if factory is None:
         logger.error(f"Invalid service name: {service_name}")
         return None
+    service = _services.get(service_name)
+    if service is None:
+        with _services_lock:
+            service = _services.get(service_name)
+            if service is None:
+                service = _services[service_name] = factory()
+    return service
 
 
+async def get_service(service_name, request=None):
+    return get_service_instance(service_name, request)
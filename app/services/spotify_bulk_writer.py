@@ -0,0 +1,243 @@
+import logging
+import uuid
+from asgiref.sync import sync_to_async
+from neomodel import db
+from app.services.entity_aliases import link_aliased, resolve_aliases
+from app.services.entity_cache import EntityCache
+from app.services.like_sync_service import LikeSyncService
+
+logger = logging.getLogger('app')
+
+# Relationships a SpotifyUser can have to the items of a sync
+SPOTIFY_RELATIONS = {
+    'TOP_ARTIST', 'TOP_TRACK', 'TOP_GENRE', 'LIKES_ARTIST', 'LIKES_TRACK',
+    'LIKES_GENRE', 'LIKES_ALBUM', 'PLAYED_TRACK', 'SAVED_TRACK', 'SAVED_ALBUM',
+}
+
+# item label -> (node label merged on, merge key, inherited labels set on the node)
+SPOTIFY_LABELS = {
+    'Track': ('SpotifyTrack', 'spotify_id', 'LikedItem:Track'),
+    'Artist': ('SpotifyArtist', 'spotify_id', 'LikedItem:Artist'),
+    'Album': ('SpotifyAlbum', 'spotify_id', 'LikedItem:Album'),
+    'Genre': ('SpotifyGenre', 'name', 'LikedItem:Genre'),
+}
+
+
+def image_rows(images):
+    return [
+        {'url': image['url'], 'height': image.get('height'), 'width': image.get('width'), 'uid': uuid.uuid4().hex}
+        for image in images or [] if image and image.get('url')
+    ]
+
+
+def first_artist(item_data):
+    artists = [artist for artist in item_data.get('artists') or [] if artist and artist.get('name')]
+    return artists[0]['name'] if artists else ''
+
+
+def track_row(track_data):
+    return {
+        'key': track_data['id'],
+        'properties': {
+            'spotify_id': track_data['id'],
+            'name': track_data['name'],
+            'uri': track_data['uri'],
+            'duration_ms': track_data['duration_ms'],
+            'spotify_url': track_data['external_urls']['spotify'],
+            'href': track_data.get('href', ''),
+            'popularity': track_data.get('popularity', 0),
+            'type': track_data.get('type', 'track'),
+            'disc_number': track_data.get('disc_number', 1),
+            'explicit': track_data.get('explicit', False),
+            'isrc': track_data.get('external_ids', {}).get('isrc', ''),
+            'preview_url': track_data.get('preview_url', ''),
+            'track_number': track_data.get('track_number', 0),
+            'artist_name': first_artist(track_data),
+        },
+        'images': image_rows(track_data.get('album', {}).get('images')),
+    }
+
+
+def artist_row(artist_data):
+    return {
+        'key': artist_data['id'],
+        'properties': {
+            'spotify_id': artist_data['id'],
+            'name': artist_data['name'],
+            'uri': artist_data.get('uri', ''),
+            'spotify_url': artist_data.get('external_urls', {}).get('spotify', ''),
+            'href': artist_data.get('href', ''),
+            'popularity': artist_data.get('popularity', 0),
+            'followers': artist_data.get('followers', {}).get('total', 0),
+        },
+        'images': image_rows(artist_data.get('images')),
+    }
+
+
+def album_row(album_data):
+    return {
+        'key': album_data['id'],
+        'properties': {
+            'spotify_id': album_data['id'],
+            'name': album_data['name'],
+            'uri': album_data.get('uri', ''),
+            'spotify_url': album_data.get('external_urls', {}).get('spotify', ''),
+            'href': album_data.get('href', ''),
+            'album_type': album_data.get('album_type', ''),
+            'release_date': album_data.get('release_date', ''),
+            'release_date_precision': album_data.get('release_date_precision', ''),
+            'total_tracks': album_data.get('total_tracks', 0),
+            'artist_name': first_artist(album_data),
+        },
+        'images': image_rows(album_data.get('images')),
+    }
+
+
+def genre_row(genre_data):
+    # Genres come as names, (name, count) tuples from fetch_top_genres or dicts
+    if isinstance(genre_data, tuple):
+        genre_data = genre_data[0]
+    elif isinstance(genre_data, dict):
+        genre_data = genre_data.get('name')
+    if not isinstance(genre_data, str) or not genre_data:
+        raise ValueError(f"Invalid genre data: {genre_data}")
+    return {'key': genre_data, 'properties': {'name': genre_data}, 'images': []}
+
+
+ROW_BUILDERS = {
+    'Track': track_row,
+    'Artist': artist_row,
+    'Album': album_row,
+    'Genre': genre_row,
+}
+
+
+def build_upsert_query(label, relation_type=None):
+    node_label, key, extra_labels = SPOTIFY_LABELS[label]
+    connect = f"MERGE (u)-[:{relation_type}]->(n)" if relation_type else ''
+    return f"""
+    MATCH (u:SpotifyUser) WHERE elementId(u) = $user_id
+    UNWIND $rows AS row
+    MERGE (n:{node_label} {{{key}: row.key}})
+    ON CREATE SET n.uid = row.uid
+    SET n += row.properties, n:{extra_labels}
+    {connect}
+    FOREACH (image IN row.images |
+        MERGE (i:SpotifyImage {{url: image.url}})
+        ON CREATE SET i.uid = image.uid
+        SET i.height = image.height, i.width = image.width
+        MERGE (n)-[:HAS_IMAGE]->(i)
+    )
+    RETURN row.key, elementId(n)
+    """
+
+
+class SpotifyBulkWriter:
+    """
+    Upserts the items of a Spotify sync with a few `UNWIND $rows MERGE`
+    statements per label instead of per-item lookups, saves and connects.
+
+    Each statement merges a batch of nodes, their images and the user's
+    relationship to them, and every call reports what it wrote as counts.
+    `sync` writes only what changed since the previous sync, and skips the
+    nodes the EntityCache resolved recently.
+    """
+
+    batch_size = 500
+
+    @classmethod
+    def build_rows(cls, label, items):
+        rows = {}
+        invalid = 0
+        for item in items:
+            try:
+                row = ROW_BUILDERS[label](item)
+            except (KeyError, TypeError, ValueError) as e:
+                logger.error(f"Skipping invalid {label} data: {e}")
+                invalid += 1
+                continue
+            row['uid'] = uuid.uuid4().hex
+            # The same item can appear twice in one list, it is merged once
+            rows[row['key']] = row
+        return list(rows.values()), invalid
+
+    @classmethod
+    async def write(cls, spotify_user, label, items, relation_type):
+        if label not in ROW_BUILDERS:
+            logger.error(f"Unsupported label: {label}")
+            return {'nodes': 0, 'images': 0, 'relationships': 0, 'invalid': len(items)}
+        if relation_type not in SPOTIFY_RELATIONS:
+            logger.error(f"Unsupported relation type: {relation_type}, {label}s are saved without a relationship")
+            relation_type = None
+
+        rows, invalid = cls.build_rows(label, items)
+        counts = await cls.write_rows(spotify_user, label, rows, relation_type)
+        counts['invalid'] = invalid
+        return counts
+
+    @classmethod
+    async def write_rows(cls, spotify_user, label, rows, relation_type=None):
+        counts = {'nodes': 0, 'images': 0, 'relationships': 0, 'cached': 0}
+        node_label, key, _ = SPOTIFY_LABELS[label]
+        if not relation_type:
+            # Without a relationship to write, nodes upserted recently need no write at all
+            cached = await EntityCache.get_many(node_label, [row['key'] for row in rows])
+            counts['cached'] = len(cached)
+            rows = [row for row in rows if row['key'] not in cached]
+        # Items merged into another node resolve to it, merging on their key would create them again
+        aliased = await resolve_aliases(node_label, key, [row['key'] for row in rows])
+        if aliased:
+            await EntityCache.set_many(node_label, aliased)
+            counts['cached'] += len(aliased)
+            rows = [row for row in rows if row['key'] not in aliased]
+            if relation_type:
+                await link_aliased(spotify_user, relation_type, aliased.values())
+                counts['relationships'] += len(aliased)
+
+        query = build_upsert_query(label, relation_type)
+        for start in range(0, len(rows), cls.batch_size):
+            batch = rows[start:start + cls.batch_size]
+            results, _ = await sync_to_async(db.cypher_query)(query, {
+                'user_id': spotify_user.element_id,
+                'rows': batch,
+            })
+            if not results:
+                logger.warning(f"No {label}s written for user {spotify_user}, the SpotifyUser node was not found")
+                break
+            await EntityCache.set_many(node_label, dict(results))
+            counts['nodes'] += len(results)
+            if relation_type:
+                counts['relationships'] += len(results)
+        counts['images'] = len({image['url'] for row in rows for image in row['images']})
+        return counts
+
+    @classmethod
+    async def sync(cls, spotify_user, label, items, relation_type, progress=None):
+        """
+        Like `write`, but diff-based: the nodes are only upserted when the items
+        of `relation_type` changed since the last sync, and only the
+        relationships that were added or removed are written.
+        """
+        if label not in ROW_BUILDERS or relation_type not in SPOTIFY_RELATIONS:
+            logger.error(f"Unsupported label or relation type: {label}, {relation_type}")
+            return {'nodes': 0, 'images': 0, 'cached': 0, 'invalid': len(items), 'added': 0, 'removed': 0, 'unchanged': 0}
+
+        rows, invalid = cls.build_rows(label, items)
+        counts = {'nodes': 0, 'images': 0, 'cached': 0, 'invalid': invalid}
+
+        async def upsert():
+            written = await cls.write_rows(spotify_user, label, rows)
+            counts['nodes'], counts['images'], counts['cached'] = written['nodes'], written['images'], written['cached']
+
+        node_label, key, _ = SPOTIFY_LABELS[label]
+        delta = await LikeSyncService.sync(spotify_user, relation_type, node_label, key, [row['key'] for row in rows],
+                                            upsert, progress)
+        return {**counts, **delta}
+
+    @staticmethod
+    def merge_counts(*all_counts):
+        total = {}
+        for counts in all_counts:
+            for key, value in counts.items():
+                total[key] = total.get(key, 0) + value
+        return total
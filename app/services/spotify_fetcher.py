@@ -0,0 +1,185 @@
+import asyncio
+import logging
+import aiohttp
+from django.conf import settings
+
+logger = logging.getLogger('app')
+
+SPOTIFY_API_URL = 'https://api.spotify.com/v1'
+
+# The session and the global semaphore belong to the event loop that created
+# them, management commands and Celery tasks each run their own loop
+_session = None
+_global_semaphore = None
+_loop = None
+
+
+class SpotifyAPIError(Exception):
+    def __init__(self, http_status, message):
+        super().__init__(f"Spotify API error {http_status}: {message}")
+        self.http_status = http_status
+
+
+async def get_session():
+    """The pooled keep-alive session shared by every fetcher of the current event loop."""
+    global _session, _global_semaphore, _loop
+    loop = asyncio.get_running_loop()
+    if _session is None or _session.closed or _loop is not loop:
+        limit = getattr(settings, 'SPOTIFY_GLOBAL_CONCURRENCY', 32)
+        _session = aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(limit=limit, keepalive_timeout=60),
+            timeout=aiohttp.ClientTimeout(total=30),
+        )
+        _global_semaphore = asyncio.Semaphore(limit)
+        _loop = loop
+    return _session
+
+
+async def close_session():
+    global _session
+    if _session is not None and not _session.closed:
+        await _session.close()
+    _session = None
+
+
+class SpotifyFetcher:
+    """
+    Fetches the library of one Spotify user over the shared aiohttp session.
+
+    At most `SPOTIFY_USER_CONCURRENCY` requests of a user and
+    `SPOTIFY_GLOBAL_CONCURRENCY` requests of the process are in flight.
+    Results requested twice, like the top artists the top genres are counted
+    from, are fetched once per fetcher.
+    """
+
+    max_retries = 5
+
+    def __init__(self, access_token):
+        self.access_token = access_token
+        self.semaphore = asyncio.Semaphore(getattr(settings, 'SPOTIFY_USER_CONCURRENCY', 4))
+        self._shared = {}
+
+    async def get(self, url, params=None):
+        session = await get_session()
+        if not url.startswith('http'):
+            url = f"{SPOTIFY_API_URL}/{url}"
+        headers = {'Authorization': f"Bearer {self.access_token}"}
+        for attempt in range(self.max_retries):
+            async with self.semaphore, _global_semaphore:
+                async with session.get(url, params=params, headers=headers) as response:
+                    if response.status == 429:
+                        wait_time = float(response.headers.get('Retry-After', 2 ** attempt))
+                    elif response.status >= 500:
+                        wait_time = 2 ** attempt
+                    elif response.status >= 400:
+                        raise SpotifyAPIError(response.status, await response.text())
+                    else:
+                        return await response.json()
+            # Sleep outside the semaphores so other requests keep going
+            logger.warning(f"Spotify returned {response.status} for {url}. Retrying in {wait_time} seconds...")
+            await asyncio.sleep(wait_time)
+        raise SpotifyAPIError(response.status, "Max retries exceeded.")
+
+    async def shared(self, key, fetch):
+        """Run `fetch()` once per key, concurrent callers await the same task."""
+        if key not in self._shared:
+            self._shared[key] = asyncio.ensure_future(fetch())
+        return await self._shared[key]
+
+    async def paginate(self, url, params, limit=None, item_key=None):
+        """Follow the `next` links of a paging object, collecting up to `limit` items."""
+        items = []
+        while url:
+            page = await self.get(url, params)
+            page = page[item_key] if item_key else page
+            items.extend(page['items'])
+            if limit and len(items) >= limit:
+                return items[:limit]
+            # `next` already carries the query string
+            url, params = page.get('next'), None
+        return items
+
+    async def top_artists(self, limit=50, time_range='short_term'):
+        return await self.shared(('top_artists', limit, time_range), lambda: self.paginate(
+            'me/top/artists', {'limit': min(limit, 50), 'time_range': time_range}))
+
+    async def top_tracks(self, limit=50, time_range='short_term'):
+        return await self.shared(('top_tracks', limit, time_range), lambda: self.paginate(
+            'me/top/tracks', {'limit': min(limit, 50), 'time_range': time_range}))
+
+    async def saved_tracks(self, limit=50):
+        items = await self.paginate('me/tracks', {'limit': min(limit, 50)})
+        return [item['track'] for item in items]
+
+    async def saved_albums(self, limit=50):
+        items = await self.paginate('me/albums', {'limit': min(limit, 50)})
+        return [item['album'] for item in items]
+
+    async def followed_artists(self, limit=50):
+        return await self.paginate('me/following', {'type': 'artist', 'limit': min(limit, 50)},
+                                   limit=limit, item_key='artists')
+
+    async def user_playlists(self, limit=50):
+        return await self.paginate('me/playlists', {'limit': min(limit, 50)})
+
+    async def recently_played(self, limit=50):
+        # Spotify keeps only the last 50 plays, a single page covers them
+        response = await self.get('me/player/recently-played', {'limit': min(limit, 50)})
+        return [item['track'] for item in response['items']]
+
+    async def artists(self, artist_ids):
+        """Full artist objects, 50 ids per request."""
+        artist_ids = list(dict.fromkeys(artist_ids))
+        pages = await asyncio.gather(*(
+            self.get('artists', {'ids': ','.join(artist_ids[start:start + 50])})
+            for start in range(0, len(artist_ids), 50)
+        ))
+        return [artist for page in pages for artist in page['artists'] if artist]
+
+    async def top_genres(self, limit=50):
+        genre_count = {}
+        for artist in await self.top_artists(limit):
+            for genre in artist['genres']:
+                genre_count[genre] = genre_count.get(genre, 0) + 1
+        return sorted(genre_count.items(), key=lambda x: x[1], reverse=True)[:limit]
+
+    async def liked_genres(self):
+        top_artists, top_tracks = await asyncio.gather(
+            self.top_artists(50, 'medium_term'),
+            self.top_tracks(50, 'medium_term'),
+        )
+        genres = set()
+        for artist in top_artists:
+            genres.update(artist.get('genres', []))
+
+        # Tracks only carry simplified artists, genres come from the full objects
+        known = {artist['id'] for artist in top_artists}
+        track_artist_ids = [track['artists'][0]['id'] for track in top_tracks if track.get('artists')]
+        for artist in await self.artists([artist_id for artist_id in track_artist_ids if artist_id not in known]):
+            genres.update(artist.get('genres', []))
+        return list(genres)
+
+    @staticmethod
+    async def optional(name, coroutine):
+        """The list `coroutine` returns, or `[]` when it fails, so one list does not fail the sync."""
+        try:
+            return await coroutine
+        except Exception as e:
+            logger.error(f"Error fetching {name}: {e}")
+            return []
+
+    async def fetch_likes(self, limit=50):
+        """Every list `save_user_likes` stores, fetched concurrently. Liked genres are optional."""
+        names = ['top_artists', 'top_tracks', 'top_genres', 'saved_tracks', 'saved_albums',
+                 'followed_artists', 'recently_played', 'liked_genres']
+        results = await asyncio.gather(
+            self.top_artists(limit),
+            self.top_tracks(limit),
+            self.top_genres(limit),
+            self.saved_tracks(limit),
+            self.saved_albums(limit),
+            self.followed_artists(limit),
+            self.recently_played(limit),
+            self.optional('liked genres', self.liked_genres()),
+        )
+        return dict(zip(names, results))
@@ -5,28 +5,27 @@ from typing import List, Tuple
 import asyncio
 import logging
 import aiohttp
-from neomodel import db
-from neomodel.async_.core import AsyncDatabase
 from app.db_models.spotify.spotify_artist import SpotifyArtist
 from app.db_models.spotify.spotify_track import SpotifyTrack
 from app.db_models.spotify.spotify_album import SpotifyAlbum
 from app.db_models.spotify.spotify_genre import SpotifyGenre
-from app.db_models.spotify.spotify_image import SpotifyImage
 from app.db_models.node_resolver import resolve_node_class
 from app.db_models.liked_item import LikedItem  # Ensure LikedItem is imported
 from app.services.service_strategy import ServiceStrategy
+from app.services.bud_index_service import BudIndexService
+from app.services.spotify_bulk_writer import SpotifyBulkWriter
+from app.services.entity_cache import EntityCache
+from app.services.like_sync_service import LikeSyncService
+from app.services.spotify_fetcher import SpotifyFetcher
+from app.services.model_update_service import ModelUpdateService
 from spotipy.oauth2 import SpotifyOAuth
 from app.db_models.spotify.spotify_user import SpotifyUser
 from neomodel.exceptions import NodeClassAlreadyDefined
 import traceback
 from app.db_models.user import User  # Add this line
-import neomodel
 from datetime import datetime, timedelta, timezone
 logger = logging.getLogger('app')
 
-def get_async_db():
-    return AsyncDatabase()
-
 
 class SpotifyService(ServiceStrategy):
     def __init__(self, client_id, client_secret, redirect_uri):
@@ -68,19 +67,24 @@ class SpotifyService(ServiceStrategy):
             logger.error(f"Error retrieving Spotify user for parent user {parent_user.username}: {str(e)}")
             raise
 
+    @staticmethod
+    def token_expiry(service_user):
+        if isinstance(service_user.token_issue_time, str):
+            try:
+                token_issue_time = datetime.fromtimestamp(float(service_user.token_issue_time), tz=timezone.utc)
+            except ValueError:
+                token_issue_time = datetime.fromisoformat(service_user.token_issue_time)
+        elif isinstance(service_user.token_issue_time, (float, int)):
+            token_issue_time = datetime.fromtimestamp(service_user.token_issue_time, tz=timezone.utc)
+        else:
+            token_issue_time = service_user.token_issue_time
+        if token_issue_time.tzinfo is None:
+            token_issue_time = token_issue_time.replace(tzinfo=timezone.utc)
+        return token_issue_time + timedelta(seconds=service_user.expires_in)
+
     async def check_token_validity(self,service_user):
         try:
-            if isinstance(service_user.token_issue_time, str):
-                try:
-                    token_issue_time = datetime.fromtimestamp(float(service_user.token_issue_time), tz=timezone.utc)
-                except ValueError:
-                    token_issue_time = datetime.fromisoformat(service_user.token_issue_time)
-            elif isinstance(service_user.token_issue_time, (float, int)):
-                token_issue_time = datetime.fromtimestamp(service_user.token_issue_time, tz=timezone.utc)
-            else:
-                token_issue_time = service_user.token_issue_time
-
-            token_expiry = token_issue_time + timedelta(seconds=service_user.expires_in)
+            token_expiry = self.token_expiry(service_user)
             if datetime.now(timezone.utc) >= token_expiry:
                 logger.info(f"Token for user {service_user.username} has expired. Refreshing token.")
                 await self.refresh_access_token(service_user)
@@ -129,86 +133,43 @@ class SpotifyService(ServiceStrategy):
 
     async def fetch_top_artists(self, user, limit=50):
         logger.debug('Fetching top artists for user=%s with limit=%d', user, limit)
-        return await self.fetch_with_retries(self._fetch_top_artists, user, limit)
+        return await SpotifyFetcher(user.access_token).top_artists(limit)
 
     async def fetch_top_tracks(self, user, limit=50):
         logger.debug('Fetching top tracks for user=%s with limit=%d', user, limit)
-        return await self.fetch_with_retries(self._fetch_top_tracks, user, limit)
+        return await SpotifyFetcher(user.access_token).top_tracks(limit)
 
     async def fetch_saved_tracks(self, user, limit=50):
         logger.debug('Fetching saved tracks for user=%s with limit=%d', user, limit)
-        return await self.fetch_with_retries(self._fetch_saved_tracks, user, limit)
+        return await SpotifyFetcher(user.access_token).saved_tracks(limit)
 
     async def fetch_saved_albums(self, user, limit=50):
         logger.debug('Fetching saved albums for user=%s with limit=%d', user, limit)
-        return await self.fetch_with_retries(self._fetch_saved_albums, user, limit)
+        return await SpotifyFetcher(user.access_token).saved_albums(limit)
 
     async def fetch_followed_artists(self, user, limit=50):
         logger.debug('Fetching followed artists for user=%s with limit=%d', user, limit)
-        sp = spotipy.Spotify(auth=user.access_token)
-        all_artists = []
-        after = None
-        
-        while len(all_artists) < limit:
-            response = await sync_to_async(sp.current_user_followed_artists)(limit=limit, after=after)
-            artists = response['artists']['items']
-            all_artists.extend(artists)
-            
-            if len(all_artists) >= limit or not response['artists']['next']:
-                all_artists = all_artists[:limit]
-                break
-            
-            # Update 'after' parameter with the last artist's ID
-            after = artists[-1]['id']
-        
+        all_artists = await SpotifyFetcher(user.access_token).followed_artists(limit)
         logger.info('Followed artists retrieved successfully')
         return all_artists
 
     async def fetch_user_playlists(self, user, limit=50):
         logger.debug('Fetching user playlists for user=%s with limit=%d', user, limit)
-        sp = spotipy.Spotify(auth=user.access_token)
-        offset = 0
-        all_playlists = []
-        while True:
-            response = await sync_to_async(sp.current_user_playlists)(limit=limit, offset=offset)
-            all_playlists.extend(response['items'])
-            if len(response['items']) < limit:
-                break
-            offset += limit
+        all_playlists = await SpotifyFetcher(user.access_token).user_playlists(limit)
         logger.info('User playlists retrieved successfully')
         return all_playlists
 
     async def fetch_top_genres(self, user, limit=50):
         logger.debug('Fetching top genres for user=%s with limit=%d', user, limit)
-        top_artists = await self.fetch_top_artists(user, limit)
-        genre_count = {}
-        for artist in top_artists:
-            for genre in artist['genres']:
-                genre_count[genre] = genre_count.get(genre, 0) + 1
+        top_genres = await SpotifyFetcher(user.access_token).top_genres(limit)
         logger.info('Top genres retrieved successfully')
-        return sorted(genre_count.items(), key=lambda x: x[1], reverse=True)[:limit]
+        return top_genres
 
     async def fetch_liked_genres(self, spotify_user):
         try:
-            # Create a Spotify client using the user's access token
-            sp = spotipy.Spotify(auth=spotify_user.access_token)
-            
-            # Fetch top artists and tracks
-            top_artists = await sync_to_async(sp.current_user_top_artists)(limit=50, time_range='medium_term')
-            top_tracks = await sync_to_async(sp.current_user_top_tracks)(limit=50, time_range='medium_term')
-            
-            genres = set()
-            for artist in top_artists['items']:
-                genres.update(artist.get('genres', []))
-            
-            # For tracks, we need to fetch the artist information to get genres
-            for track in top_tracks['items']:
-                artist_id = track['artists'][0]['id']
-                artist = await sync_to_async(sp.artist)(artist_id)
-                genres.update(artist.get('genres', []))
-            
+            genres = await SpotifyFetcher(spotify_user.access_token).liked_genres()
             logger.debug(f"Fetched liked genres: {len(genres)}")
-            return list(genres)
+            return genres
         except Exception as e:
             logger.error(f"Error fetching liked genres: {str(e)}")
             logger.error(f"Error type: {type(e)}")
@@ -218,431 +179,21 @@ class SpotifyService(ServiceStrategy):
 
     async def fetch_recently_played(self, user, limit=50):
         logger.debug('Fetching recently played tracks for user=%s with limit=%d', user, limit)
-        return await self.fetch_with_retries(self._fetch_recently_played, user, limit)
-
-    async def fetch_with_retries(self, func, *args, max_retries=5, backoff_factor=1):
-        """
-        Fetch data with retry logic and exponential backoff.
-        
-        :param func: The function to call.
-        :param args: Arguments to pass to the function.
-        :param max_retries: Maximum number of retry attempts.
-        :param backoff_factor: Factor by which to increase the wait time between retries.
-        :return: Result of the function call.
-        """
-        for attempt in range(max_retries):
-            try:
-                return await func(*args)
-            except Exception as e:
-                if hasattr(e, 'http_status') and e.http_status == 429:  # Rate limit error
-                    wait_time = backoff_factor * (2 ** attempt)
-                    logger.warning(f"Rate limit exceeded. Retrying in {wait_time} seconds...")
-                    await asyncio.sleep(wait_time)
-                else:
-                    logger.error(f"An error occurred: {e}")
-                    raise
-        raise Exception("Max retries exceeded.")
-
-    async def _fetch_top_artists(self, user, limit):
-        sp = spotipy.Spotify(auth=user.access_token)
-        offset = 0
-        all_artists = []
-        while True:
-            response = await sync_to_async(sp.current_user_top_artists)(limit=limit, offset=offset, time_range='short_term')
-            all_artists.extend(response['items'])
-            if len(response['items']) < limit:
-                break
-            offset += limit
-        return all_artists
-
-    async def _fetch_top_tracks(self, user, limit):
-        sp = spotipy.Spotify(auth=user.access_token)
-        offset = 0
-        all_tracks = []
-        while True:
-            response = await sync_to_async(sp.current_user_top_tracks)(limit=limit, offset=offset, time_range='short_term')
-            all_tracks.extend(response['items'])
-            if len(response['items']) < limit:
-                break
-            offset += limit
-        return all_tracks
-
-    async def _fetch_saved_tracks(self, user, limit):
-        sp = spotipy.Spotify(auth=user.access_token)
-        offset = 0
-        all_tracks = []
-        while True:
-            response = await sync_to_async(sp.current_user_saved_tracks)(limit=limit, offset=offset)
-            all_tracks.extend([item['track'] for item in response['items']])
-            if len(response['items']) < limit:
-                break
-            offset += limit
-        return all_tracks
-
-    async def _fetch_saved_albums(self, user, limit):
-        sp = spotipy.Spotify(auth=user.access_token)
-        offset = 0
-        all_albums = []
-        while True:
-            response = await sync_to_async(sp.current_user_saved_albums)(limit=limit, offset=offset)
-            all_albums.extend([item['album'] for item in response['items']])
-            if len(response['items']) < limit:
-                break
-            offset += limit
-        return all_albums
-
-    async def _fetch_recently_played(self, user, limit):
-        sp = spotipy.Spotify(auth=user.access_token)
-        after = None
-        before = None
-        all_tracks = []
-        while True:
-            response = await sync_to_async(sp.current_user_recently_played)(limit=limit, after=after, before=before)
-            all_tracks.extend([item['track'] for item in response['items']])
-            if len(response['items']) < limit:
-                break
-            # Adjust 'after' or 'before' for pagination if necessary
-            after = response['items'][-1]['played_at'] if response['items'] else None
-        return all_tracks
-
-    @staticmethod
-    async def create_or_update_image(image_data):
-        try:
-            if not image_data or 'url' not in image_data:
-                logger.warning(f"Invalid image data: {image_data}")
-                return None
-
-            properties = {
-                'height': image_data.get('height'),
-                'width': image_data.get('width'),
-                'url': image_data['url'],
-            }
-
-            try:
-                image = await SpotifyImage.nodes.get(url=image_data['url'])
-                # Update existing image
-                for key, value in properties.items():
-                    setattr(image, key, value)
-                await image.save()
-            except SpotifyImage.DoesNotExist:
-                # Create new image
-                image = SpotifyImage(**properties)
-                await image.save()
-            except neomodel.exceptions.MultipleNodesReturned:
-                # Handle multiple nodes
-                images = await SpotifyImage.nodes.filter(url=image_data['url'])
-                image = images[0]  # Use the first image found
-                # Update the first image
-                for key, value in properties.items():
-                    setattr(image, key, value)
-                await image.save()
-                # Delete the duplicates
-                for duplicate in images[1:]:
-                    await duplicate.delete()
-                logger.warning(f"Found and cleaned up duplicate images for URL: {image_data['url']}")
-
-            return image
-        except Exception as e:
-            logger.error(f"Error creating/updating image: {str(e)}")
-            logger.error(f"Image data: {image_data}")
-            logger.error(f"Error type: {type(e)}")
-            logger.error(f"Error args: {e.args}")
-            logger.error(f"Traceback: {traceback.format_exc()}")
-            return None
-
-    @staticmethod
-    async def process_track(track_data):
-        try:
-            properties = {
-                'spotify_id': track_data['id'],
-                'name': track_data['name'],
-                'uri': track_data['uri'],
-                'duration_ms': track_data['duration_ms'],
-                'spotify_url': track_data['external_urls']['spotify'],
-                'href': track_data.get('href', ''),
-                'popularity': track_data.get('popularity', 0),
-                'type': track_data.get('type', 'track'),
-                'disc_number': track_data.get('disc_number', 1),
-                'explicit': track_data.get('explicit', False),
-                'isrc': track_data.get('external_ids', {}).get('isrc', ''),
-                'preview_url': track_data.get('preview_url', ''),
-                'track_number': track_data.get('track_number', 0),
-            }
-
-            # Fetch all nodes with the given spotify_id
-            query = """
-            MATCH (n)
-            WHERE n.spotify_id = $spotify_id
-            RETURN n, labels(n) as labels
-            """
-            adb = get_async_db()
-            results, _ = await adb.cypher_query(query, {'spotify_id': track_data['id']})
-
-            tracks = []
-            for result in results:
-                node = result[0]
-                labels = result[1]
-                node_class = resolve_node_class(labels) or SpotifyTrack
-                if node_class:
-                    tracks.append(node_class.inflate(node))
-
-            if len(tracks) > 1:
-                # If multiple nodes found, keep the first one and delete the rest
-                logger.warning(f"Found {len(tracks)} tracks with spotify_id {track_data['id']}. Cleaning up duplicates.")
-                track = tracks[0]
-                for duplicate in tracks[1:]:
-                    await duplicate.delete()
-            elif len(tracks) == 1:
-                track = tracks[0]
-            else:
-                track = None
-
-            if track:
-                # Update existing track
-                for key, value in properties.items():
-                    setattr(track, key, value)
-                await track.save()
-            else:
-                # Create new track
-                track = SpotifyTrack(**properties)
-                await track.save()
-
-            # Process and connect images
-            for image_data in track_data.get('album', {}).get('images', []):
-                image = await SpotifyService.create_or_update_image(image_data)
-                if image:
-                    await track.images.connect(image)
-
-            return track
-        except Exception as e:
-            logger.error(f"Error processing track: {str(e)}")
-            logger.error(f"Error type: {type(e)}")
-            logger.error(f"Error args: {e.args}")
-            logger.error(f"Traceback: {traceback.format_exc()}")
-            return None
-
-    @staticmethod
-    async def process_artist(artist_data):
-        try:
-            properties = {
-                'spotify_id': artist_data['id'],
-                'name': artist_data['name'],
-                'uri': artist_data.get('uri', ''),
-                'spotify_url': artist_data.get('external_urls', {}).get('spotify', ''),
-                'href': artist_data.get('href', ''),
-                'popularity': artist_data.get('popularity', 0),
-                'followers': artist_data.get('followers', {}).get('total', 0),
-            }
-
-            try:
-                artist = await SpotifyArtist.nodes.get(spotify_id=artist_data['id'])
-                # Update existing artist
-                for key, value in properties.items():
-                    setattr(artist, key, value)
-                await artist.save()
-            except SpotifyArtist.DoesNotExist:
-                # Create new artist
-                artist = SpotifyArtist(**properties)
-                await artist.save()
-            except neomodel.exceptions.MultipleNodesReturned:
-                # Handle multiple nodes
-                artists = await SpotifyArtist.nodes.filter(spotify_id=artist_data['id'])
-                artist = artists[0]  # Use the first artist found
-                # Update the first artist
-                for key, value in properties.items():
-                    setattr(artist, key, value)
-                await artist.save()
-                # Delete the duplicates
-                for duplicate in artists[1:]:
-                    await duplicate.delete()
-                logger.warning(f"Found and cleaned up duplicate artists for spotify_id: {artist_data['id']}")
-
-            # Process and connect images
-            for image_data in artist_data.get('images', []):
-                image = await SpotifyService.create_or_update_image(image_data)
-                if image:
-                    await artist.images.connect(image)
-
-            return artist
-        except Exception as e:
-            logger.error(f"Error processing artist: {str(e)}")
-            logger.error(f"Error type: {type(e)}")
-            logger.error(f"Error args: {e.args}")
-            logger.error(f"Traceback: {traceback.format_exc()}")
-            return None
-
-    @staticmethod
-    async def process_album(album_data):
-        try:
-            properties = {
-                'spotify_id': album_data['id'],
-                'name': album_data['name'],  # Ensure this is included
-                'uri': album_data.get('uri', ''),
-                'spotify_url': album_data.get('external_urls', {}).get('spotify', ''),
-                'href': album_data.get('href', ''),
-                'album_type': album_data.get('album_type', ''),
-                'release_date': album_data.get('release_date', ''),
-                'release_date_precision': album_data.get('release_date_precision', ''),
-                'total_tracks': album_data.get('total_tracks', 0),
-            }
-
-            try:
-                album = await SpotifyAlbum.nodes.get(spotify_id=album_data['id'])
-                # Update existing album
-                for key, value in properties.items():
-                    setattr(album, key, value)
-                await album.save()
-            except SpotifyAlbum.DoesNotExist:
-                # Create new album
-                album = SpotifyAlbum(**properties)
-                await album.save()
-            except neomodel.exceptions.MultipleNodesReturned:
-                # Handle multiple nodes
-                albums = await SpotifyAlbum.nodes.filter(spotify_id=album_data['id'])
-                album = albums[0]  # Use the first album found
-                # Update the first album
-                for key, value in properties.items():
-                    setattr(album, key, value)
-                await album.save()
-                # Delete the duplicates
-                for duplicate in albums[1:]:
-                    await duplicate.delete()
-                logger.warning(f"Found and cleaned up duplicate albums for spotify_id: {album_data['id']}")
-
-            # Process and connect images
-            for image_data in album_data.get('images', []):
-                image = await SpotifyService.create_or_update_image(image_data)
-                if image:
-                    await album.images.connect(image)
-
-            return album
-        except Exception as e:
-            logger.error(f"Error processing album: {str(e)}")
-            logger.error(f"Error type: {type(e)}")
-            logger.error(f"Error args: {e.args}")
-            logger.error(f"Traceback: {traceback.format_exc()}")
-            return None
-
-    @staticmethod
-    def process_genre(genre_data):
-        try:
-            if isinstance(genre_data, str):
-                genre_name = genre_data
-            elif isinstance(genre_data, tuple):
-                genre_name = genre_data[0]  # Extract just the name
-            elif isinstance(genre_data, dict):
-                genre_name = genre_data.get('name')
-            else:
-                logger.error(f"Unexpected genre data type: {type(genre_data)}")
-                return None
-
-            if not genre_name:
-                logger.error(f"Invalid genre data: {genre_data}")
-                return None
-
-            try:
-                # Use a Cypher query to get or create the genre
-                query = """
-                MERGE (g:SpotifyGenre {name: $name})
-                ON CREATE SET g.uid = randomUUID()
-                RETURN g
-                """
-                results, _ = db.cypher_query(query, {'name': genre_name})
-                genre = SpotifyGenre.inflate(results[0][0])
-                return genre
-            except Exception as e:
-                logger.error(f"Error creating or retrieving genre: {str(e)}")
-                logger.error(f"Error type: {type(e)}")
-                logger.error(f"Error args: {e.args}")
-                logger.error(f"Traceback: {traceback.format_exc()}")
-                return None
-
-        except Exception as e:
-            logger.error(f"Error processing Genre: {str(e)}")
-            logger.error(f"Error type: {type(e)}")
-            logger.error(f"Error args: {e.args}")
-            logger.error(f"Traceback: {traceback.format_exc()}")
-            return None
+        return await SpotifyFetcher(user.access_token).recently_played(limit)
 
     @staticmethod
     async def map_to_neo4j(spotify_user, label, items, relation_type):
         logger.debug(f"Mapping {len(items)} {label}s to Neo4j for user {spotify_user.username} with relation type {relation_type}")
-        for item in items:
-            try:
-                if label == 'Track':
-                    node = await SpotifyService.process_track(item)
-                elif label == 'Artist':
-                    node = await SpotifyService.process_artist(item)
-                elif label == 'Album':
-                    node = await SpotifyService.process_album(item)
-                elif label == 'Genre':
-                    node = SpotifyService.process_genre(item)  # Note: This is now synchronous
-                else:
-                    logger.error(f"Unsupported label: {label}")
-                    continue
-
-                if node:
-                    relationship_attr = {
-                        'TOP_ARTIST': 'top_artists',
-                        'TOP_TRACK': 'top_tracks',
-                        'TOP_GENRE': 'top_genres',
-                        'LIKES_ARTIST': 'likes_artists',
-                        'LIKES_TRACK': 'likes_tracks',
-                        'LIKES_GENRE': 'likes_genres',
-                        'LIKES_ALBUM': 'likes_albums',
-                        'PLAYED_TRACK': 'played_tracks',
-                        'SAVED_ALBUM': 'saved_albums'
-                    }.get(relation_type)
-
-                    if relationship_attr:
-                        await getattr(spotify_user, relationship_attr).connect(node)
-                        logger.debug(f"Created relationship {relation_type} between {spotify_user.username} and {node}")
-                    else:
-                        logger.error(f"Unsupported relation type: {relation_type}")
-                else:
-                    logger.error(f"Failed to create or retrieve node for {label}: {item}")
-            except Exception as e:
-                logger.error(f"Error processing {label}: {str(e)}")
-                logger.error(f"Error type: {type(e)}")
-                logger.error(f"Error args: {e.args}")
-                logger.error(f"Traceback: {traceback.format_exc()}")
-                logger.error(f"Item data: {item}")  # Add this line to log the item data
-        logger.debug(f"Finished mapping {len(items)} {label}s to Neo4j for user {spotify_user.username}")
-
-    @staticmethod
-    async def create_relationship(user, node, label, relation_type):
         try:
-            user_node = await SpotifyUser.nodes.get(spotify_id=user.spotify_id)
-            if node is None:
-                logger.error(f"Cannot create relationship: node is None for {label}")
-                return
-
-            if label == 'Track':
-                if relation_type == "top":
-                    await user_node.top_tracks.connect(node)
-                elif relation_type == "saved":
-                    await user_node.saved_tracks.connect(node)
-            elif label == 'Artist':
-                if relation_type == "top":
-                    await user_node.top_artists.connect(node)
-                elif relation_type == "followed":
-                    await user_node.likes_artists.connect(node)
-            elif label == 'Album':
-                await user_node.saved_albums.connect(node)
-            elif label == 'Genre':
-                if not isinstance(node, SpotifyGenre):
-                    logger.error(f"Expected node of class SpotifyGenre, got {type(node)}")
-                    return
-                if relation_type == "top":
-                    await user_node.top_genres.connect(node)
-                elif relation_type == "liked":
-                    await user_node.likes_genres.connect(node)
-            logger.info(f'Connected user {user.spotify_id} with {relation_type} {label} {node.name}')
+            counts = await SpotifyBulkWriter.write(spotify_user, label, items, relation_type)
         except Exception as e:
-            logger.error(f"Error creating relationship: {str(e)}")
+            logger.error(f"Error processing {label}: {str(e)}")
             logger.error(f"Error type: {type(e)}")
             logger.error(f"Error args: {e.args}")
             logger.error(f"Traceback: {traceback.format_exc()}")
+            counts = {'nodes': 0, 'images': 0, 'relationships': 0, 'cached': 0, 'invalid': len(items)}
+        logger.debug(f"Finished mapping {len(items)} {label}s to Neo4j for user {spotify_user.username}: {counts}")
+        return counts
 
     def get_node_class(self, label):
         if label == 'Track':
@@ -656,27 +207,29 @@ class SpotifyService(ServiceStrategy):
         else:
             return None
         
-    async def save_user_likes(self, parent_user, user_likes=None):
+    async def save_user_likes(self, parent_user, user_likes=None, progress=None):
         try:
             spotify_user = await self.get_service_user(parent_user)
             logger.debug(f"Saving user likes for Spotify user: {spotify_user.username}")
             if spotify_user.username is None:
                 logger.error(f"Spotify user has no username. User object: {spotify_user}")
 
-            # Clear existing user likes
-            await self.clear_user_likes(spotify_user)
-            
             if user_likes is None:
-                # Fetch all types of user data
-                top_artists = await self.fetch_top_artists(spotify_user)
-                top_tracks = await self.fetch_top_tracks(spotify_user)
-                top_genres = await self.fetch_top_genres(spotify_user)
-                saved_tracks = await self.fetch_saved_tracks(spotify_user)
-                saved_albums = await self.fetch_saved_albums(spotify_user)
-                followed_artists = await self.fetch_followed_artists(spotify_user)
-                recently_played = await self.fetch_recently_played(spotify_user)
-                liked_genres = await self.fetch_liked_genres(spotify_user)
-                
+                # Fetch all types of user data concurrently
+                if progress is not None:
+                    await progress.set_totals(fetch=1, map=8, link=8)
+                likes = await SpotifyFetcher(spotify_user.access_token).fetch_likes()
+                if progress is not None:
+                    await progress.advance('fetch')
+                top_artists = likes['top_artists']
+                top_tracks = likes['top_tracks']
+                top_genres = likes['top_genres']
+                saved_tracks = likes['saved_tracks']
+                saved_albums = likes['saved_albums']
+                followed_artists = likes['followed_artists']
+                recently_played = likes['recently_played']
+                liked_genres = likes['liked_genres']
+
                 logger.debug(f"Fetched top artists: {len(top_artists)}")
                 logger.debug(f"Fetched top tracks: {len(top_tracks)}")
                 logger.debug(f"Fetched top genres: {len(top_genres)}")
@@ -686,19 +239,42 @@ class SpotifyService(ServiceStrategy):
                 logger.debug(f"Fetched recently played: {len(recently_played)}")
                 logger.debug(f"Fetched liked genres: {len(liked_genres)}")
                 
-                # Map data to Neo4j
-                await asyncio.gather(
-                    self.map_to_neo4j(spotify_user, 'Artist', top_artists, "TOP_ARTIST"),
-                    self.map_to_neo4j(spotify_user, 'Track', top_tracks, "TOP_TRACK"),
-                    self.map_to_neo4j(spotify_user, 'Genre', top_genres, "TOP_GENRE"),
-                    self.map_to_neo4j(spotify_user, 'Track', saved_tracks, "LIKES_TRACK"),
-                    self.map_to_neo4j(spotify_user, 'Album', saved_albums, "SAVED_ALBUM"),
-                    self.map_to_neo4j(spotify_user, 'Artist', followed_artists, "LIKES_ARTIST"),
-                    self.map_to_neo4j(spotify_user, 'Track', recently_played, "PLAYED_TRACK"),
-                    self.map_to_neo4j(spotify_user, 'Genre', liked_genres, "LIKES_GENRE")
-                )
+                # Write only the relationships that changed since the last sync.
+                # Relations of one label are synced one after another so two
+                # MERGEs of a new genre, which has no uniqueness constraint,
+                # never race, the labels are synced concurrently
+                syncs = {}
+                for label, items, relation_type in (
+                    ('Artist', top_artists, "TOP_ARTIST"),
+                    ('Track', top_tracks, "TOP_TRACK"),
+                    ('Genre', top_genres, "TOP_GENRE"),
+                    ('Track', saved_tracks, "LIKES_TRACK"),
+                    ('Album', saved_albums, "SAVED_ALBUM"),
+                    ('Artist', followed_artists, "LIKES_ARTIST"),
+                    ('Track', recently_played, "PLAYED_TRACK"),
+                    ('Genre', liked_genres, "LIKES_GENRE"),
+                ):
+                    syncs.setdefault(label, []).append((items, relation_type))
+
+                async def sync_label(label, relations):
+                    return [
+                        await SpotifyBulkWriter.sync(spotify_user, label, items, relation_type, progress)
+                        for items, relation_type in relations
+                    ]
+
+                results = [
+                    result
+                    for label_results in await asyncio.gather(*(sync_label(label, relations) for label, relations in syncs.items()))
+                    for result in label_results
+                ]
+                counts = SpotifyBulkWriter.merge_counts(*results)
+                logger.info(f"Saved Spotify likes for {spotify_user.username}: {counts}, entity cache: {EntityCache.stats()}")
+                if counts['unchanged'] == len(results):
+                    logger.debug("User likes unchanged since the last sync")
+                    return True
             else:
-                # Process the provided user_likes
+                # The provided likes replace the existing ones
+                await self.clear_user_likes(spotify_user)
                 for like in user_likes:
                     if not isinstance(like, dict):
                         logger.error("Each item in 'user_likes' must be a dictionary")
@@ -712,6 +288,9 @@ class SpotifyService(ServiceStrategy):
                         logger.error(f"Error args: {e.args}")
                         logger.error(f"Traceback: {traceback.format_exc()}")
 
+            await BudIndexService.update_user(parent_user.uid)
+            await ModelUpdateService.mark_pending(spotify_user.uid)
+
             logger.debug("User likes saved successfully")
             return True
         except Exception as e:
@@ -776,5 +355,6 @@ class SpotifyService(ServiceStrategy):
             spotify_user.saved_tracks.disconnect_all(),
             spotify_user.saved_albums.disconnect_all()
         )
+        await LikeSyncService.reset(spotify_user.uid)
         logger.debug("User likes cleared successfully")
 
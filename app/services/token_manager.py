@@ -0,0 +1,130 @@
+import asyncio
+import logging
+import time
+import weakref
+from django.conf import settings
+from django.core.cache import cache
+
+logger = logging.getLogger('app')
+
+
+class TokenManager:
+    """
+    Caches when the token of each (ParentUser, provider) pair expires, so a
+    request with a valid token skips the account lookup and validity check.
+
+    Expiries live in process memory and in the Django cache, shared between
+    workers. Only one coroutine per user and provider checks or refreshes a
+    token at a time, the others wait for it and reuse the result. A token
+    within `TOKEN_PROACTIVE_REFRESH` seconds of expiring is refreshed in the
+    background while the request goes on with the still-valid one.
+    """
+
+    _expiries = {}
+    # Locks are bound to the event loop they are first awaited on
+    _locks = weakref.WeakKeyDictionary()
+    _background = set()
+
+    @staticmethod
+    def cache_key(parent_user, service_name):
+        return f'token_expiry:{service_name}:{parent_user.uid}'
+
+    @staticmethod
+    def refresh_margin():
+        return getattr(settings, 'TOKEN_REFRESH_MARGIN', 60)
+
+    @classmethod
+    def lock(cls, key):
+        locks = cls._locks.setdefault(asyncio.get_running_loop(), {})
+        if key not in locks:
+            locks[key] = asyncio.Lock()
+        return locks[key]
+
+    @classmethod
+    async def cached_expiry(cls, key):
+        expiry = cls._expiries.get(key)
+        if expiry is None:
+            try:
+                expiry = await cache.aget(key)
+            except Exception as e:
+                # The token is then checked against the database as before
+                logger.debug(f"Token expiry cache unavailable: {e}")
+            if expiry is not None:
+                cls._expiries[key] = expiry
+        return expiry
+
+    @classmethod
+    async def store_expiry(cls, key, expiry):
+        cls._expiries[key] = expiry
+        try:
+            await cache.aset(key, expiry, timeout=max(int(expiry - time.time()), 1))
+        except Exception as e:
+            logger.debug(f"Token expiry cache unavailable: {e}")
+
+    @classmethod
+    async def invalidate(cls, parent_user, service_name):
+        key = cls.cache_key(parent_user, service_name)
+        cls._expiries.pop(key, None)
+        try:
+            await cache.adelete(key)
+        except Exception as e:
+            logger.debug(f"Token expiry cache unavailable: {e}")
+
+    @classmethod
+    async def ensure_valid(cls, parent_user, service_name, service):
+        """Make sure the `service_name` token of `parent_user` is valid, refreshing it if needed."""
+        key = cls.cache_key(parent_user, service_name)
+        expiry = await cls.cached_expiry(key)
+        now = time.time()
+        if expiry is not None and now < expiry - cls.refresh_margin():
+            if now >= expiry - getattr(settings, 'TOKEN_PROACTIVE_REFRESH', 300):
+                cls.refresh_in_background(parent_user, service_name, service)
+            return
+
+        async with cls.lock(key):
+            # Another coroutine may have validated the token while this one waited
+            expiry = await cls.cached_expiry(key)
+            if expiry is not None and time.time() < expiry - cls.refresh_margin():
+                return
+            await cls.validate(key, parent_user, service_name, service)
+
+    @classmethod
+    async def validate(cls, key, parent_user, service_name, service, force_refresh=False):
+        service_user = await service.get_service_user(parent_user)
+        if not service_user:
+            raise ValueError(f"No service user found for {service_name} service for user {parent_user.username}")
+        if not service_user.access_token:
+            raise ValueError(f"No access token found for {service_name} service user {service_user.username}")
+
+        token_expiry = getattr(service, 'token_expiry', None)
+        if token_expiry is None:
+            # Providers without token expiry are rechecked after a fixed interval
+            await service.check_token_validity(service_user)
+            await cls.store_expiry(key, time.time() + getattr(settings, 'TOKEN_CACHE_TTL', 300))
+            return
+
+        if force_refresh or time.time() >= token_expiry(service_user).timestamp() - cls.refresh_margin():
+            logger.info(f"Refreshing {service_name} token of user {parent_user.username}")
+            await service.refresh_access_token(service_user)
+        await cls.store_expiry(key, token_expiry(service_user).timestamp())
+
+    @classmethod
+    def refresh_in_background(cls, parent_user, service_name, service):
+        key = cls.cache_key(parent_user, service_name)
+        if cls.lock(key).locked():
+            return
+
+        async def refresh():
+            async with cls.lock(key):
+                expiry = await cls.cached_expiry(key)
+                if expiry is not None and time.time() < expiry - getattr(settings, 'TOKEN_PROACTIVE_REFRESH', 300):
+                    return
+                try:
+                    await cls.validate(key, parent_user, service_name, service, force_refresh=True)
+                except Exception as e:
+                    logger.error(f"Background refresh of {service_name} token for {parent_user.username} failed: {e}")
+
+        task = asyncio.get_running_loop().create_task(refresh())
+        # Keep a reference until the task is done, the loop only holds a weak one
+        cls._background.add(task)
+        task.add_done_callback(cls._background.discard)
@@ -0,0 +1,152 @@
+import asyncio
+import logging
+import uuid
+import weakref
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from neomodel import db
+from app.services.entity_aliases import link_aliased, resolve_aliases
+from app.services.entity_cache import EntityCache
+
+logger = logging.getLogger('app')
+
+# Relationships a YtmusicUser can have to the items of a sync
+YTMUSIC_RELATIONS = {'LIKES_TRACK', 'LIKES_ARTIST', 'PLAYED_TRACK'}
+
+# item label -> (node label merged on, merge key, inherited labels set on the node)
+YTMUSIC_LABELS = {
+    'Track': ('YtmusicTrack', 'videoId', 'LikedItem:Track'),
+    'Artist': ('YtmusicArtist', 'browseId', 'LikedItem:Artist'),
+}
+
+
+def thumbnail_properties(thumbnails):
+    # Neo4j arrays cannot hold nulls
+    thumbnails = [image for image in thumbnails or [] if image and image.get('url')]
+    return {
+        'thumbnails': [image['url'] for image in thumbnails],
+        'thumbnail_heights': [image.get('height') or 0 for image in thumbnails],
+        'thumbnail_widthes': [image.get('width') or 0 for image in thumbnails],
+    }
+
+
+def track_row(item):
+    if not item.get('videoId'):
+        raise ValueError(f"Track without a videoId: {item.get('title')}")
+    return {
+        'key': item['videoId'],
+        'properties': {
+            'videoId': item['videoId'],
+            'name': item['title'],
+            'artist_name': next((artist['name'] for artist in item.get('artists') or [] if artist and artist.get('name')), ''),
+            **thumbnail_properties(item.get('thumbnails')),
+        },
+    }
+
+
+def artist_row(item):
+    if not item.get('browseId'):
+        raise ValueError(f"Artist without a browseId: {item.get('artist')}")
+    return {
+        'key': item['browseId'],
+        'properties': {
+            'browseId': item['browseId'],
+            'name': item['artist'],
+            'subscribers': item.get('subscribers') or '',
+            **thumbnail_properties(item.get('thumbnails')),
+        },
+    }
+
+
+ROW_BUILDERS = {
+    'Track': track_row,
+    'Artist': artist_row,
+}
+
+
+def build_upsert_query(label, relation_type=None):
+    node_label, key, extra_labels = YTMUSIC_LABELS[label]
+    match_user = "MATCH (u:YtmusicUser) WHERE elementId(u) = $user_id" if relation_type else ''
+    connect = f"MERGE (u)-[:{relation_type}]->(n)" if relation_type else ''
+    return f"""
+    {match_user}
+    UNWIND $rows AS row
+    MERGE (n:{node_label} {{{key}: row.key}})
+    ON CREATE SET n.uid = row.uid
+    SET n += row.properties, n:{extra_labels}
+    {connect}
+    RETURN row.key, elementId(n)
+    """
+
+
+class YtmusicBulkWriter:
+    """
+    Upserts YT Music tracks and artists with `UNWIND $rows MERGE` batches
+    keyed by `videoId` and `browseId`, so an item in several lists of a sync
+    is one node however the writes interleave.
+
+    Rows are deduplicated in memory before writing, and at most
+    `YTMUSIC_WRITE_CONCURRENCY` batches of a process are written at once,
+    which bounds the Bolt sessions a burst of syncs holds.
+    """
+
+    batch_size = 500
+    _semaphores = weakref.WeakKeyDictionary()
+
+    @classmethod
+    def semaphore(cls):
+        loop = asyncio.get_running_loop()
+        if loop not in cls._semaphores:
+            cls._semaphores[loop] = asyncio.Semaphore(getattr(settings, 'YTMUSIC_WRITE_CONCURRENCY', 4))
+        return cls._semaphores[loop]
+
+    @classmethod
+    def build_rows(cls, label, items):
+        rows = {}
+        invalid = 0
+        for item in items:
+            try:
+                row = ROW_BUILDERS[label](item)
+            except (KeyError, TypeError, ValueError) as e:
+                logger.debug(f"Skipping YT Music {label}: {e}")
+                invalid += 1
+                continue
+            row['uid'] = uuid.uuid4().hex
+            # History has every play of a track, liked tracks repeat it again
+            rows[row['key']] = row
+        return list(rows.values()), invalid
+
+    @classmethod
+    async def write_rows(cls, label, rows, user=None, relation_type=None):
+        counts = {'nodes': 0, 'cached': 0}
+        node_label, key, _ = YTMUSIC_LABELS[label]
+        if not relation_type:
+            # Without a relationship to write, nodes upserted recently need no write at all
+            cached = await EntityCache.get_many(node_label, [row['key'] for row in rows])
+            counts['cached'] = len(cached)
+            rows = [row for row in rows if row['key'] not in cached]
+        # Items merged into another node resolve to it, merging on their key would create them again
+        aliased = await resolve_aliases(node_label, key, [row['key'] for row in rows])
+        if aliased:
+            await EntityCache.set_many(node_label, aliased)
+            counts['cached'] += len(aliased)
+            rows = [row for row in rows if row['key'] not in aliased]
+            if relation_type:
+                await link_aliased(user, relation_type, aliased.values())
+
+        query = build_upsert_query(label, relation_type)
+
+        async def write_batch(batch):
+            async with cls.semaphore():
+                results, _ = await sync_to_async(db.cypher_query)(query, {
+                    'user_id': user.element_id if user is not None else None,
+                    'rows': batch,
+                })
+            await EntityCache.set_many(node_label, dict(results))
+            return len(results)
+
+        written = await asyncio.gather(*(
+            write_batch(rows[start:start + cls.batch_size]) for start in range(0, len(rows), cls.batch_size)
+        ))
+        counts['nodes'] = sum(written)
+        return counts
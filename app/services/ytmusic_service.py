@@ -1,13 +1,15 @@
 import time
 import logging
 from .service_strategy import ServiceStrategy
+from .bud_index_service import BudIndexService
+from .like_sync_service import LikeSyncService
+from .ytmusic_bulk_writer import YtmusicBulkWriter, YTMUSIC_LABELS, YTMUSIC_RELATIONS
 from typing import List, Dict
 from concurrent.futures import ThreadPoolExecutor
+from django.conf import settings
 import asyncio
 import ytmusicapi
 
-from app.db_models.ytmusic.ytmusic_artist import YtmusicArtist
-from app.db_models.ytmusic.ytmusic_track import YtmusicTrack
 from app.db_models.ytmusic.ytmusic_album import YtmusicAlbum
 
 from google.oauth2.credentials import Credentials
@@ -28,7 +30,8 @@ class YTmusicService(ServiceStrategy):
         self.client_id = client_id
         self.client_secret = client_secret
         self.redirect_uri = redirect_uri
-        self.executor = ThreadPoolExecutor()
+        # Shared by every request, the service is a process-wide singleton
+        self.executor = ThreadPoolExecutor(max_workers=getattr(settings, 'SERVICE_EXECUTOR_WORKERS', 8))
         logger.info("YTmusicService initialized")
 
     async def create_authorize_url(self) -> str:
@@ -220,81 +223,66 @@ class YTmusicService(ServiceStrategy):
 
         # Remove all 'played' relationships
         await user.played_tracks.disconnect_all()
+        await LikeSyncService.reset(user.uid)
 
         logger.info(f"Existing likes and played tracks deleted for user: {user}")
         
-    async def save_user_likes(self, user: str) -> None:
+    async def save_user_likes(self, user: str, progress=None) -> None:
         logger.info(f"Saving user likes for user: {user}")
 
-        # Delete existing likes and played relationships
-        await self.delete_user_likes(user)
-        # Fetch user data asynchronously
-        user_liked_tracks = await self.fetch_liked_tracks(user)
-        user_library_subscriptions = await self.fetch_library_subscriptions(user)
-        user_history = await self.fetch_history(user)
-
-        # Map data to Neo4j asynchronously
-        await asyncio.gather(
-            self.map_to_neo4j(user, 'Track', user_liked_tracks, 'likes'),
-            self.map_to_neo4j(user, 'Artist', user_library_subscriptions, 'likes'),
-            self.map_to_neo4j(user, 'Track', user_history, 'played')
+        # The three lists are fetched concurrently on the executor
+        if progress is not None:
+            await progress.set_totals(fetch=1, map=3, link=3)
+        user_liked_tracks, user_library_subscriptions, user_history = await asyncio.gather(
+            self.fetch_liked_tracks(user),
+            self.fetch_library_subscriptions(user),
+            self.fetch_history(user),
+        )
+        if progress is not None:
+            await progress.advance('fetch')
+
+        # Items are keyed by videoId and browseId, a track both liked and
+        # played is one row written by whichever sync needs it first
+        tracks, invalid_tracks = YtmusicBulkWriter.build_rows('Track', user_liked_tracks + user_history)
+        artists, invalid_artists = YtmusicBulkWriter.build_rows('Artist', user_library_subscriptions)
+        if invalid_tracks or invalid_artists:
+            logger.info(f"Skipped {invalid_tracks} tracks and {invalid_artists} artists without an id for user: {user}")
+        upserts = {}
+
+        def upsert(label, rows):
+            def run():
+                if label not in upserts:
+                    upserts[label] = asyncio.ensure_future(YtmusicBulkWriter.write_rows(label, rows))
+                return upserts[label]
+            return run
+
+        # Write only the relationships that changed since the last sync
+        results = await asyncio.gather(
+            LikeSyncService.sync(user, 'LIKES_TRACK', 'YtmusicTrack', 'videoId',
+                                 [item.get('videoId') for item in user_liked_tracks if item.get('videoId')],
+                                 upsert('Track', tracks), progress),
+            LikeSyncService.sync(user, 'LIKES_ARTIST', 'YtmusicArtist', 'browseId',
+                                 [item.get('browseId') for item in user_library_subscriptions if item.get('browseId')],
+                                 upsert('Artist', artists), progress),
+            LikeSyncService.sync(user, 'PLAYED_TRACK', 'YtmusicTrack', 'videoId',
+                                 [item.get('videoId') for item in user_history if item.get('videoId')],
+                                 upsert('Track', tracks), progress)
         )
-        logger.info(f"User likes saved for user: {user}")
+        if any(not result['unchanged'] for result in results):
+            await BudIndexService.update_account(user)
+        written = {label: future.result() for label, future in upserts.items()}
+        logger.info(f"User likes saved for user: {user}, written: {written}")
 
     async def map_to_neo4j(self, user: str, label: str, items: List[Dict], relation_type: str) -> None:
         logger.info(f"Mapping {label} to Neo4j for user: {user} with relation: {relation_type}")
-        loop = asyncio.get_event_loop()
-        tasks = []
-
-        for item in items:
-            if label == 'Artist':
-                tasks.append(self._process_artist(user, item))
-            elif label == 'Track':
-                tasks.append(self._process_track(user, item, relation_type))
-
-        # Execute all tasks concurrently
-        await asyncio.gather(*tasks)
-        logger.info(f"Mapped {label} to Neo4j for user: {user} with relation: {relation_type}")
-
-    async def _process_artist(self, user: str, item: Dict) -> None:
-        logger.info(f"Processing artist: {item['artist']} for user: {user}")
-        # Check if the artist already exists
-        node = await YtmusicArtist.nodes.get_or_none(name=item['artist'])
-        if not node:
-            logger.info(f"Creating new artist node: {item['artist']} for user: {user}")
-            node = await YtmusicArtist(
-                name=item['artist'],
-                browseId=item['browseId'],
-                subscribers=item['subscribers'],
-                thumbnails=[image['url'] for image in item['thumbnails']],
-                thumbnail_heights=[image['height'] for image in item['thumbnails']],
-                thumbnail_widthes=[image['width'] for image in item['thumbnails']]
-            ).save()
-
-        # Connect user with artist
-        await user.likes_artists.connect(node)
-        logger.info(f"Connected user: {user} with artist: {item['artist']}")
-
-    async def _process_track(self, user: str, item: Dict, relation_type: str) -> None:
-        logger.info(f"Processing track: {item['title']} for user: {user} with relation: {relation_type}")
-        # Check if the track already exists
-        node = await YtmusicTrack.nodes.get_or_none(name=item['title'])
-        if not node:
-            logger.info(f"Creating new track node: {item['title']} for user: {user}")
-            node = await YtmusicTrack(
-                name=item['title'],
-                videoId=item['videoId'],
-                playlistId=item.get('playlistId', None),
-                thumbnails=[image['url'] for image in item['thumbnails']],
-                thumbnail_heights=[image['height'] for image in item['thumbnails']],
-                thumbnail_widthes=[image['width'] for image in item['thumbnails']],
-                duration=item.get('duration', None),
-                album=item.get('album', None)
-            ).save()
-
-        # Connect user with track
-        await getattr(user, f'{relation_type}_tracks').connect(node)
-        logger.info(f"Connected user: {user} with track: {item['title']} with relation: {relation_type}")
+        # Subscribed artists are liked, tracks are liked or played
+        relation = 'LIKES_ARTIST' if label == 'Artist' else f'{relation_type.upper()}_TRACK'
+        if label not in YTMUSIC_LABELS or relation not in YTMUSIC_RELATIONS:
+            logger.error(f"Unsupported label or relation type: {label}, {relation_type}")
+            return
+        rows, _ = YtmusicBulkWriter.build_rows(label, items)
+        counts = await YtmusicBulkWriter.write_rows(label, rows, user, relation)
+        logger.info(f"Mapped {counts['nodes']} {label} to Neo4j for user: {user} with relation: {relation_type}")
 
     async def get_service_user(self, parent_user):
         # Implement this method to fetch the YouTube Music user associated with the parent user
@@ -0,0 +1,8 @@
+from celery import shared_task
+from app.services.entity_merge_service import EntityMergeService
+
+
+@shared_task
+def merge_entities_task(job_id):
+    job = EntityMergeService.run(job_id)
+    return job.status
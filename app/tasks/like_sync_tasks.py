@@ -0,0 +1,20 @@
+import asyncio
+from celery import shared_task
+from app.services import mal_fetcher, spotify_fetcher
+from app.services.like_sync_job_service import LikeSyncJobService
+
+
+async def run_job(job_id):
+    try:
+        return await LikeSyncJobService.run(job_id)
+    finally:
+        # The fetcher sessions belong to this task's event loop, which asyncio.run closes
+        await spotify_fetcher.close_session()
+        await mal_fetcher.close_session()
+
+
+@shared_task
+def sync_likes_task(job_id):
+    # Routed to the likes.<provider> queue of the job, see LikeSyncJobService.dispatch
+    job = asyncio.run(run_job(job_id))
+    return job.status
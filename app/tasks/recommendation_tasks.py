@@ -0,0 +1,16 @@
+import asyncio
+from celery import shared_task
+from app.services.model_update_service import ModelUpdateService
+from app.services.recommendation_service import precompute_recommendations
+
+
+@shared_task
+def precompute_recommendations_task():
+    # Scheduled nightly through CELERY_BEAT_SCHEDULE
+    return asyncio.run(precompute_recommendations())
+
+
+@shared_task
+def update_models_task():
+    # Folds the likes synced since the last run into the models, see ModelUpdateService
+    return asyncio.run(ModelUpdateService.run())
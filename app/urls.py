@@ -55,7 +55,8 @@ from .views.get_profile import (
 from .views.spotify_refresh_token import SpotifyRefreshToken
 from .views.ytmusic_refresh_token import YtmusicRefreshToken
 
-from .views.update_my_likes import UpdateMyLikes
+from .views.update_my_likes import UpdateMyLikes, LikeSyncJobStatus
+from .views.update_user_recommendations import UpdateUserRecommendations
 
 from .views.get_bud_profile import GetBudProfile
 
@@ -88,7 +89,7 @@ from .views.set_my_profile import SetMyProfile
 
 
 from .seeders.spotify.create_user_seed import create_user_seed
-from .views.merge_similars import merge_similars
+from .views.merge_similars import merge_similars, merge_similars_status
 
 
 router = DefaultRouter()
@@ -114,7 +115,9 @@ urlpatterns = [
     path('spotify/token/refresh', SpotifyRefreshToken.as_view(), name='spotify_refresh_token'),
 
     path('me/likes/update', UpdateMyLikes.as_view(), name='update_my_likes'),
+    path('me/likes/update/<uuid:job_id>', LikeSyncJobStatus.as_view(), name='like_sync_job_status'),
     path('me/profile', GetMyProfile.as_view(), name='get_my_profile'),
+    path('me/recommendations', UpdateUserRecommendations.as_view(), name='user_recommendations'),
     path('me/profile/set', SetMyProfile.as_view(), name='set_my_profile'),
 
     path('bud/common/liked/artists', GetCommonLikedArtists.as_view(), name='get_common_liked_artists'),
@@ -162,6 +165,7 @@ urlpatterns = [
     path('spotify/seed/user/create', create_user_seed, name='create_user_seed'),
 
     path('merge-similars', merge_similars, name='merge_similars'),
+    path('merge-similars/<uuid:job_id>', merge_similars_status, name='merge_similars_status'),
     path('login/', AuthLogin.as_view(), name='api_login'),
     path('token/refresh/', RefreshTokenView.as_view(), name='token_refresh'),
 ]
@@ -26,7 +26,7 @@ class Login(APIView):
         service = request.GET.get('service', 'spotify')
         try:
             logger.info(f"Generating authorization link for service: {service}")
-            service_instance = get_service(service)
+            service_instance = await get_service(service, request)
             authorization_link = await service_instance.create_authorize_url()
             logger.info("Generated authorization link successfully")
             return JsonResponse({
@@ -57,7 +57,7 @@ class YtmusicCallback(APIView):
         try:
             service = 'ytmusic'
             logger.info("Fetching tokens and user profile for YouTube Music")
-            service_instance = get_service(service)
+            service_instance = await get_service(service)
 
             tokens = await service_instance.get_tokens(code=code)
             user_profile = await service_instance.get_user_profile(tokens)
@@ -135,7 +135,7 @@ class SpotifyCallback(APIView):
         try:
             service = 'spotify'
             logger.info("Fetching tokens and user profile for Spotify")
-            service_instance = get_service(service)
+            service_instance = await get_service(service)
 
             tokens = await service_instance.get_tokens(code)
             user_profile = await service_instance.get_user_profile(tokens)
@@ -210,7 +210,7 @@ class LastfmCallback(APIView):
         try:
             service = 'lastfm'
             logger.info("Fetching user profile for Last.fm")
-            service_instance = get_service(service)
+            service_instance = await get_service(service)
             user_profile = await service_instance.get_user_profile(token)
 
             try:
@@ -281,7 +281,7 @@ class MalCallback(APIView):
         try:
             service = 'mal'
             logger.info("Fetching tokens and user profile for MyAnimeList")
-            service_instance = get_service(service)
+            service_instance = await get_service(service)
 
             code_verifier = await sync_to_async(request.session.get)('code_verifier')
             logger.debug(f"Retrieved code_verifier from session: {code_verifier}")  # Add this line
@@ -8,7 +8,7 @@ from ..pagination import StandardResultsSetPagination
 import logging
 from neomodel import db
 from asgiref.sync import sync_to_async
-from ..db_models.parent_user import ParentUser
+from app.services.bud_hydration_service import hydrate_buds
 
 logger = logging.getLogger('app')
 
@@ -86,23 +86,7 @@ class GetBudsByEntity(APIView):
             return []
 
     async def _fetch_buds_data(self, buds):
-        buds_data = []
-        try:
-            for bud in buds:
-                bud_uid, similarity_score = bud
-                parent_user = await ParentUser.nodes.get_or_none(uid=bud_uid)
-                if not parent_user:
-                    logger.warning(f"User with uid {bud_uid} not found in Neo4j DB. Skipping.")
-                    continue
-                
-                serialized_parent = serialize_parent_user(parent_user)
-                buds_data.append({
-                    'bud': serialized_parent,
-                    'similarity_score': similarity_score
-                })
-        except Exception as e:
-            logger.error(f'Error in _fetch_buds_data: {e}', exc_info=True)
-        
+        buds_data = await hydrate_buds(buds)
         logger.info(f'Data preparation complete. Total buds data prepared: {len(buds_data)}')
         return buds_data
 
@@ -6,9 +6,8 @@ from django.utils.decorators import method_decorator
 from app.middlewares.async_jwt_authentication import AsyncJWTAuthentication
 from ..pagination import StandardResultsSetPagination
 import logging
-from neomodel import db
-from asgiref.sync import sync_to_async
-from app.db_models.parent_user import ParentUser
+from app.services.bud_index_service import BudIndexService
+from app.services.bud_hydration_service import hydrate_buds
 
 logger = logging.getLogger('app')
 
@@ -29,22 +28,7 @@ class BudsMixin:
         return user_node
 
     async def fetch_buds_data(self, buds_results):
-        buds_data = []
-        try:
-            for bud in buds_results:
-                bud_uid, similarity_score = bud
-                logger.info(f"Processing bud: {bud_uid} with similarity score: {similarity_score}")
-                parent_user = await ParentUser.nodes.get_or_none(uid=bud_uid)
-                if parent_user:
-                    serialized_parent = await parent_user.serialize()
-                    buds_data.append({
-                        'bud': serialized_parent,
-                        'similarity_score': similarity_score
-                    })
-                else:
-                    logger.warning(f"User with uid {bud_uid} not found")
-        except Exception as e:
-            logger.error(f'Error in fetch_buds_data: {e}', exc_info=True)
+        buds_data = await hydrate_buds(buds_results)
         logger.info(f"Fetched buds data: {buds_data}")
         return buds_data
 
@@ -65,16 +49,7 @@ class GetBudsByLikedAlbums(BudsMixin, APIView):
     async def post(self, request):
         try:
             user_node = await self.get_user_node(request)
-            buds_query = """
-            MATCH (u:ParentUser {uid: $user_uid})-[:CONNECTED_TO_SPOTIFY|CONNECTED_TO_LASTFM|CONNECTED_TO_YTMUSIC]->(ua)-[:LIKES_ALBUM]->(album)
-            MATCH (other:ParentUser)-[:CONNECTED_TO_SPOTIFY|CONNECTED_TO_LASTFM|CONNECTED_TO_YTMUSIC]->(oa)-[:LIKES_ALBUM]->(album)
-            WHERE other.uid <> u.uid
-            WITH DISTINCT other, count(DISTINCT album) AS common_count
-            RETURN other.uid AS bud_uid, common_count AS similarity_score
-            ORDER BY similarity_score DESC
-            LIMIT 50
-            """
-            buds_results, _ = await sync_to_async(db.cypher_query)(buds_query, {'user_uid': user_node.uid})
+            buds_results = await BudIndexService.get_buds(user_node.uid, 'liked_albums', limit=50)
             buds_data = await self.fetch_buds_data(buds_results)
             response = await self.paginate_response(request, buds_data)
 
@@ -93,17 +68,8 @@ class GetBudsByLikedArtists(BudsMixin, APIView):
             user_node = await self.get_user_node(request)
             logger.info(f'Fetching buds for user: {user_node.uid}')
             
-            buds_query = """
-            MATCH (u:ParentUser {uid: $user_uid})-[:CONNECTED_TO_SPOTIFY|CONNECTED_TO_LASTFM|CONNECTED_TO_YTMUSIC]->()-[:LIKES_ARTIST]->(artist)
-            MATCH (other:ParentUser)-[:CONNECTED_TO_SPOTIFY|CONNECTED_TO_LASTFM|CONNECTED_TO_YTMUSIC]->()-[:LIKES_ARTIST]->(artist)
-            WHERE other.uid <> u.uid
-            WITH DISTINCT other, count(DISTINCT artist) AS common_count
-            RETURN other.uid AS bud_uid, common_count AS similarity_score
-            ORDER BY similarity_score DESC
-            LIMIT 50
-            """
-            buds_results, _ = await sync_to_async(db.cypher_query)(buds_query, {'user_uid': user_node.uid})
-            logger.info(f'Cypher query results: {buds_results}')
+            buds_results = await BudIndexService.get_buds(user_node.uid, 'liked_artists', limit=50)
+            logger.info(f'Bud index results: {buds_results}')
             
             buds_data = await self.fetch_buds_data(buds_results)
             logger.info(f'Fetched buds data: {buds_data}')
@@ -125,17 +91,8 @@ class GetBudsByLikedGenres(BudsMixin, APIView):
     async def post(self, request):
         try:
             user_node = await self.get_user_node(request)
-            buds_query = """
-            MATCH (u:ParentUser {uid: $user_uid})-[:CONNECTED_TO_SPOTIFY|CONNECTED_TO_LASTFM|CONNECTED_TO_YTMUSIC]->(ua)-[:LIKES_GENRE]->(genre)
-            MATCH (other:ParentUser)-[:CONNECTED_TO_SPOTIFY|CONNECTED_TO_LASTFM|CONNECTED_TO_YTMUSIC]->(oa)-[:LIKES_GENRE]->(genre)
-            WHERE other.uid <> u.uid
-            WITH DISTINCT other, count(DISTINCT genre) AS common_count
-            RETURN other.uid AS bud_uid, common_count AS similarity_score
-            ORDER BY similarity_score DESC
-            LIMIT 50
-            """
-            buds_results, _ = await sync_to_async(db.cypher_query)(buds_query, {'user_uid': user_node.uid})
-            logger.info(f"Cypher query results: {buds_results}")
+            buds_results = await BudIndexService.get_buds(user_node.uid, 'liked_genres', limit=50)
+            logger.info(f"Bud index results: {buds_results}")
             buds_data = await self.fetch_buds_data(buds_results)
             response = await self.paginate_response(request, buds_data)
 
@@ -152,16 +109,7 @@ class GetBudsByPlayedTracks(BudsMixin, APIView):
     async def post(self, request):
         try:
             user_node = await self.get_user_node(request)
-            buds_query = """
-            MATCH (u:ParentUser {uid: $user_uid})-[:CONNECTED_TO_SPOTIFY|CONNECTED_TO_LASTFM|CONNECTED_TO_YTMUSIC]->(ua)-[:PLAYED_TRACK]->(track)
-            MATCH (other:ParentUser)-[:CONNECTED_TO_SPOTIFY|CONNECTED_TO_LASTFM|CONNECTED_TO_YTMUSIC]->(oa)-[:PLAYED_TRACK]->(track)
-            WHERE other.uid <> u.uid
-            WITH DISTINCT other, count(DISTINCT track) AS common_count
-            RETURN other.uid AS bud_uid, common_count AS similarity_score
-            ORDER BY similarity_score DESC
-            LIMIT 50
-            """
-            buds_results, _ = await sync_to_async(db.cypher_query)(buds_query, {'user_uid': user_node.uid})
+            buds_results = await BudIndexService.get_buds(user_node.uid, 'played_tracks', limit=50)
             buds_data = await self.fetch_buds_data(buds_results)
             response = await self.paginate_response(request, buds_data)
 
@@ -178,16 +126,7 @@ class GetBudsByLikedTracks(BudsMixin, APIView):
     async def post(self, request):
         try:
             user_node = await self.get_user_node(request)
-            buds_query = """
-            MATCH (u:ParentUser {uid: $user_uid})-[:CONNECTED_TO_SPOTIFY|CONNECTED_TO_LASTFM|CONNECTED_TO_YTMUSIC]->(ua)-[:LIKES_TRACK]->(track)
-            MATCH (other:ParentUser)-[:CONNECTED_TO_SPOTIFY|CONNECTED_TO_LASTFM|CONNECTED_TO_YTMUSIC]->(oa)-[:LIKES_TRACK]->(track)
-            WHERE other.uid <> u.uid
-            WITH DISTINCT other, count(DISTINCT track) AS common_count
-            RETURN other.uid AS bud_uid, common_count AS similarity_score
-            ORDER BY similarity_score DESC
-            LIMIT 50
-            """
-            buds_results, _ = await sync_to_async(db.cypher_query)(buds_query, {'user_uid': user_node.uid})
+            buds_results = await BudIndexService.get_buds(user_node.uid, 'liked_tracks', limit=50)
             buds_data = await self.fetch_buds_data(buds_results)
             response = await self.paginate_response(request, buds_data)
 
@@ -8,7 +8,9 @@ from ..pagination import StandardResultsSetPagination
 import logging
 from neomodel import db
 from asgiref.sync import sync_to_async
-from ..db_models.parent_user import ParentUser
+from app.services.bud_index_service import BudIndexService, AIO_DIMENSION
+from app.services.bud_hydration_service import hydrate_buds
+from app.services.bud_scoring_service import default_weights, resolve_weights, score_buds
 
 logger = logging.getLogger('app')
 
@@ -23,95 +25,21 @@ class GetBudsByLikedAio(APIView):
 
     async def _fetch_buds_data(self, buds):
         """Prepares the data for each bud."""
-        buds_data = []
         logger.debug(f"Fetching data for {len(buds)} buds")
-        for bud in buds:
-            bud_user = bud['user']
-            similarity_score = bud['similarity_score']
-            
-            # Serialize the user data
-            serialized_user = await self.serialize_node(bud_user)
-            
-            buds_data.append({
-                'bud': serialized_user,
-                'similarity_score': similarity_score
-            })
-            logger.info(f"Prepared bud: uid={serialized_user['uid']}, similarity_score={similarity_score}")
-        
+        buds_data = await hydrate_buds(buds)
         logger.info(f'Data preparation complete. Total buds data prepared: {len(buds_data)}')
         return buds_data
 
-    async def serialize_node(self, node):
-        """Serializes a Node object."""
-        return {key: value for key, value in node.items()}
-
-    async def get_user_by_uid(self, uid):
-        query = """
-        MATCH (u:ParentUser {uid: $uid})
-        RETURN u
-        """
-        results, _ = await sync_to_async(db.cypher_query)(query, {'uid': uid})
-        if results:
-            user_data = results[0][0]
-            logger.info(f"Retrieved user data for uid {uid}: {user_data}")
-            return user_data
-        else:
-            logger.warning(f"No user found with uid {uid}")
-            return None
-
-    async def get_common_buds(self, user_node):
+    async def get_common_buds(self, user_node, weights):
         try:
-            # First, verify the requesting user exists
-            user_data = await self.get_user_by_uid(user_node.uid)
-            if not user_data:
-                logger.error(f"Requesting user {user_node.uid} not found in the database")
-                return []
-
-            # Check the user's connections
-            await self.check_user_connections(user_node.uid)
-
-            # Check active users in the database
-            active_users = await self.check_active_users()
-            if not active_users:
-                logger.warning("No active users found in the database")
-                return []
-
-            # Proceed with the original logic...
-            similar_tastes_query = """
-            MATCH (u:ParentUser {uid: $user_uid})-[:CONNECTED_TO_SPOTIFY]->(uSpotify:SpotifyUser)
-            MATCH (other:ParentUser)-[:CONNECTED_TO_SPOTIFY]->(otherSpotify:SpotifyUser)
-            WHERE other.uid <> u.uid AND other.is_active = true
-
-            OPTIONAL MATCH (uSpotify)-[:LIKES_GENRE]->(genre:Genre)<-[:LIKES_GENRE]-(otherSpotify)
-            WITH u, other, count(DISTINCT genre) AS sharedGenres
-
-            OPTIONAL MATCH (uSpotify)-[:LIKES_ARTIST]->(artist:Artist)<-[:LIKES_ARTIST]-(otherSpotify)
-            WITH u, other, sharedGenres, count(DISTINCT artist) AS sharedArtists
-
-            OPTIONAL MATCH (uSpotify)-[:PLAYED_TRACK]->(track:Track)<-[:PLAYED_TRACK]-(otherSpotify)
-            WITH other, sharedGenres * 3 + sharedArtists * 2 + count(DISTINCT track) AS similarityScore
-
-            RETURN other.uid AS bud_uid, similarityScore
-            ORDER BY similarityScore DESC
-            LIMIT 20
-            """
-
-            similar_tastes_results, _ = await sync_to_async(db.cypher_query)(similar_tastes_query, {
-                'user_uid': user_node.uid
-            })
+            if weights == default_weights():
+                similar_tastes_results = await BudIndexService.get_buds(user_node.uid, AIO_DIMENSION, limit=20)
+            else:
+                similar_tastes_results = await score_buds(user_node.uid, weights, limit=20)
 
             logger.info(f"Found {len(similar_tastes_results)} potential buds for user {user_node.uid}")
 
-            # Process potential buds
-            buds = []
-            for result in similar_tastes_results:
-                bud_uid = result[0]
-                bud_user = await self.get_user_by_uid(bud_uid)
-                if bud_user:
-                    buds.append({
-                        'user': bud_user,
-                        'similarity_score': result[1],
-                    })
+            buds = list(similar_tastes_results)
 
             if not buds:
                 logger.warning(f"No valid buds found for user {user_node.uid}. Falling back to popular users.")
@@ -140,19 +68,8 @@ class GetBudsByLikedAio(APIView):
         results, _ = await sync_to_async(db.cypher_query)(popular_users_query, {'limit': limit})
         
         logger.info(f"Found {len(results)} popular users")
-        
-        buds = []
-        for result in results:
-            bud_uid, activity = result
-            bud_user = await self.get_user_by_uid(bud_uid)
-            if bud_user:
-                buds.append({
-                    'user': bud_user,
-                    'similarity_score': activity,  # Use activity as a proxy for similarity
-                })
-            else:
-                logger.warning(f"Popular user with uid {bud_uid} not found in the database.")
-        return buds
+        # Use activity as a proxy for similarity
+        return [(bud_uid, activity) for bud_uid, activity in results]
 
     async def get_any_active_users(self, limit=10):
         active_users_query = """
@@ -164,45 +81,8 @@ class GetBudsByLikedAio(APIView):
         results, _ = await sync_to_async(db.cypher_query)(active_users_query, {'limit': limit})
         
         logger.info(f"Found {len(results)} active users")
-        
-        buds = []
-        for result in results:
-            bud_uid = result[0]
-            bud_user = await self.get_user_by_uid(bud_uid)
-            if bud_user:
-                buds.append({
-                    'user': bud_user,
-                    'similarity_score': 0,  # Indicate that this is a last-resort recommendation
-                })
-            else:
-                logger.warning(f"Active user with uid {bud_uid} not found in the database.")
-        return buds
-
-    async def check_active_users(self):
-        query = """
-        MATCH (u:ParentUser)-[:CONNECTED_TO_SPOTIFY]->(s:SpotifyUser)
-        WHERE u.is_active = true
-        RETURN u.uid, u.username, u.display_name
-        """
-        results, _ = await sync_to_async(db.cypher_query)(query)
-        for result in results:
-            logger.info(f"Active user: uid={result[0]}, username={result[1]}, display_name={result[2]}")
-        return results
-
-    async def check_user_connections(self, uid):
-        query = """
-        MATCH (u:ParentUser {uid: $uid})-[:CONNECTED_TO_SPOTIFY]->(s:SpotifyUser)
-        OPTIONAL MATCH (s)-[:LIKES_GENRE]->(g:Genre)
-        OPTIONAL MATCH (s)-[:LIKES_ARTIST]->(a:Artist)
-        OPTIONAL MATCH (s)-[:PLAYED_TRACK]->(t:Track)
-        RETURN count(DISTINCT g) as genres, count(DISTINCT a) as artists, count(DISTINCT t) as tracks
-        """
-        results, _ = await sync_to_async(db.cypher_query)(query, {'uid': uid})
-        if results:
-            genres, artists, tracks = results[0]
-            logger.info(f"User {uid} connections: {genres} genres, {artists} artists, {tracks} tracks")
-        else:
-            logger.warning(f"No connections found for user {uid}")
+        # A zero score indicates that this is a last-resort recommendation
+        return [(result[0], 0) for result in results]
 
     async def post(self, request):
         try:
@@ -213,25 +93,13 @@ class GetBudsByLikedAio(APIView):
 
             logger.info(f'Received request from user: uid={user_node.uid}')
 
-            # Check if parent user exists in the database
-            parent_user_query = """
-            MATCH (u)
-            WHERE u.uid = $user_uid
-            RETURN u, labels(u) as labels
-            """
-            parent_user_results, _ = await sync_to_async(db.cypher_query)(parent_user_query, {
-                'user_uid': user_node.uid
-            })
-            logger.debug(f"Parent user check: {parent_user_results}")
-
-            if not parent_user_results:
-                logger.error(f"Parent user with UID {user_node.uid} not found in the database")
-                return JsonResponse({'error': 'Parent user not found in database'}, status=404)
-
-            parent_user, labels = parent_user_results[0]
-            logger.debug(f"Parent user labels: {labels}")
+            try:
+                weights = resolve_weights(request.data.get('weights'))
+            except ValueError as e:
+                logger.warning(f'Invalid weights from user {user_node.uid}: {e}')
+                return JsonResponse({'error': str(e)}, status=400)
 
-            buds = await self.get_common_buds(user_node)
+            buds = await self.get_common_buds(user_node, weights)
             buds_data = await self._fetch_buds_data(buds)
 
             paginator = StandardResultsSetPagination()
@@ -241,6 +109,7 @@ class GetBudsByLikedAio(APIView):
                 'message': 'Fetched buds successfully.',
                 'code': 200,
                 'successful': True,
+                'weights': weights,
             })
 
             logger.info(f'Successfully fetched buds for user: uid={user_node.uid}, buds_count={len(buds)}')
@@ -6,9 +6,8 @@ from django.utils.decorators import method_decorator
 from app.middlewares.async_jwt_authentication import AsyncJWTAuthentication
 from ..pagination import StandardResultsSetPagination
 import logging
-from neomodel import db
-from asgiref.sync import sync_to_async
-from app.db_models.parent_user import ParentUser
+from app.services.bud_index_service import BudIndexService
+from app.services.bud_hydration_service import hydrate_buds
 import time
 
 logger = logging.getLogger('app')
@@ -17,6 +16,7 @@ class BudsBaseMixin:
     authentication_classes = [AsyncJWTAuthentication]
 
     permission_classes = [IsAuthenticated]
+    dimension = None
 
     @method_decorator(csrf_exempt)
     async def dispatch(self, *args, **kwargs):
@@ -30,59 +30,7 @@ class BudsBaseMixin:
         return user_node
 
     async def fetch_buds_data(self, buds_results):
-        buds_data = []
-        try:
-            for bud in buds_results:
-                bud_uid, similarity_score = bud
-                parent_user = await ParentUser.nodes.get_or_none(uid=bud_uid)
-                if not parent_user:
-                    neo4j_user = await self.get_user_from_neo4j(bud_uid)
-                    if neo4j_user:
-                        parent_user = await self.sync_user_to_django(neo4j_user)
-                
-                if parent_user:
-                    serialized_parent = await parent_user.serialize()
-                    buds_data.append({
-                        'bud': serialized_parent,
-                        'similarity_score': similarity_score
-                    })
-                else:
-                    logger.warning(f"User with uid {bud_uid} not found in both Django and Neo4j")
-            logger.info(f"Fetched data for {len(buds_data)} out of {len(buds_results)} buds")
-        except Exception as e:
-            logger.error(f'Error in fetch_buds_data: {e}', exc_info=True)
-        return buds_data
-
-    async def get_user_from_neo4j(self, uid):
-        query = """
-        MATCH (u:ParentUser {uid: $uid})
-        RETURN u.uid AS uid, u.username AS username, u.is_active AS is_active
-        """
-        results, _ = await sync_to_async(db.cypher_query)(query, {'uid': uid})
-        if results:
-            user_data = results[0]
-            return {
-                'uid': user_data[0],
-                'username': user_data[1],
-                'is_active': user_data[2]
-            }
-        return None
-
-    async def sync_user_to_django(self, neo4j_user):
-        try:
-            django_user, created = await sync_to_async(ParentUser.nodes.get_or_create)(
-                uid=neo4j_user['uid'],
-                defaults={
-                    'username': neo4j_user['username'],
-                    'is_active': neo4j_user['is_active']
-                }
-            )
-            if created:
-                logger.info(f"Created new ParentUser for uid {neo4j_user['uid']}")
-            return django_user
-        except Exception as e:
-            logger.error(f"Error syncing user to Django: {e}", exc_info=True)
-            return None
+        return await hydrate_buds(buds_results)
 
     async def paginate_response(self, request, buds_data):
         paginator = StandardResultsSetPagination()
@@ -96,6 +44,13 @@ class BudsBaseMixin:
         logger.info(f"Paginated response: {paginated_response}")  # Add this line
         return paginated_response
 
+    async def get_buds_by_top(self, user_node):
+        try:
+            return await BudIndexService.get_buds(user_node.uid, self.dimension, limit=50)
+        except Exception as e:
+            logger.error(f"Error in get_buds_by_top for user uid={user_node.uid}: {str(e)}", exc_info=True)
+            return []
+
     async def post(self, request):
         start_time = time.time()
         try:
@@ -121,31 +76,15 @@ class BudsBaseMixin:
             return JsonResponse({'error': 'Internal Server Error', 'type': error_type}, status=500)
 
 class GetBudsByTopArtists(BudsBaseMixin, APIView):
+    dimension = 'top_artists'
+
     async def get_buds_by_top(self, user_node):
         try:
-            buds_query = """
-            MATCH (u:ParentUser {uid: $user_uid})-[:CONNECTED_TO_SPOTIFY|CONNECTED_TO_LASTFM|CONNECTED_TO_YTMUSIC]->(ua)-[:TOP_ARTIST]->(artist)
-            MATCH (other:ParentUser)-[:CONNECTED_TO_SPOTIFY|CONNECTED_TO_LASTFM|CONNECTED_TO_YTMUSIC]->(oa)-[:TOP_ARTIST]->(artist)
-            WHERE other.uid <> u.uid AND other.is_active = true
-            WITH DISTINCT other, count(DISTINCT artist) AS common_count
-            ORDER BY common_count DESC
-            LIMIT 100
-            RETURN other.uid AS bud_uid, common_count AS similarity_score
-            """
-            buds_results, _ = await sync_to_async(db.cypher_query)(buds_query, {'user_uid': user_node.uid})
+            buds_results = await BudIndexService.get_buds(user_node.uid, self.dimension, limit=100)
             
             if len(buds_results) < 10:
                 logger.info(f"Found only {len(buds_results)} buds for user {user_node.uid}. Falling back to genre-based matching.")
-                genre_query = """
-                MATCH (u:ParentUser {uid: $user_uid})-[:CONNECTED_TO_SPOTIFY|CONNECTED_TO_LASTFM|CONNECTED_TO_YTMUSIC]->(ua)-[:LIKES_GENRE]->(genre)
-                MATCH (other:ParentUser)-[:CONNECTED_TO_SPOTIFY|CONNECTED_TO_LASTFM|CONNECTED_TO_YTMUSIC]->(oa)-[:LIKES_GENRE]->(genre)
-                WHERE other.uid <> u.uid AND other.is_active = true
-                WITH DISTINCT other, count(DISTINCT genre) AS common_count
-                ORDER BY common_count DESC
-                LIMIT 50
-                RETURN other.uid AS bud_uid, common_count AS similarity_score
-                """
-                genre_results, _ = await sync_to_async(db.cypher_query)(genre_query, {'user_uid': user_node.uid})
+                genre_results = await BudIndexService.get_buds(user_node.uid, 'top_genres', limit=50)
                 buds_results.extend(genre_results)
             
             logger.info(f"Found {len(buds_results)} potential buds for user {user_node.uid}")
@@ -159,73 +98,13 @@ class GetBudsByTopArtists(BudsBaseMixin, APIView):
             return []
 
 class GetBudsByTopTracks(BudsBaseMixin, APIView):
-    async def get_buds_by_top(self, user_node):
-        try:
-            buds_query = """
-            MATCH (u:ParentUser {uid: $user_uid})-[:CONNECTED_TO_SPOTIFY|CONNECTED_TO_LASTFM|CONNECTED_TO_YTMUSIC]->(ua)-[:TOP_TRACK]->(track)
-            MATCH (other:ParentUser)-[:CONNECTED_TO_SPOTIFY|CONNECTED_TO_LASTFM|CONNECTED_TO_YTMUSIC]->(oa)-[:TOP_TRACK]->(track)
-            WHERE other.uid <> u.uid AND other.is_active = true
-            WITH DISTINCT other, count(DISTINCT track) AS common_count
-            ORDER BY common_count DESC
-            LIMIT 50
-            RETURN other.uid AS bud_uid, common_count AS similarity_score
-            """
-            buds_results, _ = await sync_to_async(db.cypher_query)(buds_query, {'user_uid': user_node.uid})
-            return buds_results
-        except Exception as e:
-            logger.error(f"Error in get_buds_by_top for user uid={user_node.uid}: {str(e)}", exc_info=True)
-            return []
+    dimension = 'top_tracks'
 
 class GetBudsByTopGenres(BudsBaseMixin, APIView):
-    async def get_buds_by_top(self, user_node):
-        try:
-            buds_query = """
-            MATCH (u:ParentUser {uid: $user_uid})-[:CONNECTED_TO_SPOTIFY|CONNECTED_TO_LASTFM|CONNECTED_TO_YTMUSIC]->(ua)-[:LIKES_GENRE]->(genre)
-            MATCH (other:ParentUser)-[:CONNECTED_TO_SPOTIFY|CONNECTED_TO_LASTFM|CONNECTED_TO_YTMUSIC]->(oa)-[:LIKES_GENRE]->(genre)
-            WHERE other.uid <> u.uid AND other.is_active = true
-            WITH DISTINCT other, count(DISTINCT genre) AS common_count
-            ORDER BY common_count DESC
-            LIMIT 50
-            RETURN other.uid AS bud_uid, common_count AS similarity_score
-            """
-            buds_results, _ = await sync_to_async(db.cypher_query)(buds_query, {'user_uid': user_node.uid})
-            return buds_results
-        except Exception as e:
-            logger.error(f"Error in get_buds_by_top for user uid={user_node.uid}: {str(e)}", exc_info=True)
-            return []
+    dimension = 'top_genres'
 
 class GetBudsByTopManga(BudsBaseMixin, APIView):
-    async def get_buds_by_top(self, user_node):
-        try:
-            buds_query = """
-            MATCH (u:ParentUser {uid: $user_uid})-[:CONNECTED_TO_MAL]->(ma)-[:TOP_MANGA]->(manga)
-            MATCH (other:ParentUser)-[:CONNECTED_TO_MAL]->(oma)-[:TOP_MANGA]->(manga)
-            WHERE other.uid <> u.uid AND other.is_active = true
-            WITH DISTINCT other, count(DISTINCT manga) AS common_count
-            ORDER BY common_count DESC
-            LIMIT 50
-            RETURN other.uid AS bud_uid, common_count AS similarity_score
-            """
-            buds_results, _ = await sync_to_async(db.cypher_query)(buds_query, {'user_uid': user_node.uid})
-            return buds_results
-        except Exception as e:
-            logger.error(f"Error in get_buds_by_top for user uid={user_node.uid}: {str(e)}", exc_info=True)
-            return []
+    dimension = 'top_manga'
 
 class GetBudsByTopAnime(BudsBaseMixin, APIView):
-    async def get_buds_by_top(self, user_node):
-        try:
-            buds_query = """
-            MATCH (u:ParentUser {uid: $user_uid})-[:CONNECTED_TO_MAL]->(ma)-[:TOP_ANIME]->(anime)
-            MATCH (other:ParentUser)-[:CONNECTED_TO_MAL]->(oma)-[:TOP_ANIME]->(anime)
-            WHERE other.uid <> u.uid AND other.is_active = true
-            WITH DISTINCT other, count(DISTINCT anime) AS common_count
-            ORDER BY common_count DESC
-            LIMIT 50
-            RETURN other.uid AS bud_uid, common_count AS similarity_score
-            """
-            buds_results, _ = await sync_to_async(db.cypher_query)(buds_query, {'user_uid': user_node.uid})
-            return buds_results
-        except Exception as e:
-            logger.error(f"Error in get_buds_by_top for user uid={user_node.uid}: {str(e)}", exc_info=True)
-            return []
+    dimension = 'top_anime'
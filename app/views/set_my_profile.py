@@ -9,6 +9,7 @@ from django.core.files.storage import FileSystemStorage
 
 from ..forms.set_my_profile import SetMyProfileForm
 from app.middlewares.async_jwt_authentication import AsyncJWTAuthentication
+from app.middlewares import identity
 
 import logging
 logger = logging.getLogger(__name__)
@@ -47,6 +48,7 @@ class SetMyProfile(APIView):
                     user.photo_url = photo_url
 
                 user.save()
+                identity.forget(user)
 
                 return JsonResponse({
                     'message': 'Profile updated successfully.',
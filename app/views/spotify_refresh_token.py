@@ -4,7 +4,7 @@ from rest_framework.permissions import IsAuthenticated
 from django.views.decorators.csrf import csrf_exempt
 from django.utils.decorators import method_decorator
 from app.middlewares.async_jwt_authentication import AsyncJWTAuthentication
-from app.services.service_selector import get_service
+from app.services.service_selector import get_service_instance
 
 import logging
 logger = logging.getLogger(__name__)
@@ -23,7 +23,7 @@ class SpotifyRefreshToken(APIView):
         try:
             service = 'spotify'
             user = request.user  
-            tokens = get_service(service).refresh_token(user)
+            tokens = get_service_instance(service).refresh_token(user)
             user.update_spotify_tokens(user,tokens)
 
             return JsonResponse({
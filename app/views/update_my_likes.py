@@ -1,12 +1,12 @@
 from adrf.views import APIView
 from rest_framework import status
 from rest_framework.response import Response
-from app.services.service_selector import get_service
+from app.services.like_sync_job_service import LikeSyncJobService
+from app.models import LikeSyncJob
 import logging
-import asyncio
+from django.urls import reverse
 from app.middlewares.async_jwt_authentication import AsyncJWTAuthentication
 from rest_framework.permissions import IsAuthenticated  
-from app.tasks.celery_task import long_running_task
 from app.middlewares.token_middleware import TokenMixin
 
 logger = logging.getLogger(__name__)
@@ -16,31 +16,47 @@ class UpdateMyLikes(TokenMixin,APIView):
     permission_classes = [IsAuthenticated]
     
     async def post(self, request, *args, **kwargs):
-        long_running_task.delay()
-
         try:
             parent_user = request.parent_user
             if not parent_user:
                 logger.error(f"Parent user not found in request for user: {request.user.username}")
                 return Response({"error": "Parent user not found"}, status=status.HTTP_404_NOT_FOUND)
 
-            spotify_service = await get_service('spotify')
-            if not spotify_service:
-                return Response({"error": "Failed to initialize Spotify service"}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
-
+            provider = request.data.get('service', 'spotify')
+            try:
+                # Through str, so 2.5 and true are rejected instead of truncated
+                priority = int(str(request.data.get('priority', 5)))
+            except ValueError:
+                return Response({"error": "Priority must be an integer from 0 to 9"}, status=status.HTTP_400_BAD_REQUEST)
             try:
-                success = await asyncio.wait_for(spotify_service.save_user_likes(parent_user), timeout=120.0)
-                if success:
-                    logger.info(f"Likes updated successfully for user: {request.user.username}")
-                    return Response({"success": True, "message": "Likes updated successfully"}, status=status.HTTP_200_OK)
-                else:
-                    logger.error(f"Failed to update likes for user: {request.user.username}")
-                    return Response({"error": "Failed to update likes. Check logs for details."}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
-            except asyncio.TimeoutError:
-                logger.error(f"Timeout while updating likes for user: {request.user.username}")
-                return Response({"error": "Timeout while updating likes. The operation took too long to complete."}, status=status.HTTP_504_GATEWAY_TIMEOUT)
+                job, created = await LikeSyncJobService.enqueue(parent_user, provider, priority)
+            except ValueError as e:
+                return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+            # The sync runs in the background, progress is polled from the job endpoint
+            logger.info(f"Like sync {job.id} {'queued' if created else 'already active'} for user: {request.user.username}")
+            return Response({
+                "success": True,
+                "message": "Likes update queued" if created else "Likes update already in progress",
+                "data": LikeSyncJobService.serialize(job),
+                "status_url": reverse('like_sync_job_status', args=[job.id]),
+            }, status=status.HTTP_202_ACCEPTED)
 
         except Exception as e:
             logger.error(f"Error updating likes for user: {request.user.username} - {str(e)}")
             return Response({"error": f"An error occurred while updating likes: {str(e)}"}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
+
+class LikeSyncJobStatus(TokenMixin,APIView):
+    authentication_classes = [AsyncJWTAuthentication]
+    permission_classes = [IsAuthenticated]
+
+    async def get(self, request, job_id, *args, **kwargs):
+        parent_user = request.parent_user
+        if not parent_user:
+            return Response({"error": "Parent user not found"}, status=status.HTTP_404_NOT_FOUND)
+
+        job = await LikeSyncJob.objects.filter(id=job_id, user_uid=parent_user.uid).afirst()
+        if job is None:
+            return Response({"error": "Job not found"}, status=status.HTTP_404_NOT_FOUND)
+        return Response({"success": True, "data": LikeSyncJobService.serialize(job)}, status=status.HTTP_200_OK)
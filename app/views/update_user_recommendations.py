@@ -1,19 +1,36 @@
 from django.http import JsonResponse
 from app.services.recommendation_service import get_recommendations
-from app.db_models import ParentUser as User
 from app.middlewares.async_jwt_authentication import AsyncJWTAuthentication
+from app.middlewares import identity
 from adrf.views import APIView
-from rest_framework.permissions import AllowAny
+from rest_framework.permissions import IsAuthenticated
+import logging
+
+logger = logging.getLogger('app')
 
 class UpdateUserRecommendations(APIView):
     authentication_classes = [AsyncJWTAuthentication]
-    permission_classes = [AllowAny]
+    permission_classes = [IsAuthenticated]
 
-    async def get(self, request, user_id):
-        auth_result = await self.authentication_classes[0]().authenticate_async(request)
-        if auth_result is None:
-            return JsonResponse({'error': 'Authentication failed'}, status=401)
-        
-        user, _ = auth_result
-        # Your existing logic here
-        pass
\ No newline at end of file
+    async def get(self, request):
+        try:
+            # Only the requesting user's own recommendations are served
+            parent_user = await identity.get_parent_user(request)
+            if not parent_user:
+                return JsonResponse({'error': 'Parent user not found'}, status=404)
+            user_id = parent_user.uid
+            # Served from the nightly precomputed table, see `precompute_recommendations`
+            recommendations = await get_recommendations(user_id)
+            return JsonResponse({
+                'message': 'Fetched recommendations successfully.',
+                'code': 200,
+                'successful': True,
+                'data': recommendations,
+            })
+        except ValueError as e:
+            logger.warning(f'Recommendations requested for unknown user {user_id}: {e}')
+            return JsonResponse({'error': str(e)}, status=404)
+        except Exception as e:
+            error_type = type(e).__name__
+            logger.error(f'Error in UpdateUserRecommendations: {e}', exc_info=True)
+            return JsonResponse({'error': 'Internal Server Error', 'type': error_type}, status=500)
@@ -6,7 +6,7 @@ from django.utils.decorators import method_decorator
 from app.middlewares.async_jwt_authentication import AsyncJWTAuthentication
 from django.http import JsonResponse
 
-from app.services.service_selector import get_service
+from app.services.service_selector import get_service_instance
 
 import logging
 logger = logging.getLogger(__name__)
@@ -24,7 +24,7 @@ class YtmusicRefreshToken(APIView):
         try:
             service = 'ytmusic'
             user = request.user  
-            tokens = get_service(service).refresh_token(user)
+            tokens = get_service_instance(service).refresh_token(user)
             user.update_ytmusic_tokens(user,tokens)
 
             return JsonResponse({
@@ -2,6 +2,7 @@ import os
 from pathlib import Path
 from dotenv import load_dotenv
 from datetime import timedelta
+from celery.schedules import crontab
 import jwt
 import sqlite3
 
@@ -144,6 +145,48 @@ NEOMODEL_FORCE_TIMEZONE = False
 NEOMODEL_ENCRYPTED_CONNECTION = True
 NEOMODEL_MAX_CONNECTION_POOL_SIZE = 1000
 
+# Bud similarity index
+BUD_INDEX_TOP_K = 100  # Buds kept per user and dimension
+BUD_INDEX_PARTNER_LIMIT = 1000  # Buds whose lists are refreshed after a like sync
+BUD_SCORE_WEIGHTS = {'genres': 3, 'artists': 2, 'tracks': 1}  # Weights of the all-in-one bud score
+
+# Trained recommendation models and the user ANN index built from them
+AI_MODEL_DIR = os.path.join(BASE_DIR, 'ai')
+RECOMMENDATIONS_TOP_N = 50  # Items kept per user in the nightly recommendations table
+MODEL_UPDATE_EPOCHS = 5  # fit_partial epochs of the incremental model update
+MODEL_UPDATE_LOCK_TIMEOUT = 3600  # Seconds a model update holds its lock, runs longer than this can overlap
+
+# Spotify Web API requests in flight per user sync and per process
+SPOTIFY_USER_CONCURRENCY = 4
+SPOTIFY_GLOBAL_CONCURRENCY = 32
+SERVICE_EXECUTOR_WORKERS = 8  # Threads of the blocking Last.fm and YT Music clients
+YTMUSIC_WRITE_CONCURRENCY = 4  # UNWIND batches of YT Music items written at once per process
+
+# MyAnimeList API, list pages are prefetched while the previous one is written
+MAL_API_URL = os.environ.get('MAL_API_URL', 'https://api.myanimelist.net/v2')
+MAL_CONCURRENCY = 16  # Connections of the pooled MAL session per process
+MAL_PAGE_SIZE = 100  # Items per list page, 1000 at most
+
+# Provider token checks, see TokenManager
+TOKEN_REFRESH_MARGIN = 60  # Seconds before expiry a token is treated as expired
+TOKEN_PROACTIVE_REFRESH = 300  # Seconds before expiry a token is refreshed in the background
+TOKEN_CACHE_TTL = 300  # Seconds a token without a known expiry is trusted between checks
+
+# Process-level cache of authenticated users and their ParentUser nodes
+IDENTITY_CACHE_SIZE = 1024
+IDENTITY_CACHE_TTL = 30  # Seconds, 0 disables the cache
+
+# Provider keys of item nodes resolved during ingestion, see EntityCache
+ENTITY_CACHE_SIZE = 100000
+ENTITY_CACHE_TTL = 600  # Seconds, 0 disables the cache
+ENTITY_CACHE_BACKEND = 'local'  # 'redis' to share entries between workers through CACHES
+
+# Last.fm artist tags shared by all users' genre syncs, see LastfmTagCache
+LASTFM_TAG_CACHE_SIZE = 10000
+LASTFM_TAG_CACHE_TTL = 604800  # Seconds, tags of an artist are fetched again after a week
+LASTFM_TAG_CONCURRENCY = 8  # Tag requests in flight per process
+LASTFM_RATE_LIMIT = 5  # Tag requests per second per process
+
 # Password validation
 # https://docs.djangoproject.com/en/3.2/ref/settings/#auth-password-validators
 
@@ -366,5 +409,34 @@ CELERY_ACCEPT_CONTENT = ['json']
 CELERY_TASK_SERIALIZER = 'json'
 CELERY_RESULT_SERIALIZER = 'json'
 CELERY_TIMEZONE = 'UTC'
+CELERY_IMPORTS = ('app.tasks.recommendation_tasks', 'app.tasks.like_sync_tasks', 'app.tasks.entity_merge_tasks')
+CELERY_BEAT_SCHEDULE = {
+    'precompute-recommendations': {
+        'task': 'app.tasks.recommendation_tasks.precompute_recommendations_task',
+        'schedule': crontab(hour=3, minute=0),
+    },
+    'update-models': {
+        'task': 'app.tasks.recommendation_tasks.update_models_task',
+        'schedule': crontab(minute='*/10'),
+    },
+}
+# Lets the Redis broker order like sync jobs by priority (0 runs first)
+CELERY_BROKER_TRANSPORT_OPTIONS = {'priority_steps': list(range(10)), 'sep': ':', 'queue_order_strategy': 'priority'}
+
+# Like sync jobs run on Celery workers consuming the likes.<provider> queues,
+# or with 'inprocess' on the ASGI server's event loop for local development
+LIKE_SYNC_BACKEND = os.getenv('LIKE_SYNC_BACKEND', 'celery')
+LIKE_SYNC_WORKERS = {'spotify': 4, 'lastfm': 2, 'ytmusic': 2, 'mal': 2}  # In-process workers per provider
+LIKE_SYNC_JOB_TIMEOUT = 900  # Seconds without progress after which an active job is considered dead
+
+# Catalog merges of duplicated items across providers, see EntityMergeEngine
+ENTITY_MERGE_BACKEND = os.getenv('ENTITY_MERGE_BACKEND', 'celery')  # or 'inprocess', in a server thread
+ENTITY_MERGE_PAGE_SIZE = 5000  # Nodes read per query
+ENTITY_MERGE_BATCH_SIZE = 500  # Blocks of duplicates merged per transaction
+ENTITY_MERGE_JOB_TIMEOUT = 3600  # Seconds without progress after which an active merge is considered dead
+ENTITY_MATCH_HASHES = 32  # MinHash signature length of track titles
+ENTITY_MATCH_BANDS = 8  # LSH bands, candidates share one band of ENTITY_MATCH_HASHES / ENTITY_MATCH_BANDS hashes
+ENTITY_MATCH_THRESHOLD = 0.9  # Estimated Jaccard similarity of title shingles above which candidates of the same artist are merged
+ENTITY_MATCH_MAX_BUCKET = 50  # Larger LSH buckets are generic titles and are skipped
 
 